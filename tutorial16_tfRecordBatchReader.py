@@ -0,0 +1,184 @@
+# https://www.tensorflow.org/tutorials/load_data/tfrecord?hl=ko
+# 개요 : tutorial16 의 Example 을 한 개씩 디코딩하지 않고, 배치 단위로 tf.io.parse_example 을 호출하는 리더
+
+import glob
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+# 특성 명세 - tutorial16 의 serialize_example() 과 같은 feature0 ~ feature3
+# feature0 : bool (int64 로 저장), feature1 : int64, feature2 : bytes, feature3 : float
+FEATURE_SPEC = {
+    'feature0' : tf.io.FixedLenFeature([], tf.int64, default_value = 0),
+    'feature1' : tf.io.FixedLenFeature([], tf.int64, default_value = 0),
+    'feature2' : tf.io.FixedLenFeature([], tf.string, default_value = ''),
+    'feature3' : tf.io.FixedLenFeature([], tf.float32, default_value = 0.0),
+}
+
+# 파싱 후 열(column)의 최종 dtype. feature0 은 bool 로 되돌림
+COLUMN_DTYPES = {
+    'feature0' : tf.bool,
+    'feature1' : tf.int64,
+    'feature2' : tf.string,
+    'feature3' : tf.float32,
+}
+
+def _int64_feature(value):
+    return tf.train.Feature(int64_list = tf.train.Int64List(value = [value]))
+
+def _bytes_feature(value):
+    return tf.train.Feature(bytes_list = tf.train.BytesList(value = [value]))
+
+def _float_feature(value):
+    return tf.train.Feature(float_list = tf.train.FloatList(value = [value]))
+
+def serialize_example(feature0, feature1, feature2, feature3):
+    # same message layout as tutorial16
+    feature = {
+        'feature0' : _int64_feature(int(feature0)),
+        'feature1' : _int64_feature(int(feature1)),
+        'feature2' : _bytes_feature(feature2),
+        'feature3' : _float_feature(float(feature3)),
+    }
+    example_proto = tf.train.Example(features = tf.train.Features(feature = feature))
+    return example_proto.SerializeToString()
+
+def write_shards(directory, n_observations = 10000, num_shards = 4, seed = 0):
+    # Writes the tutorial16 toy dataset as 'num_shards' TFRecord files and returns their paths.
+    rng = np.random.RandomState(seed)
+    feature0 = rng.choice([False, True], n_observations)
+    feature1 = rng.randint(0, 5, n_observations)
+    strings = np.array([b'cat', b'dog', b'chicken', b'horse', b'goat'])
+    feature2 = strings[feature1]
+    feature3 = rng.randn(n_observations)
+
+    os.makedirs(directory, exist_ok = True)
+    paths = []
+    for shard in range(num_shards):
+        path = os.path.join(directory, 'data-{:05d}-of-{:05d}.tfrecord'.format(shard, num_shards))
+        with tf.io.TFRecordWriter(path) as writer:
+            for i in range(shard, n_observations, num_shards):
+                writer.write(serialize_example(feature0[i], feature1[i], feature2[i], feature3[i]))
+        paths.append(path)
+    return paths
+
+def _project_spec(columns = None, feature_spec = None):
+    # Restricts feature_spec (default FEATURE_SPEC) to the requested columns, keeping the given
+    # order.
+    feature_spec = FEATURE_SPEC if feature_spec is None else feature_spec
+    if columns is None:
+        return dict(feature_spec)
+    unknown = [c for c in columns if c not in feature_spec]
+    if unknown:
+        raise ValueError('Unknown columns {}, expected a subset of {}'.format(unknown,
+                sorted(feature_spec)))
+    return {c : feature_spec[c] for c in columns}
+
+def _cast_columns(parsed, feature_spec):
+    # COLUMN_DTYPES only applies to the default spec (feature0 back to bool); columns of a
+    # caller's spec keep their parsed dtype.
+    if feature_spec is not None:
+        return parsed
+    return {name : tf.cast(value, COLUMN_DTYPES[name]) for name, value in parsed.items()}
+
+def make_batch_parser(columns = None, feature_spec = None):
+    # Returns a function mapping a [batch] string tensor to a dict of dense typed columns.
+    spec = _project_spec(columns, feature_spec)
+
+    def parse_batch(serialized):
+        return _cast_columns(tf.io.parse_example(serialized, spec), feature_spec)
+    return parse_batch
+
+def make_batched_reader(file_pattern, batch_size = 1024, columns = None, num_parallel_reads = None,
+        cycle_length = None, shuffle_files = False, drop_remainder = False, prefetch = True,
+        feature_spec = None):
+    # Batched TFRecord reader. feature_spec ({name : FixedLenFeature ...}) defaults to the
+    # tutorial16 FEATURE_SPEC.
+    # Shards are interleaved with parallel reads, records are batched first, and then a whole
+    # batch is decoded with one tf.io.parse_example call.
+    if num_parallel_reads is None:
+        num_parallel_reads = tf.data.AUTOTUNE
+    files = tf.data.Dataset.list_files(file_pattern, shuffle = shuffle_files)
+    dataset = files.interleave(tf.data.TFRecordDataset,
+            cycle_length = cycle_length or tf.data.AUTOTUNE,
+            num_parallel_calls = num_parallel_reads,
+            deterministic = not shuffle_files)
+    dataset = dataset.batch(batch_size, drop_remainder = drop_remainder)
+    dataset = dataset.map(make_batch_parser(columns, feature_spec),
+            num_parallel_calls = tf.data.AUTOTUNE)
+    if prefetch:
+        dataset = dataset.prefetch(tf.data.AUTOTUNE)
+    return dataset
+
+def make_per_record_reader(file_pattern, batch_size = 1024, columns = None, feature_spec = None):
+    # Reference path : decode one record at a time with tf.io.parse_single_example, then batch.
+    spec = _project_spec(columns, feature_spec)
+
+    def parse_one(serialized):
+        return _cast_columns(tf.io.parse_single_example(serialized, spec), feature_spec)
+
+    files = tf.data.Dataset.list_files(file_pattern, shuffle = False)
+    dataset = tf.data.TFRecordDataset(files)
+    return dataset.map(parse_one).batch(batch_size)
+
+def _consume(dataset):
+    n = 0
+    for batch in dataset:
+        n += int(tf.shape(next(iter(batch.values())))[0])
+    return n
+
+def benchmark(file_pattern, batch_size = 1024, columns = None, repeats = 3):
+    # Records/sec of FromString (python), per-record parse, and batched parse.
+    paths = sorted(glob.glob(file_pattern))
+    results = {}
+
+    # tutorial16 의 방식 : tf.train.Example.FromString 로 한 개씩 디코딩
+    def from_string():
+        n = 0
+        for raw in tf.data.TFRecordDataset(paths):
+            tf.train.Example.FromString(raw.numpy())
+            n += 1
+        return n
+
+    candidates = [
+        ('Example.FromString', from_string),
+        ('parse_single_example', lambda: _consume(make_per_record_reader(file_pattern, batch_size,
+                columns))),
+        ('parse_example (batched)', lambda: _consume(make_batched_reader(file_pattern, batch_size,
+                columns))),
+    ]
+    for name, run in candidates:
+        run() # warm-up
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            n = run()
+            best = min(best, time.perf_counter() - start)
+        results[name] = n / best
+        print('{:<26s}: {:>12,.0f} records/sec'.format(name, results[name]))
+    return results
+
+if __name__ == '__main__':
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    write_shards(directory, n_observations = 100000, num_shards = 8)
+    pattern = os.path.join(directory, '*.tfrecord')
+
+    for batch in make_batched_reader(pattern, batch_size = 4).take(1):
+        print(batch)
+
+    # 열 투영(column projection) - 필요한 열만 파싱
+    for batch in make_batched_reader(pattern, batch_size = 4, columns = ['feature1', 'feature3']).take(1):
+        print(batch)
+
+    # 다른 특성 명세 - feature0 을 int64 그대로 읽음
+    spec = {'feature0' : tf.io.FixedLenFeature([], tf.int64),
+            'feature3' : tf.io.FixedLenFeature([], tf.float32)}
+    for batch in make_batched_reader(pattern, batch_size = 4, feature_spec = spec).take(1):
+        assert sorted(batch) == ['feature0', 'feature3'] and batch['feature0'].dtype == tf.int64
+        print(batch)
+
+    benchmark(pattern)
@@ -0,0 +1,241 @@
+# https://www.tensorflow.org/tutorials/load_data/tfrecord?hl=ko
+# 개요 : TFRecord 파일 옆에 레코드의 바이트 위치(offset)와 길이를 담은 인덱스 파일(sidecar)을 만들어
+# 임의 접근(random access), 정확한 전역 셔플, 워커별 범위 분할, 레코드 번호로부터의 재시작을 지원
+
+import os
+import struct
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+# TFRecord 레코드 형식
+# uint64 length / uint32 masked_crc32_of_length / byte data[length] / uint32 masked_crc32_of_data
+_HEADER_SIZE = 12
+_FOOTER_SIZE = 4
+
+INDEX_SUFFIX = '.index'
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+def _stamp(path):
+    # (size, mtime in ns) of the data file; the index is only valid for this version of it.
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _read_sidecar(path):
+    # Row 0 is the stamp of the data file the index was built from, the rest are the records.
+    rows = np.fromfile(index_path(path), dtype = '<i8').reshape(-1, 2)
+    if len(rows) == 0:
+        raise ValueError('{} is empty'.format(index_path(path)))
+    return tuple(int(v) for v in rows[0]), rows[1:]
+
+def build_index(path, overwrite = False):
+    # Scans one uncompressed TFRecord file and writes '<path>.index' holding an int64 array of
+    # shape [num_records, 2] : (byte offset of the record data, record length), after a header
+    # row with the size and mtime of the data file. An existing index is reused only if that
+    # header still matches the file.
+    sidecar = index_path(path)
+    stamp = _stamp(path)
+    if os.path.exists(sidecar) and not overwrite:
+        built_from, index = _read_sidecar(path)
+        if built_from == stamp:
+            return index
+
+    entries = []
+    file_size = stamp[0]
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset < file_size:
+            header = f.read(_HEADER_SIZE)
+            if len(header) < _HEADER_SIZE:
+                raise ValueError('Truncated record header at byte {} of {}'.format(offset, path))
+            length = struct.unpack('<Q', header[:8])[0]
+            data_offset = offset + _HEADER_SIZE
+            entries.append((data_offset, length))
+            offset = data_offset + length + _FOOTER_SIZE
+            f.seek(offset)
+        if offset != file_size:
+            raise ValueError('{} does not look like an uncompressed TFRecord file'.format(path))
+
+    index = np.array(entries, dtype = '<i8').reshape(-1, 2)
+    # Write to a temp file first so readers never see a partial index.
+    tmp = sidecar + '.tmp'
+    np.concatenate([np.array([stamp], dtype = '<i8'), index]).tofile(tmp)
+    os.replace(tmp, sidecar)
+    return index
+
+def load_index(path):
+    # Raises ValueError if the data file changed since the index was built.
+    built_from, index = _read_sidecar(path)
+    if built_from != _stamp(path):
+        raise ValueError('{} is stale (data file size / mtime {}, index built from {})'.format(
+                index_path(path), _stamp(path), built_from))
+    return index
+
+def worker_range(num_records, num_workers, worker_index):
+    # Contiguous, balanced [start, stop) range for one worker. Sizes differ by at most one record.
+    if not 0 <= worker_index < num_workers:
+        raise ValueError('worker_index {} out of range for {} workers'.format(worker_index,
+                num_workers))
+    base, extra = divmod(num_records, num_workers)
+    start = worker_index * base + min(worker_index, extra)
+    stop = start + base + (1 if worker_index < extra else 0)
+    return start, stop
+
+class IndexedTFRecordSource(object):
+    # Random-access view over one or more indexed TFRecord files.
+    # Records are numbered globally in file order, so record i of the source is always the same
+    # record no matter how many workers read it or where a run resumes.
+
+    def __init__(self, paths, build_missing = True):
+        # build_missing : build missing or stale indices; otherwise they raise.
+        self.paths = list(paths)
+        if not self.paths:
+            raise ValueError('No TFRecord paths given')
+        indices = []
+        for path in self.paths:
+            if build_missing:
+                indices.append(build_index(path))
+            elif not os.path.exists(index_path(path)):
+                raise FileNotFoundError(index_path(path))
+            else:
+                indices.append(load_index(path))
+
+        self._file_ids = np.concatenate([np.full(len(index), i, dtype = np.int32)
+                for i, index in enumerate(indices)])
+        merged = np.concatenate(indices)
+        self._offsets = np.ascontiguousarray(merged[:, 0])
+        self._lengths = np.ascontiguousarray(merged[:, 1])
+        # {thread id : file descriptors}; every descriptor is here so close() reaches them all.
+        self._lock = threading.Lock()
+        self._open_fds = {}
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _fds(self):
+        # One set of file descriptors per thread; os.pread does not share a file position.
+        thread_id = threading.get_ident()
+        fds = self._open_fds.get(thread_id)
+        if fds is None:
+            with self._lock:
+                fds = [os.open(path, os.O_RDONLY) for path in self.paths]
+                self._open_fds[thread_id] = fds
+        return fds
+
+    def read(self, record_id):
+        record_id = int(record_id)
+        if not 0 <= record_id < len(self):
+            raise IndexError('record {} out of range for {} records'.format(record_id, len(self)))
+        fd = self._fds()[self._file_ids[record_id]]
+        return os.pread(fd, int(self._lengths[record_id]), int(self._offsets[record_id]))
+
+    def __getitem__(self, record_id):
+        return self.read(record_id)
+
+    def order(self, epoch = 0, shuffle = False, seed = None):
+        # Global record order for one epoch. With shuffle, an exact permutation of all records
+        # derived from (seed, epoch), so every worker computes the same order independently.
+        # seed = None gives a different permutation on every call (single worker only).
+        if not shuffle:
+            return np.arange(len(self), dtype = np.int64)
+        rng = np.random.RandomState(None if seed is None else (seed + epoch) % (2 ** 32))
+        return rng.permutation(len(self)).astype(np.int64)
+
+    def dataset(self, epoch = 0, shuffle = False, seed = None, num_workers = 1, worker_index = 0,
+            start = 0, num_parallel_reads = None):
+        # tf.data source of serialized records.
+        # The epoch order is split into balanced per-worker ranges and 'start' skips directly to
+        # a record position inside this worker's range, so resuming is O(1) instead of reading
+        # and discarding everything before it.
+        # Shuffled workers must share one permutation, so num_workers > 1 needs a seed.
+        if shuffle and num_workers > 1 and seed is None:
+            raise ValueError('shuffle with num_workers > 1 needs a seed shared by all workers')
+        order = self.order(epoch, shuffle, seed)
+        lo, hi = worker_range(len(order), num_workers, worker_index)
+        if not 0 <= start <= hi - lo:
+            raise ValueError('start {} out of range for the {} records of worker {}'.format(
+                    start, hi - lo, worker_index))
+        ids = order[lo + start : hi]
+
+        def read_record(record_id):
+            return self.read(record_id)
+
+        def tf_read(record_id):
+            record = tf.numpy_function(read_record, [record_id], tf.string)
+            return tf.reshape(record, ())
+
+        dataset = tf.data.Dataset.from_tensor_slices(ids)
+        return dataset.map(tf_read, num_parallel_calls = num_parallel_reads or tf.data.AUTOTUNE,
+                deterministic = True)
+
+    def close(self):
+        # Closes the descriptors of every thread; later reads open new ones.
+        with self._lock:
+            open_fds, self._open_fds = self._open_fds, {}
+        for fds in open_fds.values():
+            for fd in fds:
+                os.close(fd)
+
+if __name__ == '__main__':
+    import glob
+    import tempfile
+
+    from tutorial16_tfRecordBatchReader import make_batch_parser, write_shards
+
+    directory = tempfile.mkdtemp()
+    paths = write_shards(directory, n_observations = 1000, num_shards = 4)
+    for path in paths:
+        print(path, build_index(path).shape)
+
+    source = IndexedTFRecordSource(sorted(glob.glob(os.path.join(directory, '*.tfrecord'))))
+    print('레코드 수 :', len(source))
+
+    # 임의 접근
+    print(tf.train.Example.FromString(source[123]))
+
+    # 인덱스로 읽은 레코드가 순차 읽기 결과와 같은 지 확인
+    sequential = [r.numpy() for r in tf.data.TFRecordDataset(source.paths)]
+    assert all(source[i] == record for i, record in enumerate(sequential))
+    for record_id in [-1, len(source)]:
+        try:
+            source[record_id]
+            raise AssertionError(record_id)
+        except IndexError:
+            pass
+
+    # 워커별 분할 - 2개의 워커가 정확히 절반씩 겹치지 않게 나누어 가짐
+    seen = []
+    for worker_index in range(2):
+        ds = source.dataset(epoch = 0, shuffle = True, seed = 42, num_workers = 2,
+                worker_index = worker_index)
+        seen.extend(r.numpy() for r in ds)
+    assert sorted(seen) == sorted(sequential)
+
+    # 에포크 중간에서 재시작 - 100번째 레코드부터
+    full = [r.numpy() for r in source.dataset(epoch = 1, shuffle = True, seed = 42)]
+    resumed = [r.numpy() for r in source.dataset(epoch = 1, shuffle = True, seed = 42, start = 100)]
+    assert resumed == full[100:]
+    for kwargs in [{'start' : -1}, {'start' : len(source) + 1},
+            {'shuffle' : True, 'num_workers' : 2}]:
+        try:
+            source.dataset(**kwargs)
+            raise AssertionError(kwargs)
+        except ValueError:
+            pass
+
+    parse_batch = make_batch_parser()
+    for batch in source.dataset(shuffle = True, seed = 42).batch(4).map(parse_batch).take(1):
+        print(batch)
+    source.close()
+
+    # 데이터 파일이 바뀌면 (크기 / 수정 시각) 인덱스를 다시 만듦
+    write_shards(directory, n_observations = 800, num_shards = 4, seed = 1)
+    try:
+        load_index(paths[0])
+        raise AssertionError('stale index')
+    except ValueError:
+        pass
+    assert len(IndexedTFRecordSource(paths)) == 800
@@ -0,0 +1,153 @@
+# https://www.tensorflow.org/tutorials/estimator/linear
+# 개요 : est.predict() 가 예제마다 파이썬 dict 를 만드는 대신, 출력 키별로 쌓인 넘파이 배열을 반환하는
+# 배치 예측 API. 모델은 SavedModel 로 한 번만 내보내고 불러와서 계속 재사용
+
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+
+DEFAULT_KEYS = ('probabilities', 'class_ids', 'logits')
+
+def predict_columns(est, input_fn, predict_keys = DEFAULT_KEYS):
+    # Columnar variant of list(est.predict(input_fn)).
+    # yield_single_examples = False keeps whole batches, so there is no per-example dict.
+    chunks = {key : [] for key in predict_keys}
+    for batch in est.predict(input_fn, predict_keys = list(predict_keys),
+            yield_single_examples = False):
+        for key in predict_keys:
+            chunks[key].append(batch[key])
+    # Empty input yields no batch, so the per-example shape is unknown : empty 1-D arrays.
+    return {key : np.concatenate(values) if values else np.empty((0,), np.float32)
+            for key, values in chunks.items()}
+
+def _serving_specs(feature_columns):
+    # {feature name : (dtype, shape)} of the serving placeholders, from the columns' parse spec
+    # (the dtypes the model was built for, whatever the caller's arrays hold).
+    specs = {}
+    for key, feature in tf.feature_column.make_parse_example_spec(feature_columns).items():
+        shape = list(getattr(feature, 'shape', None) or [])
+        specs[key] = (feature.dtype, [None] + (shape if int(np.prod(shape)) > 1 else []))
+    return specs
+
+def _as_columns(features):
+    # DataFrame or dict of array-likes -> dict of numpy arrays
+    if hasattr(features, 'to_dict'):
+        features = {key : features[key].values for key in features.columns}
+    return {key : np.asarray(value) for key, value in features.items()}
+
+class BatchPredictor(object):
+    # Exports the estimator once and keeps the loaded 'predict' signature in memory.
+    # Every predict() call reuses the same loaded graph and variables; nothing is rebuilt or
+    # re-read from model_dir.
+
+    def __init__(self, est, feature_columns, export_dir = None, signature = 'predict'):
+        # feature_columns : the columns the estimator was built with.
+        specs = _serving_specs(feature_columns)
+        self.feature_dtypes = {key : dtype for key, (dtype, _) in specs.items()}
+
+        def serving_input_receiver_fn():
+            receivers = {key : tf.compat.v1.placeholder(dtype, shape = shape, name = key)
+                    for key, (dtype, shape) in specs.items()}
+            return tf.estimator.export.ServingInputReceiver(receivers, receivers)
+
+        export_base = export_dir or tempfile.mkdtemp()
+        self.export_path = est.export_saved_model(export_base, serving_input_receiver_fn)
+        if isinstance(self.export_path, bytes):
+            self.export_path = self.export_path.decode('utf-8')
+        self._loaded = tf.saved_model.load(self.export_path)
+        self._fn = self._loaded.signatures[signature]
+
+    def predict(self, features, batch_size = 8192, predict_keys = DEFAULT_KEYS):
+        # Returns {key : array of shape [n_examples, ...]} in input order.
+        columns = _as_columns(features)
+        n = len(next(iter(columns.values())))
+        if n == 0:
+            outputs = self._fn.structured_outputs
+            return {key : np.empty((0,) + tuple(outputs[key].shape[1:]),
+                    dtype = outputs[key].dtype.as_numpy_dtype) for key in predict_keys}
+        results = None
+        for start in range(0, n, batch_size):
+            stop = min(start + batch_size, n)
+            inputs = {key : tf.constant(columns[key][start:stop], dtype = dtype)
+                    for key, dtype in self.feature_dtypes.items()}
+            outputs = self._fn(**inputs)
+            if results is None:
+                # Preallocate every requested output once the per-example shapes are known.
+                results = {key : np.empty((n,) + tuple(outputs[key].shape[1:]),
+                        dtype = outputs[key].dtype.as_numpy_dtype) for key in predict_keys}
+            for key in predict_keys:
+                results[key][start:stop] = outputs[key].numpy()
+        return results
+
+def _throughput(fn, n, repeats = 3):
+    fn() # warm-up
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return n / best
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    dftrain = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/train.csv')
+    dfeval = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/eval.csv')
+    y_train = dftrain.pop('survived')
+    y_eval = dfeval.pop('survived')
+
+    CATEGORICAL_COLUMNS = ['sex', 'n_siblings_spouses', 'parch', 'class', 'deck', 'embark_town',
+            'alone']
+    NUMERIC_COLUMNS = ['age', 'fare']
+
+    feature_columns = []
+    for feature_name in CATEGORICAL_COLUMNS:
+        vocabulary = dftrain[feature_name].unique()
+        feature_columns.append(tf.feature_column.categorical_column_with_vocabulary_list(
+                feature_name, vocabulary))
+    for feature_name in NUMERIC_COLUMNS:
+        feature_columns.append(tf.feature_column.numeric_column(feature_name, dtype = tf.float32))
+
+    def make_input_fn(data_df, label_df, num_epochs = 10, shuffle = True, batch_size = 32):
+        def input_function():
+            ds = tf.data.Dataset.from_tensor_slices((dict(data_df), label_df))
+            if shuffle:
+                ds = ds.shuffle(1000)
+            return ds.batch(batch_size).repeat(num_epochs)
+        return input_function
+
+    linear_est = tf.estimator.LinearClassifier(feature_columns = feature_columns)
+    linear_est.train(make_input_fn(dftrain, y_train))
+
+    # 큰 평가 세트를 흉내내기 위해 평가 데이터를 반복
+    big_eval = pd.concat([dfeval] * 200, ignore_index = True)
+    big_y = pd.concat([y_eval] * 200, ignore_index = True)
+    n = len(big_eval)
+
+    # 기존 방식 : 예제마다 dict
+    def per_example():
+        pred_dicts = list(linear_est.predict(make_input_fn(big_eval, big_y, num_epochs = 1,
+                shuffle = False, batch_size = 1024)))
+        return pd.Series([pred['probabilities'][1] for pred in pred_dicts])
+
+    def columnar():
+        preds = predict_columns(linear_est, make_input_fn(big_eval, big_y, num_epochs = 1,
+                shuffle = False, batch_size = 1024))
+        return pd.Series(preds['probabilities'][:, 1])
+
+    predictor = BatchPredictor(linear_est, feature_columns)
+    def batched():
+        return pd.Series(predictor.predict(big_eval)['probabilities'][:, 1])
+
+    np.testing.assert_allclose(per_example().values, columnar().values, rtol = 1e-6)
+    np.testing.assert_allclose(per_example().values, batched().values, rtol = 1e-5)
+    empty = predictor.predict(dfeval[:0])
+    assert empty['probabilities'].shape == (0, 2) and empty['class_ids'].shape == (0, 1)
+    assert all(len(v) == 0 for v in predict_columns(linear_est, make_input_fn(dfeval[:0],
+            y_eval[:0], num_epochs = 1, shuffle = False)).values())
+
+    for name, fn in [('per-example dicts', per_example), ('predict_columns', columnar),
+            ('BatchPredictor', batched)]:
+        print('{:<18s}: {:>12,.0f} examples/sec'.format(name, _throughput(fn, n)))
@@ -0,0 +1,421 @@
+# https://www.tensorflow.org/tutorials/estimator/boosted_trees
+# 개요 : BoostedTreesClassifier 와 같은 모델(로지스틱 손실, 층 단위로 자라는 트리)을 메모리 내에서 훈련
+# 수치 특성은 한 번만 uint8 히스토그램 구간(bin)으로 양자화하고, 층마다 그래디언트/헤시안 히스토그램을
+# 여러 스레드에서 병렬로 누적. 메모리는 구간 행렬 (행 수 x 특성 수 바이트) 에 작업 배열이 행마다 약 73
+# 바이트, 스레드가 하나 늘 때마다 약 17 바이트 더해짐 (100 만 행 이상에서 scaling_benchmark 의
+# 'extra B/row' 열, tracemalloc 으로 잰 값). 스레드 이득은 np.bincount 가 GIL 을 놓는지에 달려 있으므로
+# bincount_gil_check() 로 확인
+
+import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MAX_BINS = 256
+
+class Quantizer(object):
+    # Maps a DataFrame to a Fortran-ordered uint8 bin matrix.
+    # Categorical columns are one-hot encoded like indicator_column in tutorial19 (bins 0 / 1),
+    # numeric columns get at most MAX_BINS - 1 quantile edges; bin b holds edges[b-1] < x <= edges[b].
+
+    def __init__(self, categorical_columns = (), numeric_columns = (), max_bins = MAX_BINS,
+            sample_size = 200000, seed = 0):
+        if not 2 <= max_bins <= MAX_BINS:
+            raise ValueError('max_bins must be in [2, {}]'.format(MAX_BINS))
+        self.categorical_columns = list(categorical_columns)
+        self.numeric_columns = list(numeric_columns)
+        self.max_bins = max_bins
+        self.sample_size = sample_size
+        self.seed = seed
+
+    def fit(self, df):
+        self.vocabularies = {name : list(df[name].unique()) for name in self.categorical_columns}
+        self.edges = {}
+        rng = np.random.RandomState(self.seed)
+        for name in self.numeric_columns:
+            values = np.asarray(df[name], dtype = np.float32)
+            values = values[~np.isnan(values)]
+            if len(values) > self.sample_size:
+                values = values[rng.choice(len(values), self.sample_size, replace = False)]
+            quantiles = np.linspace(0, 1, self.max_bins + 1)[1:-1]
+            self.edges[name] = np.unique(np.quantile(values, quantiles).astype(np.float32))
+
+        # feature layout : (name, source column, category or None)
+        self.features = []
+        for name in self.categorical_columns:
+            for value in self.vocabularies[name]:
+                self.features.append(('{}_{}'.format(name, value), name, value))
+        for name in self.numeric_columns:
+            self.features.append((name, name, None))
+        return self
+
+    @property
+    def feature_names(self):
+        return [f[0] for f in self.features]
+
+    def threshold_value(self, feature, bin_threshold):
+        # Raw-value threshold equivalent to 'bin <= bin_threshold'.
+        name, column, category = self.features[feature]
+        if category is not None:
+            return 0.5
+        return float(self.edges[column][bin_threshold])
+
+    def transform(self, df, chunk_size = 1 << 20):
+        n = len(df)
+        bins = np.empty((n, len(self.features)), dtype = np.uint8, order = 'F')
+        for j, (name, column, category) in enumerate(self.features):
+            values = df[column].values
+            for start in range(0, n, chunk_size):
+                chunk = values[start : start + chunk_size]
+                if category is not None:
+                    bins[start : start + chunk_size, j] = (chunk == category)
+                else:
+                    # NaN sorts past the last edge, so missing values land in the top bin.
+                    bins[start : start + chunk_size, j] = np.searchsorted(self.edges[column],
+                            np.asarray(chunk, dtype = np.float32), side = 'left')
+        return bins
+
+class _Tree(object):
+    def __init__(self):
+        self.feature = []
+        self.threshold = []
+        self.left = []
+        self.right = []
+        self.value = []
+
+    def add_node(self):
+        self.feature.append(-1)
+        self.threshold.append(0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.value.append(0.0)
+        return len(self.feature) - 1
+
+    def finalize(self):
+        self.feature = np.array(self.feature, dtype = np.int32)
+        self.threshold = np.array(self.threshold, dtype = np.uint8)
+        self.left = np.array(self.left, dtype = np.int32)
+        self.right = np.array(self.right, dtype = np.int32)
+        self.value = np.array(self.value, dtype = np.float32)
+        self.depth = self._max_depth()
+        return self
+
+    def _max_depth(self):
+        # Iterative walk from the root (node 0) over left / right.
+        depth = 0
+        stack = [(0, 0)] if len(self.left) else []
+        while stack:
+            node, node_depth = stack.pop()
+            depth = max(depth, node_depth)
+            if self.left[node] >= 0:
+                stack.append((self.left[node], node_depth + 1))
+                stack.append((self.right[node], node_depth + 1))
+        return depth
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+class HistogramBoostedTreesClassifier(object):
+    # Binary classifier with the same defaults as tf.estimator.BoostedTreesClassifier
+    # (n_trees = 100, max_depth = 6, learning_rate = 0.1, l2 = 0, min_node_weight = 0).
+
+    def __init__(self, n_trees = 100, max_depth = 6, learning_rate = 0.1, l2_regularization = 0.,
+            tree_complexity = 0., min_node_weight = 0., center_bias = False, n_threads = None):
+        self.n_trees = n_trees
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
+        self.l2_regularization = l2_regularization
+        self.tree_complexity = tree_complexity
+        self.min_node_weight = min_node_weight
+        self.center_bias = center_bias
+        self.n_threads = n_threads or os.cpu_count() or 1
+        self.trees = []
+        self.bias = 0.0
+
+    # 히스토그램 누적 - 특성을 스레드마다 나누어 처리
+    def _histograms(self, pool, bins, rows, slot, n_slots, grad, hess):
+        # Shared per call : the key base and float64 weights (24 B per row; np.bincount would
+        # otherwise convert the weights to float64 on every call). Per thread : one intp key
+        # buffer filled in place (8 B per row) and the uint8 column gather (1 B per row).
+        n_features = bins.shape[1]
+        G = np.zeros((n_slots, n_features, MAX_BINS), dtype = np.float64)
+        H = np.zeros((n_slots, n_features, MAX_BINS), dtype = np.float64)
+        if len(rows) == 0:
+            return G, H
+        base = slot.astype(np.intp)
+        base *= MAX_BINS
+        g = grad.take(rows).astype(np.float64)
+        h = hess.take(rows).astype(np.float64)
+        size = n_slots * MAX_BINS
+
+        def work(features):
+            key = np.empty(len(rows), dtype = np.intp)
+            for f in features:
+                np.add(base, bins[:, f].take(rows), out = key)
+                G[:, f, :] = np.bincount(key, weights = g, minlength = size).reshape(n_slots,
+                        MAX_BINS)
+                H[:, f, :] = np.bincount(key, weights = h, minlength = size).reshape(n_slots,
+                        MAX_BINS)
+
+        groups = np.array_split(np.arange(n_features), min(self.n_threads, n_features))
+        list(pool.map(work, groups))
+        return G, H
+
+    def _best_splits(self, G, H):
+        # Best (feature, bin) per node from its histograms. Returns gain, feature, bin.
+        lam = self.l2_regularization
+        GL = np.cumsum(G, axis = 2)[:, :, :-1]
+        HL = np.cumsum(H, axis = 2)[:, :, :-1]
+        G_total = G[:, :1, :].sum(axis = 2, keepdims = True)
+        H_total = H[:, :1, :].sum(axis = 2, keepdims = True)
+        GR = G_total - GL
+        HR = H_total - HL
+        eps = 1e-12
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            gain = (GL ** 2 / np.maximum(HL + lam, eps) + GR ** 2 / np.maximum(HR + lam, eps)
+                    - G_total ** 2 / np.maximum(H_total + lam, eps))
+        valid = (HL > max(self.min_node_weight, eps)) & (HR > max(self.min_node_weight, eps))
+        gain = np.where(valid, gain, -np.inf)
+        flat = gain.reshape(len(gain), -1)
+        best = flat.argmax(axis = 1)
+        best_gain = flat[np.arange(len(flat)), best]
+        n_bins = gain.shape[2]
+        return best_gain, best // n_bins, best % n_bins, G_total[:, 0, 0], H_total[:, 0, 0]
+
+    def _leaf_value(self, g_sum, h_sum):
+        return -self.learning_rate * g_sum / max(h_sum + self.l2_regularization, 1e-12)
+
+    def _grow_tree(self, pool, bins, grad, hess):
+        n = bins.shape[0]
+        tree = _Tree()
+        root = tree.add_node()
+        row_node = np.zeros(n, dtype = np.int32)
+
+        open_nodes = [root]
+        rows = np.arange(n, dtype = np.int32)
+        slot = np.zeros(n, dtype = np.int32)
+        G, H = self._histograms(pool, bins, rows, slot, 1, grad, hess)
+
+        for depth in range(self.max_depth + 1):
+            gain, feature, threshold, g_sum, h_sum = self._best_splits(G, H)
+            splits = [k for k in range(len(open_nodes))
+                    if depth < self.max_depth and gain[k] > self.tree_complexity]
+            for k, node in enumerate(open_nodes):
+                tree.value[node] = self._leaf_value(g_sum[k], h_sum[k])
+            if not splits:
+                break
+
+            # 분할 노드의 행들을 왼쪽/오른쪽 자식으로 보냄
+            node_slot = np.full(len(tree.feature), -1, dtype = np.int32)
+            for k in splits:
+                node_slot[open_nodes[k]] = k
+            active = rows[node_slot[row_node[rows]] >= 0]
+            k_of_row = node_slot[row_node[active]]
+            split_feature = feature[k_of_row]
+            go_right = bins[active, split_feature] > threshold[k_of_row]
+
+            left_child = np.zeros(len(open_nodes), dtype = np.int32)
+            right_child = np.zeros(len(open_nodes), dtype = np.int32)
+            for k in splits:
+                node = open_nodes[k]
+                tree.feature[node] = int(feature[k])
+                tree.threshold[node] = int(threshold[k])
+                left_child[k] = tree.add_node()
+                right_child[k] = tree.add_node()
+                tree.left[node] = int(left_child[k])
+                tree.right[node] = int(right_child[k])
+            row_node[active] = np.where(go_right, right_child[k_of_row], left_child[k_of_row])
+
+            # 다음 층 히스토그램 : 작은 쪽 자식만 계산하고, 큰 쪽은 부모 - 작은 쪽
+            right_counts = np.bincount(k_of_row, weights = go_right, minlength = len(open_nodes))
+            total_counts = np.bincount(k_of_row, minlength = len(open_nodes))
+            children = []
+            small_slot = np.full(len(tree.feature), -1, dtype = np.int32)
+            for i, k in enumerate(splits):
+                left_small = total_counts[k] - right_counts[k] <= right_counts[k]
+                small, large = ((left_child[k], right_child[k]) if left_small
+                        else (right_child[k], left_child[k]))
+                small_slot[small] = i
+                children.append((k, small, large))
+            small_rows = active[small_slot[row_node[active]] >= 0]
+            G_small, H_small = self._histograms(pool, bins, small_rows,
+                    small_slot[row_node[small_rows]], len(splits), grad, hess)
+
+            next_nodes = []
+            G_next = np.empty((2 * len(splits),) + G.shape[1:], dtype = np.float64)
+            H_next = np.empty_like(G_next)
+            for i, (k, small, large) in enumerate(children):
+                G_next[2 * i], H_next[2 * i] = G_small[i], H_small[i]
+                G_next[2 * i + 1], H_next[2 * i + 1] = G[k] - G_small[i], H[k] - H_small[i]
+                next_nodes.extend([small, large])
+            open_nodes, G, H, rows = next_nodes, G_next, H_next, active
+
+        return tree.finalize(), row_node
+
+    def fit(self, bins, labels, verbose = False):
+        bins = np.asfortranarray(bins, dtype = np.uint8)
+        y = np.asarray(labels, dtype = np.float32)
+        n = len(y)
+        if self.center_bias:
+            p = np.clip(y.mean(), 1e-6, 1 - 1e-6)
+            self.bias = float(np.log(p / (1 - p)))
+        scores = np.full(n, self.bias, dtype = np.float32)
+        self.trees = []
+
+        with ThreadPoolExecutor(self.n_threads) as pool:
+            for t in range(self.n_trees):
+                start = time.perf_counter()
+                p = _sigmoid(scores)
+                grad = (p - y).astype(np.float32)
+                hess = np.maximum(p * (1 - p), 1e-16).astype(np.float32)
+                tree, leaf_of_row = self._grow_tree(pool, bins, grad, hess)
+                scores += tree.value[leaf_of_row]
+                self.trees.append(tree)
+                if verbose:
+                    print('tree {:3d} : {:.3f}s'.format(t, time.perf_counter() - start))
+        return self
+
+    def decision_function(self, bins):
+        bins = np.asarray(bins, dtype = np.uint8)
+        scores = np.full(len(bins), self.bias, dtype = np.float32)
+        rows = np.arange(len(bins))
+        for tree in self.trees:
+            node = np.zeros(len(bins), dtype = np.int32)
+            for _ in range(tree.depth):
+                split = tree.left[node] >= 0
+                feature = np.maximum(tree.feature[node], 0)
+                go_right = bins[rows, feature] > tree.threshold[node]
+                child = np.where(go_right, tree.right[node], tree.left[node])
+                node = np.where(split, child, node)
+            scores += tree.value[node]
+        return scores
+
+    def predict_proba(self, bins):
+        p = _sigmoid(self.decision_function(bins))
+        return np.stack([1 - p, p], axis = 1)
+
+def synthetic_rows(n, n_features = 8, seed = 0, chunk_size = 1 << 20):
+    # Synthetic numeric DataFrame with a non-linear binary label, generated in chunks.
+    import pandas as pd
+
+    rng = np.random.RandomState(seed)
+    X = np.empty((n, n_features), dtype = np.float32)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        X[start:stop] = rng.randn(stop - start, n_features)
+    logit = X[:, 0] * X[:, 1] + np.sin(2 * X[:, 2]) + 0.5 * X[:, 3] - (X[:, 4] > 1)
+    y = (logit + 0.5 * rng.randn(n).astype(np.float32) > 0).astype(np.float32)
+    df = pd.DataFrame(X, columns = ['x{}'.format(i) for i in range(n_features)], copy = False)
+    return df, y
+
+def bincount_gil_check(n = 10 ** 7, seconds = 0.2):
+    # Share of its solo speed that a pure-python thread keeps while the main thread runs
+    # np.bincount : about 0 if bincount holds the GIL (threads cannot overlap), about 1 if it
+    # releases it on a multi-core machine (about 0.5 on a single core, which is time-sliced).
+    rng = np.random.RandomState(0)
+    key = rng.randint(0, 64 * MAX_BINS, n).astype(np.intp)
+    weights = rng.rand(n)
+    counter = [0]
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            counter[0] += 1
+
+    thread = threading.Thread(target = spin)
+    thread.start()
+    try:
+        time.sleep(seconds)
+        start, before = time.perf_counter(), counter[0]
+        time.sleep(seconds)
+        solo_rate = (counter[0] - before) / (time.perf_counter() - start)
+        start, before = time.perf_counter(), counter[0]
+        np.bincount(key, weights = weights, minlength = 64 * MAX_BINS)
+        rate = (counter[0] - before) / (time.perf_counter() - start)
+    finally:
+        stop.set()
+        thread.join()
+    return rate / max(solo_rate, 1e-9)
+
+def scaling_benchmark(sizes = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7), n_trees = 5, max_depth = 6,
+        thread_counts = None):
+    # s/tree per thread count (the speedup is only real where bincount_gil_check() > 0), and the
+    # peak memory of fit() beyond the bin matrix, per row (tracemalloc sees numpy buffers).
+    thread_counts = thread_counts or sorted({1, 2, os.cpu_count() or 1})
+    print('{:>10s} {:>8s} {:>12s} {:>12s} {:>10s} {:>12s}'.format('rows', 'threads',
+            'quantize(s)', 's/tree', 'bins MB', 'extra B/row'))
+    for n in sizes:
+        df, y = synthetic_rows(n)
+        start = time.perf_counter()
+        quantizer = Quantizer(numeric_columns = list(df.columns)).fit(df)
+        bins = quantizer.transform(df)
+        quantize_time = time.perf_counter() - start
+        del df
+        for threads in thread_counts:
+            model = HistogramBoostedTreesClassifier(n_trees = n_trees, max_depth = max_depth,
+                    n_threads = threads)
+            tracemalloc.start()
+            start = time.perf_counter()
+            model.fit(bins, y)
+            per_tree = (time.perf_counter() - start) / n_trees
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('{:>10,d} {:>8d} {:>12.2f} {:>12.3f} {:>10.1f} {:>12.1f}'.format(n, threads,
+                    quantize_time, per_tree, bins.nbytes / 2 ** 20, peak / float(n)))
+
+if __name__ == '__main__':
+    import pandas as pd
+    import tensorflow as tf
+
+    dftrain = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/train.csv')
+    dfeval = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/eval.csv')
+    y_train = dftrain.pop('survived')
+    y_eval = dfeval.pop('survived')
+
+    CATEGORICAL_COLUMNS = ['sex', 'n_siblings_spouses', 'parch', 'class', 'deck', 'embark_town',
+            'alone']
+    NUMERIC_COLUMNS = ['age', 'fare']
+
+    # tutorial19 의 BoostedTreesClassifier
+    def one_hot_cat_column(feature_name, vocab):
+        return tf.feature_column.indicator_column(
+                tf.feature_column.categorical_column_with_vocabulary_list(feature_name, vocab))
+
+    feature_columns = []
+    for feature_name in CATEGORICAL_COLUMNS:
+        feature_columns.append(one_hot_cat_column(feature_name, dftrain[feature_name].unique()))
+    for feature_name in NUMERIC_COLUMNS:
+        feature_columns.append(tf.feature_column.numeric_column(feature_name, dtype = tf.float32))
+
+    NUM_EXAMPLES = len(y_train)
+    def make_input_fn(X, y, n_epochs = None, shuffle = True):
+        def input_fn():
+            dataset = tf.data.Dataset.from_tensor_slices((dict(X), y))
+            if shuffle:
+                dataset = dataset.shuffle(NUM_EXAMPLES)
+            return dataset.repeat(n_epochs).batch(NUM_EXAMPLES)
+        return input_fn
+
+    est = tf.estimator.BoostedTreesClassifier(feature_columns, n_batches_per_layer = 1)
+    est.train(make_input_fn(dftrain, y_train), max_steps = 100)
+    result = est.evaluate(make_input_fn(dfeval, y_eval, shuffle = False, n_epochs = 1))
+    est_accuracy = float(result['accuracy'])
+    print('BoostedTreesClassifier accuracy : {:.4f}'.format(est_accuracy))
+
+    # 같은 모델을 히스토그램 방식으로 훈련
+    # max_steps = 100 에서 한 스텝은 한 층이므로, 깊이 6 트리 약 16개에 해당
+    quantizer = Quantizer(CATEGORICAL_COLUMNS, NUMERIC_COLUMNS).fit(dftrain)
+    model = HistogramBoostedTreesClassifier(n_trees = 100 // 6)
+    model.fit(quantizer.transform(dftrain), y_train.values)
+    probs = model.predict_proba(quantizer.transform(dfeval))[:, 1]
+    accuracy = float(np.mean((probs > 0.5) == y_eval.values))
+    print('HistogramBoostedTreesClassifier accuracy : {:.4f}'.format(accuracy))
+    # 구간 경계가 다르므로 (estimator 는 분위수 스케치) 완전히 같지는 않음
+    assert abs(accuracy - est_accuracy) <= 0.03, (accuracy, est_accuracy)
+
+    print('np.bincount 중 다른 파이썬 스레드의 속도 비율 : {:.2f} (CPU {} 개)'.format(
+            bincount_gil_check(), os.cpu_count()))
+    scaling_benchmark()
@@ -0,0 +1,212 @@
+# https://www.tensorflow.org/tutorials/estimator/boosted_trees_model_understanding
+# 개요 : 훈련된 BoostedTreesClassifier / BoostedTreesRegressor 의 체크포인트에서 트리 앙상블과
+# 버킷 경계(bucket boundaries)를 읽어, 노드마다 연속된 넘파이 배열로 펼침
+
+import re
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+try:
+    from tensorflow.core.kernels.boosted_trees import boosted_trees_pb2
+except ImportError:
+    # TF 2.9+ wheels don't ship it : boosted_trees_pb2.py next to this file is generated from
+    # the same tensorflow/core/kernels/boosted_trees/boosted_trees.proto, so checkpoints of
+    # boosted trees estimators can still be read there.
+    try:
+        import boosted_trees_pb2
+    except ImportError as e:
+        raise ImportError('Reading boosted trees checkpoints needs the TreeEnsemble proto : '
+                'TensorFlow <= 2.8 bundles it (and is the last with BoostedTrees estimators), '
+                'newer versions use boosted_trees_pb2.py of this repository, which needs '
+                'protobuf >= 3.20') from e
+
+_BOUNDARIES_PATTERN = re.compile(r'_bucket_boundaries_(\d+)$')
+
+class TreeEnsembleArrays(object):
+    # Flattened tree ensemble.
+    # Per node (all trees back to back) : feature, threshold, left, right, value.
+    # 'left' / 'right' are global node indices (-1 for leaves), 'value' is the leaf value for
+    # leaves and the original leaf value for split nodes. Within one tree, node values already
+    # include their parents', so a tree's output is simply the value of the leaf reached.
+
+    def __init__(self, feature, threshold, left, right, value, tree_offsets, tree_weights,
+            feature_specs, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.tree_offsets = tree_offsets
+        self.tree_weights = tree_weights
+        self.feature_specs = feature_specs
+        # Name of the feature column behind every bucketized feature id (like
+        # est._feature_col_names), and the unique names in sorted order.
+        self.feature_names = feature_names
+        self.column_names = sorted(set(feature_names))
+        self.feature_to_column = np.array([self.column_names.index(name)
+                for name in feature_names], dtype = np.int32)
+        self.max_depth = _max_depth(left, right)
+
+    @property
+    def n_trees(self):
+        return len(self.tree_weights)
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    @property
+    def is_leaf(self):
+        return self.left < 0
+
+    def bucketize(self, features):
+        # Raw feature dict / DataFrame -> [n, n_features] bucket ids, the same values the
+        # estimator feeds to its trees.
+        columns = {}
+        vocabulary_ids = {}
+        result = None
+        for j, spec in enumerate(self.feature_specs):
+            kind, key = spec[0], spec[1]
+            if key not in columns:
+                columns[key] = np.asarray(features[key])
+                if columns[key].ndim == 1:
+                    columns[key] = columns[key][:, None]
+            values = columns[key]
+            if result is None:
+                result = np.empty((len(values), self.n_features), dtype = np.int32)
+            if kind == 'numeric':
+                dimension, boundaries = spec[2], spec[3]
+                x = values[:, dimension].astype(np.float32)
+                # boosted_trees_bucketize : lower bound, values past the last boundary stay in
+                # the last bucket, and NaN (false against every boundary) lands in bucket 0.
+                buckets = np.searchsorted(boundaries, x, side = 'left')
+                buckets[np.isnan(x)] = 0
+                result[:, j] = np.clip(buckets, 0, max(len(boundaries) - 1, 0))
+            else:
+                vocabulary_index, category = spec[2], spec[3]
+                if key not in vocabulary_ids:
+                    vocabulary_ids[key] = _lookup(vocabulary_index, values[:, 0])
+                result[:, j] = vocabulary_ids[key] == category
+        return result
+
+    def tree_slice(self, t):
+        return slice(self.tree_offsets[t], self.tree_offsets[t + 1])
+
+    def predict_logits(self, bucketized):
+        # Reference traversal, one tree at a time.
+        n = len(bucketized)
+        rows = np.arange(n)
+        logits = np.zeros(n, dtype = np.float64)
+        for t in range(self.n_trees):
+            node = np.full(n, self.tree_offsets[t], dtype = np.int64)
+            for _ in range(self.max_depth):
+                split = self.left[node] >= 0
+                if not split.any():
+                    break
+                feature = np.maximum(self.feature[node], 0)
+                go_left = bucketized[rows, feature] <= self.threshold[node]
+                node = np.where(split, np.where(go_left, self.left[node], self.right[node]), node)
+            logits += self.tree_weights[t] * self.value[node]
+        return logits
+
+def _lookup(vocabulary_index, values):
+    # Vocabulary ids (-1 when out of vocabulary), looking up each distinct value once.
+    codes, unique = pd.factorize(values)
+    ids = np.array([vocabulary_index.get(v, -1) for v in unique.tolist()] + [-1], dtype = np.int64)
+    return ids[codes] # 결측값의 코드 -1 은 마지막의 -1 을 가리킴
+
+def _max_depth(left, right):
+    depth = np.zeros(len(left), dtype = np.int32)
+    for node in range(len(left)):
+        if left[node] >= 0:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max()) if len(depth) else 0
+
+def _feature_specs(feature_columns, boundaries):
+    # Same feature id layout as the estimator : columns sorted by name, indicator columns
+    # unstacked into one binary feature per bucket, numeric columns one feature per dimension.
+    specs = []
+    names = []
+    stream = 0
+    for column in sorted(feature_columns, key = lambda c: c.name):
+        kind = type(column).__name__
+        if kind == 'IndicatorColumn':
+            categorical = column.categorical_column
+            if type(categorical).__name__ != 'VocabularyListCategoricalColumn' or \
+                    categorical.num_oov_buckets:
+                raise ValueError('Only indicator columns over vocabulary lists without OOV '
+                        'buckets are supported, got {}'.format(categorical.name))
+            vocabulary_index = {v : i for i, v in enumerate(categorical.vocabulary_list)}
+            for category in range(len(categorical.vocabulary_list)):
+                specs.append(('indicator', categorical.key, vocabulary_index, category))
+                names.append(categorical.name)
+        elif kind == 'NumericColumn':
+            width = int(np.prod(column.shape)) if column.shape else 1
+            for dimension in range(width):
+                specs.append(('numeric', column.key, dimension, boundaries[stream]))
+                names.append(column.name)
+                stream += 1
+        else:
+            raise ValueError('Unsupported feature column type : {}'.format(kind))
+    return specs, names
+
+def export_tree_ensemble(est, feature_columns, checkpoint_path = None):
+    # Reads the latest (or given) checkpoint of a boosted trees estimator.
+    reader = tf.train.load_checkpoint(checkpoint_path or est.model_dir)
+    names = reader.get_variable_to_shape_map()
+
+    serialized_key = [name for name in names if name.endswith(':0_serialized')]
+    if len(serialized_key) != 1:
+        raise ValueError('Expected one tree ensemble in the checkpoint, found {}'.format(
+                serialized_key))
+    ensemble = boosted_trees_pb2.TreeEnsemble.FromString(reader.get_tensor(serialized_key[0]))
+
+    boundaries = {}
+    for name in names:
+        match = _BOUNDARIES_PATTERN.search(name)
+        if match:
+            boundaries[int(match.group(1))] = np.asarray(reader.get_tensor(name), np.float32)
+    boundaries = [boundaries[i] for i in range(len(boundaries))]
+
+    specs, feature_names = _feature_specs(feature_columns, boundaries)
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    offsets = [0]
+    for tree in ensemble.trees:
+        base = offsets[-1]
+        for node in tree.nodes:
+            kind = node.WhichOneof('node')
+            if kind == 'leaf':
+                if node.leaf.WhichOneof('leaf') == 'vector':
+                    raise ValueError('Multi-class (vector) leaves are not supported')
+                feature.append(-1)
+                threshold.append(0)
+                left.append(-1)
+                right.append(-1)
+                value.append(node.leaf.scalar)
+            elif kind == 'bucketized_split':
+                split = node.bucketized_split
+                if split.dimension_id:
+                    raise ValueError('Multi-dimensional splits are not supported')
+                feature.append(split.feature_id)
+                threshold.append(split.threshold)
+                left.append(base + split.left_id)
+                right.append(base + split.right_id)
+                value.append(node.metadata.original_leaf.scalar)
+            else:
+                raise ValueError('Unsupported node type : {}'.format(kind))
+        offsets.append(base + len(tree.nodes))
+
+    return TreeEnsembleArrays(
+            feature = np.array(feature, dtype = np.int32),
+            threshold = np.array(threshold, dtype = np.int32),
+            left = np.array(left, dtype = np.int32),
+            right = np.array(right, dtype = np.int32),
+            value = np.array(value, dtype = np.float32),
+            tree_offsets = np.array(offsets, dtype = np.int64),
+            tree_weights = np.array(ensemble.tree_weights, dtype = np.float32),
+            feature_specs = specs,
+            feature_names = feature_names)
@@ -0,0 +1,201 @@
+# https://www.tensorflow.org/tutorials/estimator/boosted_trees_model_understanding
+# 개요 : experimental_predict_with_explanations 처럼 예시마다 dict 를 만드는 대신, 내보낸 트리
+# 앙상블을 청크 단위로 벡터화 순회하여 방향성 특성 기여도(DFC)를 (예시 수, 특성 수) float32 배열로
+# 바로 계산. 평균 |DFC| 와 특성별 히스토그램은 청크마다 누적
+
+import time
+
+import numpy as np
+
+from tutorial20_boostedTreesExport import export_tree_ensemble
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+def _identity(x):
+    return x
+
+def activation_for(est):
+    # DFCs live in probability space for classifiers and in logit space for regressors.
+    return _sigmoid if 'Classifier' in type(est).__name__ else _identity
+
+def predict_dfc(ensemble, bucketized, activation = _sigmoid):
+    # bucketized : [n, n_features] from ensemble.bucketize().
+    # Returns (dfc [n, n_columns] float32, bias, logits [n]); columns follow
+    # ensemble.column_names. For every example sum(dfc) + bias == activation(logits).
+    # Same path walk as the estimator's debug outputs : tree 0's root value is the bias, every
+    # split then credits the change of the activated running logit to its feature column, and
+    # the root of a later tree is reached from the running logit of the trees before it.
+    n = len(bucketized)
+    rows = np.arange(n)
+    dfc = np.zeros((n, len(ensemble.column_names)), dtype = np.float64)
+    past = np.zeros(n, dtype = np.float64)
+    bias = 0.0
+
+    for t in range(ensemble.n_trees):
+        weight = ensemble.tree_weights[t]
+        root = ensemble.tree_offsets[t]
+        node = np.full(n, root, dtype = np.int64)
+        if t == 0:
+            bias = float(activation(weight * ensemble.value[root]))
+            current = np.full(n, bias)
+        else:
+            current = activation(past)
+        for _ in range(ensemble.max_depth):
+            split = np.flatnonzero(ensemble.left[node] >= 0)
+            if not len(split):
+                break
+            parent = node[split]
+            feature = ensemble.feature[parent]
+            go_left = bucketized[split, feature] <= ensemble.threshold[parent]
+            child = np.where(go_left, ensemble.left[parent], ensemble.right[parent])
+            value = activation(past[split] + weight * ensemble.value[child])
+            # 한 예시는 스텝마다 하나의 열만 갱신하므로 인덱스 중복이 없음
+            dfc[split, ensemble.feature_to_column[feature]] += value - current[split]
+            current[split] = value
+            node[split] = child
+        past += weight * ensemble.value[node]
+
+    return dfc.astype(np.float32), bias, past
+
+class DfcAggregator(object):
+    # Streaming global summaries : mean |DFC|, mean DFC and per-feature histograms with fixed
+    # bin edges, so chunks can be folded in without keeping the per-example array.
+
+    def __init__(self, column_names, bins = np.linspace(-0.5, 0.5, 101)):
+        self.column_names = list(column_names)
+        self.bins = np.asarray(bins, dtype = np.float64)
+        self.count = 0
+        self.abs_sum = np.zeros(len(self.column_names), dtype = np.float64)
+        self.sum = np.zeros(len(self.column_names), dtype = np.float64)
+        # 범위 밖의 값은 양 끝 구간에 포함
+        self.histograms = np.zeros((len(self.column_names), len(self.bins) - 1), dtype = np.int64)
+
+    def update(self, dfc):
+        self.count += len(dfc)
+        self.abs_sum += np.abs(dfc).sum(axis = 0, dtype = np.float64)
+        self.sum += dfc.sum(axis = 0, dtype = np.float64)
+        n_bins = len(self.bins) - 1
+        ids = np.clip(np.searchsorted(self.bins, dfc, side = 'right') - 1, 0, n_bins - 1)
+        offsets = np.arange(len(self.column_names)) * n_bins
+        self.histograms += np.bincount((ids + offsets).ravel(),
+                minlength = len(self.column_names) * n_bins).reshape(self.histograms.shape)
+
+    @property
+    def mean_abs(self):
+        return self.abs_sum / max(self.count, 1)
+
+    @property
+    def mean(self):
+        return self.sum / max(self.count, 1)
+
+    def mean_abs_series(self):
+        import pandas as pd
+        return pd.Series(self.mean_abs, index = self.column_names).sort_values()
+
+class DfcExplainer(object):
+    # Batched replacement for est.experimental_predict_with_explanations().
+
+    def __init__(self, est, feature_columns, checkpoint_path = None):
+        self.ensemble = export_tree_ensemble(est, feature_columns, checkpoint_path)
+        self.activation = activation_for(est)
+        self.column_names = self.ensemble.column_names
+
+    def explain_chunks(self, features, chunk_size = 65536):
+        # Yields (start, dfc, bias, probabilities) per chunk of rows.
+        columns = {key : np.asarray(features[key])
+                for key in set(spec[1] for spec in self.ensemble.feature_specs)}
+        n = len(next(iter(columns.values())))
+        for start in range(0, n, chunk_size):
+            chunk = {key : values[start : start + chunk_size] for key, values in columns.items()}
+            dfc, bias, logits = predict_dfc(self.ensemble, self.ensemble.bucketize(chunk),
+                    self.activation)
+            yield start, dfc, bias, self.activation(logits)
+
+    def explain(self, features, chunk_size = 65536):
+        # Returns (dfc [n, n_columns] float32, bias, probabilities [n]).
+        dfcs, outputs = [], []
+        bias = None
+        for _, dfc, bias, output in self.explain_chunks(features, chunk_size):
+            dfcs.append(dfc)
+            outputs.append(output)
+        return np.concatenate(dfcs), bias, np.concatenate(outputs)
+
+    def aggregate(self, features, chunk_size = 65536, bins = np.linspace(-0.5, 0.5, 101)):
+        aggregator = DfcAggregator(self.column_names, bins)
+        for _, dfc, _, _ in self.explain_chunks(features, chunk_size):
+            aggregator.update(dfc)
+        return aggregator
+
+    def to_frame(self, dfc):
+        import pandas as pd
+        return pd.DataFrame(dfc, columns = self.column_names)
+
+if __name__ == '__main__':
+    import pandas as pd
+    import tensorflow as tf
+
+    dftrain = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/train.csv')
+    dfeval = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/eval.csv')
+    y_train = dftrain.pop('survived')
+    y_eval = dfeval.pop('survived')
+
+    fc = tf.feature_column
+    CATEGORICAL_COLUMNS = ['sex', 'n_siblings_spouses', 'parch', 'class', 'deck', 'embark_town',
+            'alone']
+    NUMERIC_COLUMNS = ['age', 'fare']
+
+    feature_columns = []
+    for feature_name in CATEGORICAL_COLUMNS:
+        vocabulary = dftrain[feature_name].unique()
+        feature_columns.append(fc.indicator_column(
+                fc.categorical_column_with_vocabulary_list(feature_name, vocabulary)))
+    for feature_name in NUMERIC_COLUMNS:
+        feature_columns.append(fc.numeric_column(feature_name, dtype = tf.float32))
+
+    NUM_EXAMPLES = len(y_train)
+    def make_input_fn(X, y, n_epochs = None, shuffle = True):
+        def input_fn():
+            dataset = tf.data.Dataset.from_tensor_slices((X.to_dict(orient = 'list'), y))
+            if shuffle:
+                dataset = dataset.shuffle(NUM_EXAMPLES)
+            return dataset.repeat(n_epochs).batch(NUM_EXAMPLES)
+        return input_fn
+    eval_input_fn = make_input_fn(dfeval, y_eval, shuffle = False, n_epochs = 1)
+
+    params = {'n_trees' : 50, 'max_depth' : 3, 'n_batches_per_layer' : 1, 'center_bias' : True}
+    est = tf.estimator.BoostedTreesClassifier(feature_columns, **params)
+    est.train(make_input_fn(dftrain, y_train), max_steps = 100)
+
+    # tutorial20 의 방식 (예시마다 dict)
+    start = time.perf_counter()
+    pred_dicts = list(est.experimental_predict_with_explanations(eval_input_fn))
+    df_dfc = pd.DataFrame([pred['dfc'] for pred in pred_dicts])
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    explainer = DfcExplainer(est, feature_columns)
+    dfc, bias, probs = explainer.explain(dfeval)
+    batched_time = time.perf_counter() - start
+
+    # 동등성 확인
+    np.testing.assert_allclose(dfc, df_dfc[explainer.column_names].values, atol = 1e-5)
+    np.testing.assert_allclose(bias, pred_dicts[0]['bias'], atol = 1e-6)
+    np.testing.assert_allclose(probs, [pred['probabilities'][1] for pred in pred_dicts],
+            atol = 1e-5)
+    np.testing.assert_allclose(dfc.sum(axis = 1) + bias, probs, atol = 1e-5)
+    print('experimental_predict_with_explanations 와 동일한 결과')
+
+    aggregator = explainer.aggregate(dfeval, chunk_size = 100)
+    np.testing.assert_allclose(aggregator.mean_abs, np.abs(dfc).mean(axis = 0), atol = 1e-6)
+    print(aggregator.mean_abs_series().tail(8))
+
+    print('per-example dicts : {:.2f}s'.format(reference_time))
+    print('batched           : {:.2f}s (including export)'.format(batched_time))
+
+    # 큰 입력에서의 처리량 (dict 목록 없이 청크마다 누적)
+    large = dfeval.sample(1000000, replace = True, random_state = 0).reset_index(drop = True)
+    start = time.perf_counter()
+    aggregator = explainer.aggregate(large)
+    elapsed = time.perf_counter() - start
+    print('{} rows : {:.2f}s ({:.0f} rows/s)'.format(len(large), elapsed, len(large) / elapsed))
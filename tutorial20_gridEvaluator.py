@@ -0,0 +1,223 @@
+# https://www.tensorflow.org/tutorials/estimator/boosted_trees_model_understanding
+# 개요 : 등고선 그리기용 predict(est) 의 빠른 경로. 훈련된 회귀 모델을 프로세스 안의 호출 가능한
+# 객체 (부스팅 트리는 넘파이 배열 앙상블, 그 밖의 모델은 SavedModel 시그니처) 로 한 번만 내보내고,
+# meshgrid 전체를 청크 단위 벡터 호출로 평가. 결과는 (모델 체크섬, 격자) 로 캐시하고, 체크섬은
+# 체크포인트 상태 (경로, 'checkpoint' 파일의 수정 시각, 스텝) 가 바뀔 때만 다시 계산
+
+import collections
+import glob
+import hashlib
+import os
+import re
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tutorial18_batchPredictor import BatchPredictor
+
+def model_checksum(est):
+    # SHA-1 of the latest checkpoint files : changes whenever the estimator trains further.
+    prefix = tf.train.latest_checkpoint(est.model_dir)
+    if prefix is None:
+        raise ValueError('{} has no checkpoint'.format(est.model_dir))
+    digest = hashlib.sha1(type(est).__name__.encode())
+    for path in sorted(glob.glob(prefix + '.*')):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def checkpoint_state(est):
+    # Cheap stand-in for model_checksum : (estimator type, latest checkpoint prefix, mtime of the
+    # 'checkpoint' state file, latest step). Changes whenever a new checkpoint is written.
+    prefix = tf.train.latest_checkpoint(est.model_dir)
+    if prefix is None:
+        raise ValueError('{} has no checkpoint'.format(est.model_dir))
+    state_file = os.path.join(est.model_dir, 'checkpoint')
+    step = re.search(r'-(\d+)$', prefix)
+    return (type(est).__name__, os.path.abspath(prefix), os.stat(state_file).st_mtime_ns,
+            int(step.group(1)) if step else None)
+
+class _LRUCache(object):
+    # Dict keeping at most max_size entries, dropping the least recently used one.
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last = False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+def grid_key(grid):
+    # grid : {feature name : meshgrid array}, all of the same shape.
+    key = []
+    for name in sorted(grid):
+        values = np.ascontiguousarray(grid[name])
+        key.append((name, values.shape, values.dtype.str,
+                hashlib.sha1(values.tobytes()).hexdigest()))
+    return tuple(key)
+
+def _tree_callable(est, feature_columns):
+    # Imported here : only boosted trees need the exporter (and its TreeEnsemble proto).
+    from tutorial20_boostedTreesExport import export_tree_ensemble
+    ensemble = export_tree_ensemble(est, feature_columns)
+    def fn(features):
+        return ensemble.predict_logits(ensemble.bucketize(features)).astype(np.float32)
+    return fn
+
+def _saved_model_callable(est, feature_columns, chunk_size):
+    predictor = BatchPredictor(est, feature_columns)
+    def fn(features):
+        return predictor.predict(features, chunk_size,
+                predict_keys = ['predictions'])['predictions'][:, 0]
+    return fn
+
+class GridEvaluator(object):
+    # evaluate(est, grid) returns the regressor's predictions with the grid's shape.
+    # feature_columns are the columns the estimators were built with. Boosted trees regressors
+    # are evaluated from their exported arrays; any other estimator goes through its
+    # SavedModel 'predict' signature. At most max_models exported models and max_results grids
+    # are kept (least recently used dropped first).
+
+    def __init__(self, feature_columns, chunk_size = 65536, max_models = 4, max_results = 16):
+        self.feature_columns = feature_columns
+        self.chunk_size = chunk_size
+        self._checksums = _LRUCache(4 * max_models)
+        self._callables = _LRUCache(max_models)
+        self._results = _LRUCache(max_results)
+
+    def _checksum(self, est):
+        # The checkpoint files are only hashed when the checkpoint state changed.
+        state = checkpoint_state(est)
+        checksum = self._checksums.get(state)
+        if checksum is None:
+            checksum = model_checksum(est)
+            self._checksums.put(state, checksum)
+        return checksum
+
+    def _callable(self, est, checksum):
+        fn = self._callables.get(checksum)
+        if fn is None:
+            if type(est).__name__ == 'BoostedTreesRegressor':
+                fn = _tree_callable(est, self.feature_columns)
+            else:
+                fn = _saved_model_callable(est, self.feature_columns, self.chunk_size)
+            self._callables.put(checksum, fn)
+        return fn
+
+    def evaluate(self, est, grid):
+        checksum = self._checksum(est)
+        key = (checksum, grid_key(grid))
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        names = sorted(grid)
+        shape = np.shape(grid[names[0]])
+        flat = {name : np.asarray(grid[name], dtype = np.float32).ravel() for name in names}
+        n = flat[names[0]].size
+        fn = self._callable(est, checksum)
+
+        result = np.empty(n, dtype = np.float32)
+        for start in range(0, n, self.chunk_size):
+            chunk = {name : values[start : start + self.chunk_size]
+                    for name, values in flat.items()}
+            result[start : start + self.chunk_size] = fn(chunk)
+        result = result.reshape(shape)
+        result.flags.writeable = False # 캐시된 배열은 읽기 전용
+        self._results.put(key, result)
+        return result
+
+    def clear(self):
+        self._checksums.clear()
+        self._callables.clear()
+        self._results.clear()
+
+if __name__ == '__main__':
+    import pandas as pd
+    from numpy.random import uniform, seed
+
+    # tutorial20 과 같은 데이터와 격자
+    seed(0)
+    npts = 5000
+    x = uniform(-2, 2, npts)
+    y = uniform(-2, 2, npts)
+    z = x * np.exp(-x**2 - y**2)
+    df = pd.DataFrame({'x': x, 'y': y, 'z' : z})
+    xi = np.linspace(-2.0, 2.0, 200)
+    yi = np.linspace(-2.1, 2.1, 210)
+    xi, yi = np.meshgrid(xi, yi)
+    df_predict = pd.DataFrame({'x' : xi.flatten(), 'y' : yi.flatten()})
+    predict_shape = xi.shape
+
+    def make_input_fn(X, y, n_epochs = None, shuffle = True):
+        def input_fn():
+            dataset = tf.data.Dataset.from_tensor_slices((X.to_dict(orient = 'list'), y))
+            if shuffle:
+                dataset = dataset.shuffle(len(y))
+            return dataset.repeat(n_epochs).batch(len(y))
+        return input_fn
+
+    # tutorial20 의 방식 (격자점마다 dict)
+    def predict(est):
+        predict_input_fn = lambda: tf.data.Dataset.from_tensors(dict(df_predict))
+        preds = np.array([p['predictions'][0] for p in est.predict(predict_input_fn)])
+        return preds.reshape(predict_shape)
+
+    fc = [tf.feature_column.numeric_column('x'), tf.feature_column.numeric_column('y')]
+    train_input_fn = make_input_fn(df, df.z)
+    evaluator = GridEvaluator(fc)
+    grid = {'x' : xi, 'y' : yi}
+
+    linear = tf.estimator.LinearRegressor(fc)
+    linear.train(train_input_fn, max_steps = 500)
+    trees = tf.estimator.BoostedTreesRegressor(fc, n_batches_per_layer = 1, n_trees = 37)
+    trees.train(train_input_fn, max_steps = 500)
+
+    for name, est in [('LinearRegressor', linear), ('BoostedTreesRegressor', trees)]:
+        start = time.perf_counter()
+        reference = predict(est)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = evaluator.evaluate(est, grid)
+        first_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cached = evaluator.evaluate(est, grid)
+        cached_time = time.perf_counter() - start
+
+        np.testing.assert_allclose(first, reference, rtol = 1e-5, atol = 1e-6)
+        assert cached is first
+        print('{:<22s} predict(est) : {:.2f}s, evaluator : {:.3f}s (cached {:.4f}s)'.format(
+                name, reference_time, first_time, cached_time))
+
+    # 모델이 더 훈련되면 체크섬이 바뀌어 다시 계산
+    before = evaluator.evaluate(trees, grid)
+    trees.train(train_input_fn, max_steps = 600)
+    after = evaluator.evaluate(trees, grid)
+    np.testing.assert_allclose(after, predict(trees), rtol = 1e-5, atol = 1e-6)
+    print('추가 훈련 후 다시 계산 :', not np.array_equal(before, after))
+
+    # 캐시 크기 제한 - 격자가 max_results 개를 넘으면 오래된 결과부터 버림
+    small = GridEvaluator(fc, max_models = 1, max_results = 2)
+    for scale in [1.0, 0.5, 0.25]:
+        small.evaluate(trees, {'x' : xi * scale, 'y' : yi * scale})
+    small.evaluate(linear, grid)
+    assert len(small._results) == 2 and len(small._callables) == 1
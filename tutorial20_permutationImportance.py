@@ -0,0 +1,145 @@
+# https://www.tensorflow.org/tutorials/estimator/boosted_trees_model_understanding
+# 개요 : 순열 특성 중요도를 특성마다 est.evaluate() 를 반복하는 대신, 모델을 한 번만 내보내고
+# (특성 x 반복 x 행) 크기로 쌓은 순열 복사본을 큰 배치 예측으로 한꺼번에 평가
+
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from tutorial18_batchPredictor import BatchPredictor, _as_columns
+
+def _accuracy(y_true, probabilities):
+    # y_true : [n], probabilities : [blocks, n, n_classes] -> [blocks]
+    return (probabilities.argmax(axis = -1) == y_true).mean(axis = -1)
+
+def _t_quantile(q, dof):
+    # Student t quantile from scipy when available, otherwise the normal quantile (slightly
+    # narrower intervals for few repeats).
+    try:
+        from scipy import stats
+    except ImportError:
+        return statistics.NormalDist().inv_cdf(q)
+    return stats.t.ppf(q, dof)
+
+def permutation_importances(est, X_eval, y_eval, features, n_repeats = 5, metric = _accuracy,
+        seed = 0, max_rows_per_call = 1 << 20, batch_size = 65536, confidence = 0.95,
+        predictor = None, feature_columns = None):
+    # Permutation feature importance with repeats and confidence intervals.
+    # predictor : a BatchPredictor of est, or None to export one from feature_columns.
+    # X_eval is never modified; permuted copies are built from read-only column arrays.
+    # Returns a DataFrame indexed by feature : mean, std, ci_low, ci_high, and one column per
+    # repeat.
+    if predictor is None:
+        if feature_columns is None:
+            raise ValueError('Either predictor or feature_columns is required')
+        predictor = BatchPredictor(est, feature_columns)
+    columns = _as_columns(X_eval)
+    y_true = np.asarray(y_eval)
+    n = len(y_true)
+    rng = np.random.RandomState(seed)
+
+    baseline = metric(y_true, predictor.predict(columns, batch_size,
+            predict_keys = ['probabilities'])['probabilities'][None])[0]
+
+    # 모든 (특성, 반복) 쌍. 순열은 미리 고정해서 분할 방식과 무관하게 결과가 같도록 함
+    jobs = [(f, rng.permutation(n)) for f in features for _ in range(n_repeats)]
+    blocks_per_call = max(1, max_rows_per_call // n)
+    scores = np.empty(len(jobs), dtype = np.float64)
+
+    for start in range(0, len(jobs), blocks_per_call):
+        chunk = jobs[start : start + blocks_per_call]
+        k = len(chunk)
+        stacked = {name : np.tile(values, k) for name, values in columns.items()}
+        for j, (feature, perm) in enumerate(chunk):
+            stacked[feature][j * n : (j + 1) * n] = columns[feature][perm]
+        probabilities = predictor.predict(stacked, batch_size,
+                predict_keys = ['probabilities'])['probabilities']
+        scores[start : start + k] = metric(y_true, probabilities.reshape((k, n, -1)))
+
+    drops = baseline - scores.reshape(len(features), n_repeats)
+    mean = drops.mean(axis = 1)
+    std = drops.std(axis = 1, ddof = 1) if n_repeats > 1 else np.zeros(len(features))
+    if n_repeats > 1:
+        half = _t_quantile(0.5 + confidence / 2, n_repeats - 1) * std / np.sqrt(n_repeats)
+    else:
+        half = np.full(len(features), np.nan)
+    result = pd.DataFrame({'mean' : mean, 'std' : std, 'ci_low' : mean - half,
+            'ci_high' : mean + half}, index = list(features))
+    for r in range(n_repeats):
+        result['repeat_{}'.format(r)] = drops[:, r]
+    result.attrs['baseline'] = baseline
+    return result
+
+if __name__ == '__main__':
+    import tensorflow as tf
+
+    dftrain = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/train.csv')
+    dfeval = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/eval.csv')
+    y_train = dftrain.pop('survived')
+    y_eval = dfeval.pop('survived')
+
+    fc = tf.feature_column
+    CATEGORICAL_COLUMNS = ['sex', 'n_siblings_spouses', 'parch', 'class', 'deck', 'embark_town',
+            'alone']
+    NUMERIC_COLUMNS = ['age', 'fare']
+
+    feature_columns = []
+    for feature_name in CATEGORICAL_COLUMNS:
+        vocabulary = dftrain[feature_name].unique()
+        feature_columns.append(fc.indicator_column(
+                fc.categorical_column_with_vocabulary_list(feature_name, vocabulary)))
+    for feature_name in NUMERIC_COLUMNS:
+        feature_columns.append(fc.numeric_column(feature_name, dtype = tf.float32))
+
+    NUM_EXAMPLES = len(y_train)
+    def make_input_fn(X, y, n_epochs = None, shuffle = True):
+        def input_fn():
+            dataset = tf.data.Dataset.from_tensor_slices((X.to_dict(orient = 'list'), y))
+            if shuffle:
+                dataset = dataset.shuffle(NUM_EXAMPLES)
+            return dataset.repeat(n_epochs).batch(NUM_EXAMPLES)
+        return input_fn
+
+    est = tf.estimator.BoostedTreesClassifier(feature_columns, n_trees = 50, max_depth = 3,
+            n_batches_per_layer = 1, center_bias = True)
+    est.train(make_input_fn(dftrain, y_train), max_steps = 100)
+
+    features = CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+
+    # tutorial20 의 직렬 방식 (특성마다 est.evaluate)
+    def serial_permutation_importances(est, X_eval, y_eval, features):
+        def accuracy_metric(X):
+            eval_input_fn = make_input_fn(X, y_eval, shuffle = False, n_epochs = 1)
+            return est.evaluate(input_fn = eval_input_fn)['accuracy']
+        baseline = accuracy_metric(X_eval)
+        imp = []
+        for col in features:
+            save = X_eval[col].copy()
+            X_eval[col] = np.random.permutation(X_eval[col])
+            imp.append(baseline - accuracy_metric(X_eval))
+            X_eval[col] = save
+        return np.array(imp)
+
+    start = time.perf_counter()
+    serial = serial_permutation_importances(est, dfeval.copy(), y_eval, features)
+    serial_time = time.perf_counter() - start
+
+    before = dfeval.copy()
+    start = time.perf_counter()
+    batched = permutation_importances(est, dfeval, y_eval, features, n_repeats = 1,
+            feature_columns = feature_columns)
+    batched_time = time.perf_counter() - start
+    pd.testing.assert_frame_equal(before, dfeval) # 호출자의 DataFrame 은 그대로
+
+    predictor = BatchPredictor(est, feature_columns)
+    start = time.perf_counter()
+    repeated = permutation_importances(est, dfeval, y_eval, features, n_repeats = 30,
+            predictor = predictor)
+    repeated_time = time.perf_counter() - start
+
+    print(repeated[['mean', 'std', 'ci_low', 'ci_high']].sort_values('mean'))
+    print('serial (1 repeat)   : {:.2f}s'.format(serial_time))
+    print('batched (1 repeat)  : {:.2f}s (including export)'.format(batched_time))
+    print('batched (30 repeats): {:.2f}s'.format(repeated_time))
@@ -0,0 +1,210 @@
+# https://www.tensorflow.org/tutorials/estimator/boosted_trees_model_understanding
+# 개요 : BoostedTreesClassifier 를 Estimator 의 predict 대신, 내보낸 넘파이 배열 앙상블로 채점하는
+# 추론 엔진. 버킷 경계를 원래 값의 임계값으로 바꿔 버킷화 단계를 없애고, 배치의 모든 트리를 한꺼번에
+# 깊이 단위로 순회. 트리 묶음마다 스레드 풀로 나눠 실행할 수 있음
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class TreeEnsembleEngine(object):
+    # Scores raw features with an exported TreeEnsembleArrays.
+    # A bucketized split 'bucket <= t' on boundaries b is the same test as 'x <= b[t]' on the raw
+    # value (and always true when t is the last bucket), and an indicator split is
+    # 'one_hot <= 0', so every node becomes a float threshold on a dense float32 matrix.
+    # The estimator bucketizes NaN into bucket 0, which always goes left; both traversal forms
+    # below test 'x > threshold' (false for NaN) to go right, so NaN goes left as well.
+    # Leaves point to themselves with an infinite threshold, which lets all trees advance
+    # max_depth steps in lock step without masks.
+
+    def __init__(self, ensemble, n_threads = 1, chunk_size = 16384, activation = 'sigmoid'):
+        self.ensemble = ensemble
+        self.n_threads = n_threads
+        self.chunk_size = chunk_size
+        self.activation = activation
+
+        n_nodes = len(ensemble.feature)
+        nodes = np.arange(n_nodes, dtype = np.int32)
+        leaf = ensemble.left < 0
+        self.feature = np.where(leaf, 0, ensemble.feature).astype(np.intp)
+        self.left = np.where(leaf, nodes, ensemble.left).astype(np.intp)
+        self.right = np.where(leaf, nodes, ensemble.right).astype(np.intp)
+        self.threshold = np.full(n_nodes, np.inf, dtype = np.float32)
+        for i in np.flatnonzero(~leaf):
+            spec = ensemble.feature_specs[ensemble.feature[i]]
+            t = ensemble.threshold[i]
+            if spec[0] == 'numeric':
+                boundaries = spec[3]
+                if t < len(boundaries) - 1:
+                    self.threshold[i] = boundaries[t]
+            else:
+                self.threshold[i] = 0 if t < 1 else np.inf
+        # 트리 가중치를 잎 값에 미리 곱해 둠
+        tree_of_node = np.repeat(np.arange(ensemble.n_trees), np.diff(ensemble.tree_offsets))
+        self.value = (ensemble.value * ensemble.tree_weights[tree_of_node]).astype(np.float64)
+        self.roots = ensemble.tree_offsets[:-1].astype(np.intp)
+        # 트리 성장 과정에서 자식 노드는 항상 (왼쪽, 오른쪽) 순서로 붙어 추가됨.
+        # Then the next node is left + (x > threshold) : one gather less per step.
+        self.adjacent_children = bool(np.all(self.right[~leaf] == self.left[~leaf] + 1))
+        self.max_depth = ensemble.max_depth
+        self._pool = ThreadPoolExecutor(n_threads) if n_threads > 1 else None
+
+    def feature_matrix(self, features):
+        # Raw feature dict / DataFrame -> [n, n_features] float32.
+        columns = {}
+        vocabulary_ids = {}
+        result = None
+        for j, spec in enumerate(self.ensemble.feature_specs):
+            kind, key = spec[0], spec[1]
+            if key not in columns:
+                columns[key] = np.asarray(features[key])
+                if columns[key].ndim == 1:
+                    columns[key] = columns[key][:, None]
+            values = columns[key]
+            if result is None:
+                result = np.empty((len(values), self.ensemble.n_features), dtype = np.float32)
+            if kind == 'numeric':
+                result[:, j] = values[:, spec[2]]
+            else:
+                if key not in vocabulary_ids:
+                    from tutorial20_boostedTreesExport import _lookup
+                    vocabulary_ids[key] = _lookup(spec[2], values[:, 0])
+                result[:, j] = vocabulary_ids[key] == spec[3]
+        return result
+
+    def _logits(self, X, roots):
+        # X : [n, n_features] -> summed (weighted) leaf values of the given trees, [n].
+        n, n_features = X.shape
+        flat = X.ravel()
+        offsets = (np.arange(n, dtype = np.intp) * n_features)[:, None]
+        node = np.broadcast_to(roots, (n, len(roots))).copy()
+        for _ in range(self.max_depth):
+            x = flat.take(offsets + self.feature.take(node))
+            if self.adjacent_children:
+                # 잎은 임계값이 inf 라서 항상 왼쪽 (자기 자신) 으로 감
+                node = self.left.take(node) + (x > self.threshold.take(node))
+            else:
+                node = np.where(x > self.threshold.take(node), self.right.take(node),
+                        self.left.take(node))
+        return self.value.take(node).sum(axis = 1)
+
+    def _chunk_logits(self, X):
+        if self._pool is None:
+            return self._logits(X, self.roots)
+        groups = np.array_split(self.roots, min(self.n_threads, len(self.roots)))
+        return sum(self._pool.map(lambda roots: self._logits(X, roots), groups))
+
+    def predict_logits(self, features):
+        X = features if isinstance(features, np.ndarray) else self.feature_matrix(features)
+        X = np.ascontiguousarray(X, dtype = np.float32)
+        logits = np.empty(len(X), dtype = np.float64)
+        for start in range(0, len(X), self.chunk_size):
+            logits[start : start + self.chunk_size] = self._chunk_logits(
+                    X[start : start + self.chunk_size])
+        return logits
+
+    def predict_proba(self, features):
+        # [n, 2] like the estimator's 'probabilities' for a binary classifier.
+        logits = self.predict_logits(features)
+        positive = 1 / (1 + np.exp(-logits))
+        return np.stack([1 - positive, positive], axis = 1).astype(np.float32)
+
+    def predict(self, features):
+        if self.activation == 'sigmoid':
+            return self.predict_proba(features)
+        return self.predict_logits(features).astype(np.float32)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+def export_engine(est, feature_columns, n_threads = 1, chunk_size = 16384):
+    # Imported here so the engine itself (numpy only) doesn't need TF or the TreeEnsemble proto.
+    from tutorial20_boostedTreesExport import export_tree_ensemble
+    activation = 'sigmoid' if 'Classifier' in type(est).__name__ else 'identity'
+    return TreeEnsembleEngine(export_tree_ensemble(est, feature_columns), n_threads,
+            chunk_size, activation)
+
+if __name__ == '__main__':
+    import os
+
+    import pandas as pd
+    import tensorflow as tf
+
+    dftrain = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/train.csv')
+    dfeval = pd.read_csv('https://storage.googleapis.com/tf-datasets/titanic/eval.csv')
+    y_train = dftrain.pop('survived')
+    y_eval = dfeval.pop('survived')
+
+    fc = tf.feature_column
+    CATEGORICAL_COLUMNS = ['sex', 'n_siblings_spouses', 'parch', 'class', 'deck', 'embark_town',
+            'alone']
+    NUMERIC_COLUMNS = ['age', 'fare']
+
+    feature_columns = []
+    for feature_name in CATEGORICAL_COLUMNS:
+        vocabulary = dftrain[feature_name].unique()
+        feature_columns.append(fc.indicator_column(
+                fc.categorical_column_with_vocabulary_list(feature_name, vocabulary)))
+    for feature_name in NUMERIC_COLUMNS:
+        feature_columns.append(fc.numeric_column(feature_name, dtype = tf.float32))
+
+    NUM_EXAMPLES = len(y_train)
+    def make_input_fn(X, y, n_epochs = None, shuffle = True):
+        def input_fn():
+            dataset = tf.data.Dataset.from_tensor_slices((X.to_dict(orient = 'list'), y))
+            if shuffle:
+                dataset = dataset.shuffle(NUM_EXAMPLES)
+            return dataset.repeat(n_epochs).batch(NUM_EXAMPLES)
+        return input_fn
+
+    est = tf.estimator.BoostedTreesClassifier(feature_columns, n_trees = 100, max_depth = 6,
+            n_batches_per_layer = 1, center_bias = True)
+    est.train(make_input_fn(dftrain, y_train), max_steps = 600)
+
+    large = dfeval.sample(200000, replace = True, random_state = 0).reset_index(drop = True)
+    y_large = np.zeros(len(large))
+
+    start = time.perf_counter()
+    reference = np.array([p['probabilities'] for p in est.predict(
+            make_input_fn(large, y_large, n_epochs = 1, shuffle = False))])
+    estimator_time = time.perf_counter() - start
+
+    engine = export_engine(est, feature_columns)
+    # 동등성 확인 - 확률이 1e-6 이내로 같은 지 (버킷화 경로와도 비교)
+    np.testing.assert_allclose(engine.predict_proba(large), reference, rtol = 0, atol = 1e-6)
+    ensemble = engine.ensemble
+    np.testing.assert_allclose(engine.predict_logits(large),
+            ensemble.predict_logits(ensemble.bucketize(large)), rtol = 0, atol = 1e-6)
+    # 결측값 (NaN) 도 estimator 와 같은 쪽으로 - 인접 자식 / 일반 경로 모두
+    missing = large[:2000].copy()
+    missing.loc[::3, 'age'] = np.nan
+    missing.loc[::5, 'fare'] = np.nan
+    missing_reference = np.array([p['probabilities'] for p in est.predict(
+            make_input_fn(missing, y_large[:2000], n_epochs = 1, shuffle = False))])
+    for adjacent_children in [engine.adjacent_children, False]:
+        engine.adjacent_children = adjacent_children
+        np.testing.assert_allclose(engine.predict_proba(missing), missing_reference, rtol = 0,
+                atol = 1e-6)
+    np.testing.assert_allclose(engine.predict_logits(missing),
+            ensemble.predict_logits(ensemble.bucketize(missing)), rtol = 0, atol = 1e-6)
+    print('Estimator 확률과의 최대 절대 차이 : {:.2e} (결측값 포함 {:.2e})'.format(
+            np.abs(engine.predict_proba(large) - reference).max(),
+            np.abs(engine.predict_proba(missing) - missing_reference).max()))
+
+    print('estimator.predict : {:>10.0f} rows/s'.format(len(large) / estimator_time))
+    X = engine.feature_matrix(large)
+    for n_threads in sorted(set([1, 2, 4, os.cpu_count()])):
+        engine = export_engine(est, feature_columns, n_threads = n_threads)
+        engine.predict_proba(X[:1000])
+        start = time.perf_counter()
+        probabilities = engine.predict_proba(large)
+        end_to_end = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.predict_proba(X)
+        traversal = time.perf_counter() - start
+        engine.close()
+        np.testing.assert_allclose(probabilities, reference, rtol = 0, atol = 1e-6)
+        print('engine ({} threads) : {:>10.0f} rows/s ({:.0f} rows/s from a feature matrix)'.format(
+                n_threads, len(large) / end_to_end, len(large) / traversal))
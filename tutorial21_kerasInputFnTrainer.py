@@ -0,0 +1,199 @@
+# https://www.tensorflow.org/tutorials/estimator/keras_model_to_estimator
+# 개요 : model_to_estimator 로 변환하지 않고, 같은 input_fn 규약 ({'dense_input' : features}, labels)
+# 을 받아 케라스 모델을 직접 훈련 / 평가하는 실행기. 컴파일된 스텝 함수는 한 번만 만들고, 가중치는
+# train 과 evaluate 사이에 메모리에 그대로 유지 (evaluate 마다 그래프 재구성 / 체크포인트 읽기 없음)
+
+import time
+
+import tensorflow as tf
+
+def _metric(metric):
+    # Metric instance, name ('sparse_categorical_accuracy') or function.
+    metric = tf.keras.metrics.get(metric)
+    if isinstance(metric, tf.keras.metrics.Metric):
+        return metric
+    return tf.keras.metrics.MeanMetricWrapper(metric, name = metric.__name__)
+
+def _per_example_loss(loss):
+    # Loss instance, name ('sparse_categorical_crossentropy' or 'SparseCategoricalCrossentropy')
+    # or function -> callable returning one loss per example. Loss objects are cloned without
+    # reduction (the caller's object is left alone); loss functions already return per-example
+    # values and are used as they are.
+    loss = tf.keras.losses.get(loss)
+    if isinstance(loss, tf.keras.losses.Loss):
+        config = loss.get_config()
+        config['reduction'] = tf.keras.losses.Reduction.NONE
+        return type(loss).from_config(config)
+    return loss
+
+class InputFnTrainer(object):
+    # train(input_fn, steps) / evaluate(input_fn, steps) with Estimator-like results, running
+    # under the given tf.distribute strategy (the model and optimizer must be created in its
+    # scope; the default strategy needs nothing).
+
+    def __init__(self, model, loss, optimizer = 'adam', metrics = (), strategy = None):
+        self.model = model
+        self.strategy = strategy or tf.distribute.get_strategy()
+        with self.strategy.scope():
+            # 예시별 손실을 받아서 전역 배치 크기로 평균
+            self.loss = _per_example_loss(loss)
+            self.optimizer = tf.keras.optimizers.get(optimizer)
+            self.eval_loss = tf.keras.metrics.Mean(name = 'loss')
+            self.metrics = [_metric(m) for m in metrics]
+        self._train_step = tf.function(self._distributed(self._train_replica))
+        self._eval_step = tf.function(self._distributed(self._eval_replica))
+
+    def _inputs(self, features):
+        # input_fn features are keyed by the model's input names ('dense_input'); a single
+        # feature for a single-input model is used whatever its key.
+        if isinstance(features, dict):
+            names = self.model.input_names
+            if len(names) == 1 and names[0] not in features and len(features) == 1:
+                return list(features.values())[0]
+            if len(names) == 1:
+                return features[names[0]]
+            return [features[n] for n in names]
+        return features
+
+    def _distributed(self, replica_fn):
+        # Returns (has_value, loss). The replica step only runs when the iterator still had a
+        # batch, so an exhausted input never half-runs a step (optimizer.iterations included).
+        def step(iterator):
+            optional = iterator.get_next_as_optional()
+
+            def run():
+                features, labels = optional.get_value()
+                losses = self.strategy.run(replica_fn, args = (features, labels))
+                return self.strategy.reduce(tf.distribute.ReduceOp.SUM, losses, axis = None)
+            return optional.has_value(), tf.cond(optional.has_value(), run,
+                    lambda: tf.constant(0.0))
+        return step
+
+    def _train_replica(self, features, labels):
+        global_batch = tf.shape(labels)[0] * self.strategy.num_replicas_in_sync
+        with tf.GradientTape() as tape:
+            logits = self.model(self._inputs(features), training = True)
+            loss = tf.nn.compute_average_loss(self.loss(labels, logits),
+                    global_batch_size = global_batch)
+            if self.model.losses:
+                loss += tf.nn.scale_regularization_loss(tf.add_n(self.model.losses))
+        gradients = tape.gradient(loss, self.model.trainable_variables)
+        self.optimizer.apply_gradients(zip(gradients, self.model.trainable_variables))
+        return loss
+
+    def _eval_replica(self, features, labels):
+        logits = self.model(self._inputs(features), training = False)
+        self.eval_loss.update_state(self.loss(labels, logits))
+        for metric in self.metrics:
+            metric.update_state(labels, logits)
+        return tf.constant(0.0)
+
+    def _iterator(self, input_fn):
+        # 복제본이 하나뿐이면 분산 데이터셋으로 감쌀 필요가 없음 (반복자 생성이 훨씬 빠름)
+        dataset = input_fn()
+        if self.strategy.num_replicas_in_sync == 1:
+            return iter(dataset)
+        return iter(self.strategy.experimental_distribute_dataset(dataset))
+
+    @property
+    def global_step(self):
+        return int(self.optimizer.iterations.numpy())
+
+    def train(self, input_fn, steps):
+        # Stops early when a finite input_fn runs out, like Estimator.train.
+        iterator = self._iterator(input_fn)
+        loss = None
+        for _ in range(steps):
+            has_value, step_loss = self._train_step(iterator)
+            if not has_value:
+                break
+            loss = step_loss
+        return {'loss' : None if loss is None else float(loss), 'global_step' : self.global_step}
+
+    def evaluate(self, input_fn, steps = None):
+        # steps = None evaluates until the input is exhausted, like Estimator.evaluate.
+        for metric in [self.eval_loss] + self.metrics:
+            metric.reset_states()
+        iterator = self._iterator(input_fn)
+        step = 0
+        while steps is None or step < steps:
+            has_value, _ = self._eval_step(iterator)
+            if not has_value:
+                break
+            step += 1
+        result = {metric.name : float(metric.result()) for metric in [self.eval_loss] + self.metrics}
+        result['global_step'] = self.global_step
+        return result
+
+def evaluate_overhead(evaluate, n_calls = 10):
+    # Seconds per evaluate() call, after one warm-up call.
+    evaluate()
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        evaluate()
+    return (time.perf_counter() - start) / n_calls
+
+if __name__ == '__main__':
+    import tempfile
+
+    import tensorflow_datasets as tfds
+
+    # tutorial21 과 같은 모델과 입력 함수
+    def make_model():
+        return tf.keras.models.Sequential([
+            tf.keras.layers.Dense(16, activation = 'relu', input_shape = (4,)),
+            tf.keras.layers.Dropout(0.2),
+            tf.keras.layers.Dense(3)
+        ])
+
+    def input_fn():
+        split = tfds.Split.TRAIN
+        dataset = tfds.load('iris', split = split, as_supervised = True)
+        dataset = dataset.map(lambda features, labels: ({'dense_input' : features}, labels))
+        dataset = dataset.batch(32).repeat()
+        return dataset
+
+    loss = tf.keras.losses.SparseCategoricalCrossentropy(from_logits = True)
+
+    model = make_model()
+    model.compile(loss = loss, optimizer = 'adam')
+    keras_estimator = tf.keras.estimator.model_to_estimator(keras_model = model,
+            model_dir = tempfile.mkdtemp())
+    start = time.perf_counter()
+    keras_estimator.train(input_fn = input_fn, steps = 500)
+    estimator_train = time.perf_counter() - start
+    print('Estimator 평가 결과 : {}'.format(keras_estimator.evaluate(input_fn = input_fn, steps = 10)))
+
+    strategy = tf.distribute.MirroredStrategy()
+    with strategy.scope():
+        model = make_model()
+        trainer = InputFnTrainer(model, loss, optimizer = 'adam',
+                metrics = ['sparse_categorical_accuracy'], strategy = strategy)
+    start = time.perf_counter()
+    trainer.train(input_fn, steps = 500)
+    trainer_train = time.perf_counter() - start
+    print('InputFnTrainer 평가 결과 : {}'.format(trainer.evaluate(input_fn, steps = 10)))
+
+    # 훈련 / 평가를 번갈아 해도 가중치는 메모리에 유지
+    weights = [w.numpy() for w in model.weights]
+    trainer.evaluate(input_fn, steps = 10)
+    assert all((w == v.numpy()).all() for w, v in zip(weights, model.weights))
+
+    # 유한한 입력 (repeat 없음) 은 데이터가 끝나면 멈춤. 손실은 이름 / 함수로도 지정 가능
+    def finite_input_fn():
+        return input_fn().take(3)
+
+    def loss_fn(labels, logits):
+        return tf.keras.losses.sparse_categorical_crossentropy(labels, logits, from_logits = True)
+
+    for loss_spec in ['sparse_categorical_crossentropy', loss_fn]:
+        finite = InputFnTrainer(make_model(), loss_spec)
+        assert finite.train(finite_input_fn, steps = 10)['global_step'] == 3
+
+    estimator_eval = evaluate_overhead(lambda: keras_estimator.evaluate(input_fn = input_fn,
+            steps = 10))
+    trainer_eval = evaluate_overhead(lambda: trainer.evaluate(input_fn, steps = 10))
+    print('train 500 steps : Estimator {:.2f}s, InputFnTrainer {:.2f}s'.format(
+            estimator_train, trainer_train))
+    print('evaluate(steps = 10) : Estimator {:.3f}s/call, InputFnTrainer {:.3f}s/call ({:.0f}x)'.format(
+            estimator_eval, trainer_eval, estimator_eval / trainer_eval))
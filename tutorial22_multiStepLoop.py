@@ -0,0 +1,151 @@
+# https://www.tensorflow.org/tutorials/quickstart/advanced?hl=ko
+# 개요 : 배치마다 파이썬에서 train_step / test_step 을 호출하는 대신, 하나의 tf.function 안에서
+# tf.range 로 데이터셋 반복자를 K 스텝씩 진행. 작은 배치에서 호출 오버헤드를 K 분의 1 로 줄임.
+# 지표 (train_loss, train_accuracy 등) 는 그래프 안에서 갱신
+
+import time
+
+import tensorflow as tf
+
+def make_train_step(model, loss_object, optimizer, train_loss, train_accuracy):
+    # tutorial22 의 train_step 과 같은 내용 (tf.function 으로 감싸지 않음)
+    def train_step(images, labels):
+        with tf.GradientTape() as tape:
+            predictions = model(images, training = True)
+            loss = loss_object(labels, predictions)
+        gradients = tape.gradient(loss, model.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+
+        train_loss(loss)
+        train_accuracy(labels, predictions)
+    return train_step
+
+def make_test_step(model, loss_object, test_loss, test_accuracy):
+    def test_step(images, labels):
+        predictions = model(images, training = False)
+        test_loss(loss_object(labels, predictions))
+        test_accuracy(labels, predictions)
+    return test_step
+
+def multi_step(step_fn):
+    # Returns a tf.function (iterator, k) running step_fn on up to k batches; it returns the
+    # number of steps actually run, which is < k once the iterator is exhausted.
+    # k is passed as a tensor so changing it does not retrace.
+    @tf.function
+    def run(iterator, k):
+        steps = tf.constant(0)
+        for _ in tf.range(k):
+            batch = iterator.get_next_as_optional()
+            if not batch.has_value():
+                break
+            step_fn(*batch.get_value())
+            steps += 1
+        return steps
+    return run
+
+def run_epoch(loop, dataset, k):
+    # One pass over 'dataset', k steps per call. Returns the number of steps.
+    iterator = iter(dataset)
+    k = tf.constant(k)
+    total = 0
+    while True:
+        steps = int(loop(iterator, k))
+        total += steps
+        if steps < k:
+            return total
+
+def steps_per_second(loop, dataset, k, epochs = 1):
+    run_epoch(loop, dataset.take(2 * k), k) # warm-up (tracing)
+    start = time.perf_counter()
+    total = 0
+    for _ in range(epochs):
+        total += run_epoch(loop, dataset, k)
+    return total / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    from tensorflow.keras.layers import Dense, Flatten, Conv2D
+    from tensorflow.keras import Model
+
+    # CPU 에서 측정
+    tf.config.set_visible_devices([], 'GPU')
+
+    mnist = tf.keras.datasets.mnist
+    (x_train, y_train), (x_test, y_test) = mnist.load_data()
+    x_train, x_test = x_train / 255.0, x_test / 255.0
+    x_train = x_train[... , tf.newaxis].astype('float32')
+    x_test = x_test[... , tf.newaxis].astype('float32')
+
+    train_ds = tf.data.Dataset.from_tensor_slices((x_train, y_train)).shuffle(10000).batch(32)
+    test_ds = tf.data.Dataset.from_tensor_slices((x_test, y_test)).batch(32)
+
+    # tutorial22 와 같은 모델
+    class MyModel(Model):
+        def __init__(self):
+            super(MyModel, self).__init__()
+            self.conv1 = Conv2D(32, 3, activation = 'relu')
+            self.flatten = Flatten()
+            self.d1 = Dense(128, activation = 'relu')
+            self.d2 = Dense(10, activation = 'softmax')
+
+        def call(self, x):
+            x = self.conv1(x)
+            x = self.flatten(x)
+            x = self.d1(x)
+            return self.d2(x)
+
+    loss_object = tf.keras.losses.SparseCategoricalCrossentropy()
+
+    def build(make_model = MyModel):
+        model = make_model()
+        optimizer = tf.keras.optimizers.Adam()
+        metrics = [tf.keras.metrics.Mean(name = 'train_loss'),
+                tf.keras.metrics.SparseCategoricalAccuracy(name = 'train_accuracy'),
+                tf.keras.metrics.Mean(name = 'test_loss'),
+                tf.keras.metrics.SparseCategoricalAccuracy(name = 'test_accuracy')]
+        train_step = make_train_step(model, loss_object, optimizer, metrics[0], metrics[1])
+        test_step = make_test_step(model, loss_object, metrics[2], metrics[3])
+        return train_step, test_step, metrics
+
+    # 한 에포크 훈련 - K 스텝 루프
+    EPOCHS = 1
+    K = 100
+    train_step, test_step, metrics = build()
+    train_loop, test_loop = multi_step(train_step), multi_step(test_step)
+    for epoch in range(EPOCHS):
+        for metric in metrics:
+            metric.reset_states()
+        run_epoch(train_loop, train_ds, K)
+        run_epoch(test_loop, test_ds, K)
+        template = '에포크 : {}, 손실 : {}, 정확도 : {}, 테스트 손실 : {}, 테스트 정확도 : {}'
+        print(template.format(epoch + 1, metrics[0].result(), metrics[1].result() * 100,
+                metrics[2].result(), metrics[3].result() * 100))
+
+    # 같은 순서의 배치로 K = 1 과 K = 7 (마지막 호출은 일부만 실행) 의 결과가 같은 지 확인
+    check_ds = test_ds.take(20)
+    results = []
+    for k in [1, 7]:
+        tf.keras.utils.set_random_seed(0)
+        train_step, _, metrics = build()
+        assert run_epoch(multi_step(train_step), check_ds, k) == 20
+        results.append((float(metrics[0].result()), float(metrics[1].result())))
+    assert abs(results[0][0] - results[1][0]) < 1e-4 and results[0][1] == results[1][1]
+
+    # 초당 스텝 수 비교 (tutorial22 방식 : 배치마다 tf.function 호출).
+    # 작은 모델일수록 호출 오버헤드의 비중이 커짐
+    bench_ds = train_ds.take(1000).cache()
+    small_model = lambda: tf.keras.Sequential([Flatten(), Dense(10, activation = 'softmax')])
+    for name, make_model in [('MyModel', MyModel), ('Flatten + Dense(10)', small_model)]:
+        train_step, _, _ = build(make_model)
+        per_batch = tf.function(train_step)
+        for images, labels in bench_ds.take(2):
+            per_batch(images, labels)
+        start = time.perf_counter()
+        for images, labels in bench_ds:
+            per_batch(images, labels)
+        print('{} - tutorial22 loop : {:.0f} steps/s'.format(name,
+                1000 / (time.perf_counter() - start)))
+
+        for k in [1, 10, 100]:
+            train_step, _, _ = build(make_model)
+            print('{} - K = {:<3d} : {:.0f} steps/s'.format(name, k,
+                    steps_per_second(multi_step(train_step), bench_ds, k)))
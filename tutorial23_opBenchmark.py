@@ -0,0 +1,162 @@
+# https://www.tensorflow.org/tutorials/customization/basics
+# 개요 : time_matmul 을 일반화한 연산 마이크로벤치마크. 임의의 연산 / tf.function 을 크기(shape)
+# 목록과 장치마다, eager / tf.function / XLA(jit_compile) 로 실행하여 예열, 반복, 동기화(.numpy())
+# 후 중앙값 / IQR / FLOP/s 를 기록하고 JSON 으로 저장. TF 업그레이드 간 성능 회귀 추적용
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+
+import numpy as np
+import tensorflow as tf
+
+MODES = ('eager', 'function', 'xla')
+
+def _compile(fn, mode):
+    if mode == 'eager':
+        return fn
+    if mode == 'function':
+        return tf.function(fn)
+    if mode == 'xla':
+        return tf.function(fn, jit_compile = True)
+    raise ValueError('Unknown mode : {}'.format(mode))
+
+def _sync(result):
+    # Copying every output to host waits for the device to finish.
+    for tensor in tf.nest.flatten(result):
+        if isinstance(tensor, tf.Tensor):
+            tensor.numpy()
+
+def time_calls(fn, args, warmup = 3, repeats = 30, number = 1):
+    # Seconds per call for each of 'repeats' samples. A sample runs 'number' calls and syncs on
+    # the last result (ops on a device run in order).
+    for _ in range(warmup):
+        _sync(fn(*args))
+    samples = np.empty(repeats, dtype = np.float64)
+    for r in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            result = fn(*args)
+        _sync(result)
+        samples[r] = (time.perf_counter() - start) / number
+    return samples
+
+def summarize(samples, flops = None):
+    q1, median, q3 = np.percentile(samples, [25, 50, 75])
+    summary = {'median_s' : median, 'q1_s' : q1, 'q3_s' : q3, 'iqr_s' : q3 - q1,
+            'min_s' : samples.min(), 'mean_s' : samples.mean(), 'repeats' : len(samples)}
+    if flops:
+        summary['flops'] = flops
+        summary['flop_per_s'] = flops / median
+    return {key : float(value) if key != 'repeats' else value for key, value in summary.items()}
+
+def benchmark_op(name, fn, make_inputs, shapes, devices = None, modes = MODES, flops = None,
+        warmup = 3, repeats = 30, number = 1):
+    # fn(*inputs) is the op under test; make_inputs(shape) returns its input tensors and is
+    # called under the target device; flops(shape) optionally gives the work per call.
+    # Returns one result dict per (shape, device, mode); failures (e.g. XLA unavailable) are
+    # recorded in 'error' instead of stopping the sweep.
+    devices = devices or available_devices()
+    results = []
+    for device in devices:
+        for shape in shapes:
+            with tf.device(device):
+                inputs = make_inputs(shape)
+                for mode in modes:
+                    record = {'op' : name, 'shape' : list(shape), 'device' : device,
+                            'mode' : mode}
+                    try:
+                        samples = time_calls(_compile(fn, mode), inputs, warmup, repeats, number)
+                        record.update(summarize(samples, flops(shape) if flops else None))
+                    except (tf.errors.OpError, ValueError, NotImplementedError) as e:
+                        record['error'] = '{}: {}'.format(type(e).__name__, str(e)[:200])
+                    results.append(record)
+    return results
+
+def available_devices():
+    devices = ['CPU:0']
+    devices += ['GPU:{}'.format(i) for i in range(len(tf.config.list_physical_devices('GPU')))]
+    return devices
+
+def environment():
+    return {
+        'tensorflow' : tf.__version__,
+        'numpy' : np.__version__,
+        'python' : platform.python_version(),
+        'platform' : platform.platform(),
+        'processor' : platform.processor(),
+        'cpu_count' : os.cpu_count(),
+        'hostname' : platform.node(),
+        'devices' : available_devices(),
+        'timestamp' : datetime.datetime.now().isoformat(timespec = 'seconds'),
+    }
+
+def write_json(results, path):
+    with open(path, 'w') as f:
+        json.dump({'environment' : environment(), 'results' : results}, f, indent = 2)
+
+def _key(record):
+    return (record['op'], tuple(record['shape']), record['device'], record['mode'])
+
+def compare(baseline_path, results, tolerance = 0.10):
+    # Rows whose median got slower than the baseline by more than 'tolerance'.
+    with open(baseline_path) as f:
+        baseline = {_key(r) : r for r in json.load(f)['results'] if 'median_s' in r}
+    regressions = []
+    for record in results:
+        before = baseline.get(_key(record))
+        if before is None or 'median_s' not in record:
+            continue
+        ratio = record['median_s'] / before['median_s']
+        if ratio > 1 + tolerance:
+            regressions.append(dict(record, baseline_median_s = before['median_s'],
+                    slowdown = ratio))
+    return regressions
+
+def print_results(results):
+    for r in results:
+        head = '{:<8s} {:<14s} {:<6s} {:<8s}'.format(r['op'], 'x'.join(map(str, r['shape'])),
+                r['device'], r['mode'])
+        if 'error' in r:
+            print(head, 'error :', r['error'])
+            continue
+        line = '{} median {:9.3f}ms  IQR {:8.3f}ms'.format(head, 1000 * r['median_s'],
+                1000 * r['iqr_s'])
+        if 'flop_per_s' in r:
+            line += '  {:8.2f} GFLOP/s'.format(r['flop_per_s'] / 1e9)
+        print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default = 'op_benchmark.json')
+    parser.add_argument('--baseline', default = None)
+    parser.add_argument('--repeats', type = int, default = 30)
+    args = parser.parse_args()
+
+    # time_matmul 과 같은 연산을 여러 크기로
+    def square_inputs(shape):
+        return (tf.random.uniform(shape),)
+
+    results = benchmark_op('matmul', lambda x: tf.matmul(x, x), square_inputs,
+            shapes = [(64, 64), (256, 256), (1000, 1000), (2048, 2048)],
+            flops = lambda shape: 2 * shape[0] ** 3, repeats = args.repeats)
+    # 작은 연산을 여러 개 이어 붙인 경우 - 호출 오버헤드와 연산 융합(XLA) 의 영향
+    results += benchmark_op('gelu', lambda x: 0.5 * x * (1 + tf.tanh(0.7978845608 *
+            (x + 0.044715 * x ** 3))), square_inputs,
+            shapes = [(64, 64), (1000, 1000)], flops = lambda shape: 9 * shape[0] * shape[1],
+            repeats = args.repeats, number = 10)
+
+    print_results(results)
+    write_json(results, args.output)
+    print('결과 저장 :', args.output)
+
+    if args.baseline:
+        regressions = compare(args.baseline, results)
+        for r in regressions:
+            print('회귀 : {} {} {} {} - {:.2f}x slower'.format(r['op'], r['shape'], r['device'],
+                    r['mode'], r['slowdown']))
+        if not regressions:
+            print('기준 대비 회귀 없음')
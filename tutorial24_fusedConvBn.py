@@ -0,0 +1,133 @@
+# https://www.tensorflow.org/tutorials/customization/custom_layers
+# 개요 : 추론(training = False) 용 최적화. ResnetIdentityBlock 의 각 BatchNormalization 이동 통계를
+# 바로 앞 Conv2D 의 커널과 편향에 접어 넣고 ReLU 를 합성곱의 활성화 함수로 합쳐서, BN 연산 없이
+# 합성곱 3 개로 이루어진 같은 결과의 블록을 만듦
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+def fold_batch_norm(conv, bn):
+    # Kernel and bias of a conv whose output equals bn(conv(x), training = False).
+    # y = gamma * (conv(x) - mean) / sqrt(var + eps) + beta
+    #   = conv(x) * scale + (beta - mean * scale),  scale = gamma / sqrt(var + eps)
+    if conv.activation not in (None, tf.keras.activations.linear):
+        raise ValueError('{} has an activation; BN can only be folded into a linear conv'.format(
+                conv.name))
+    if bn.axis not in ([-1], [3], -1, 3):
+        raise ValueError('Only channels_last BatchNormalization can be folded')
+    kernel = conv.kernel.numpy().astype(np.float64)
+    bias = conv.bias.numpy().astype(np.float64) if conv.use_bias else np.zeros(kernel.shape[-1])
+    mean = bn.moving_mean.numpy().astype(np.float64)
+    variance = bn.moving_variance.numpy().astype(np.float64)
+    gamma = bn.gamma.numpy().astype(np.float64) if bn.scale else np.ones_like(mean)
+    beta = bn.beta.numpy().astype(np.float64) if bn.center else np.zeros_like(mean)
+
+    scale = gamma / np.sqrt(variance + bn.epsilon)
+    folded_kernel = kernel * scale # 출력 채널 (마지막 축) 마다 곱함
+    folded_bias = (bias - mean) * scale + beta
+    dtype = conv.kernel.dtype.as_numpy_dtype
+    return folded_kernel.astype(dtype), folded_bias.astype(dtype)
+
+def folded_conv(conv, bn, activation = None):
+    # New Conv2D (same geometry as 'conv') carrying the folded weights.
+    config = conv.get_config()
+    config.update({'use_bias' : True, 'activation' : activation, 'name' : conv.name + '_folded'})
+    layer = tf.keras.layers.Conv2D.from_config(config)
+    layer.build([None, None, None, conv.kernel.shape[-2]])
+    layer.set_weights(fold_batch_norm(conv, bn))
+    return layer
+
+class FusedResnetIdentityBlock(tf.keras.layers.Layer):
+    # Inference-only equivalent of ResnetIdentityBlock : conv(+relu) -> conv(+relu) -> conv ->
+    # add -> relu, with every BatchNormalization folded away.
+
+    def __init__(self, conv2a, conv2b, conv2c, **kwargs):
+        super(FusedResnetIdentityBlock, self).__init__(**kwargs)
+        self.conv2a = conv2a
+        self.conv2b = conv2b
+        self.conv2c = conv2c
+
+    def call(self, input_tensor):
+        x = self.conv2a(input_tensor)
+        x = self.conv2b(x)
+        x = self.conv2c(x)
+        return tf.nn.relu(x + input_tensor)
+
+def fold_identity_block(block):
+    # The block must have been built (called once) so its weights exist.
+    return FusedResnetIdentityBlock(
+            folded_conv(block.conv2a, block.bn2a, 'relu'),
+            folded_conv(block.conv2b, block.bn2b, 'relu'),
+            folded_conv(block.conv2c, block.bn2c),
+            name = 'fused_identity_block')
+
+def count_ops(fn, input_signature, op_type):
+    # Number of 'op_type' nodes in the traced graph of fn.
+    graph = tf.function(fn).get_concrete_function(input_signature).graph
+    return sum(op.type == op_type for op in graph.get_operations())
+
+def latency(fn, x, warmup = 5, repeats = 30):
+    # Median seconds per call, synchronized with .numpy().
+    for _ in range(warmup):
+        fn(x).numpy()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(x).numpy()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+if __name__ == '__main__':
+    from tutorial24_customLayers import ResnetIdentityBlock
+
+    tf.keras.utils.set_random_seed(0)
+
+    def randomize_statistics(block):
+        # 훈련된 모델처럼 BN 통계와 스케일을 임의의 값으로 설정
+        for bn in [block.bn2a, block.bn2b, block.bn2c]:
+            channels = bn.moving_mean.shape[0]
+            bn.moving_mean.assign(np.random.normal(0, 0.5, channels))
+            bn.moving_variance.assign(np.random.uniform(0.5, 2.0, channels))
+            bn.gamma.assign(np.random.uniform(0.5, 1.5, channels))
+            bn.beta.assign(np.random.normal(0, 0.2, channels))
+
+    # 블록을 여러 개 쌓은 모델
+    N_BLOCKS = 8
+    shape = (32, 28, 28, 64)
+    x = tf.random.normal(shape)
+    blocks = [ResnetIdentityBlock(3, [16, 16, 64]) for _ in range(N_BLOCKS)]
+    for block in blocks:
+        block(x[:1])
+        randomize_statistics(block)
+    fused = [fold_identity_block(block) for block in blocks]
+
+    def original(x):
+        for block in blocks:
+            x = block(x, training = False)
+        return x
+
+    def folded(x):
+        for block in fused:
+            x = block(x)
+        return x
+
+    # 동등성 확인
+    expected = original(x).numpy()
+    np.testing.assert_allclose(folded(x).numpy(), expected, rtol = 1e-4,
+            atol = 1e-4 * np.abs(expected).max())
+    print('training = False 인 원래 블록과 같은 결과')
+
+    signature = tf.TensorSpec(shape, tf.float32)
+    print('FusedBatchNormV3 연산 수 : 원래 {}, 접은 후 {}'.format(
+            count_ops(original, signature, 'FusedBatchNormV3'),
+            count_ops(folded, signature, 'FusedBatchNormV3')))
+    print('Conv2D 연산 수 : 원래 {}, 접은 후 {}'.format(
+            count_ops(original, signature, 'Conv2D'), count_ops(folded, signature, 'Conv2D')))
+
+    for name, wrap in [('eager', lambda f: f), ('tf.function', tf.function)]:
+        base = latency(wrap(original), x)
+        fast = latency(wrap(folded), x)
+        print('{:<11s} : conv-BN-ReLU {:.2f}ms, folded {:.2f}ms ({:.2f}x)'.format(name,
+                1000 * base, 1000 * fast, base / fast))
@@ -0,0 +1,138 @@
+# https://www.tensorflow.org/tutorials/customization/custom_layers
+# 개요 : 같은 입력을 받는 여러 MyDenseLayer 헤드의 커널을 하나의 가중치 행렬로 이어 붙여, 행렬 곱
+# 한 번으로 계산한 뒤 헤드별 출력으로 나누는 층. 각 헤드의 커널은 이름으로 읽고 쓸 수 있고, 헤드별
+# 고정은 그래디언트의 해당 열을 0 으로 가려서 처리
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+def _mask_gradient(x, mask):
+    # Identity whose gradient is multiplied by mask.
+    @tf.custom_gradient
+    def identity(x):
+        return tf.identity(x), lambda dy: dy * mask
+    return identity(x)
+
+class GroupedDense(tf.keras.layers.Layer):
+    # heads : {name : num_outputs} (insertion order is the column order of the packed kernel),
+    # or a list of num_outputs (names 'head_0', 'head_1', ...). frozen_heads : names of heads
+    # whose columns of the kernel get zero gradients.
+    # call() returns a dict of per-head outputs, each equal to tf.matmul(input, head kernel).
+    # Freezing only zeroes gradients : optimizers that move weights without a gradient (weight
+    # decay) still change frozen columns.
+
+    def __init__(self, heads, frozen_heads = (), **kwargs):
+        super(GroupedDense, self).__init__(**kwargs)
+        if not isinstance(heads, dict):
+            heads = {'head_{}'.format(i) : n for i, n in enumerate(heads)}
+        self.head_names = list(heads)
+        self.head_sizes = [int(n) for n in heads.values()]
+        ends = np.cumsum(self.head_sizes)
+        self._columns = {name : (int(end - size), int(end)) for name, size, end in
+                zip(self.head_names, self.head_sizes, ends)}
+        unknown = set(frozen_heads) - set(self.head_names)
+        if unknown:
+            raise ValueError('Unknown frozen heads {}'.format(sorted(unknown)))
+        self.frozen_heads = set(frozen_heads)
+
+    def build(self, input_shape):
+        # 모든 헤드의 커널을 열 방향으로 이어 붙인 하나의 변수
+        self.kernel = self.add_weight('kernel',
+                shape = [int(input_shape[-1]), sum(self.head_sizes)])
+        mask = np.ones([1, sum(self.head_sizes)], dtype = self.kernel.dtype.as_numpy_dtype)
+        for name in self.frozen_heads:
+            start, end = self._columns[name]
+            mask[:, start : end] = 0
+        self._gradient_mask = tf.constant(mask)
+        super(GroupedDense, self).build(input_shape)
+
+    def call(self, input):
+        kernel = self.kernel
+        if self.frozen_heads:
+            kernel = _mask_gradient(kernel, self._gradient_mask)
+        outputs = tf.split(tf.matmul(input, kernel), self.head_sizes, axis = -1)
+        return dict(zip(self.head_names, outputs))
+
+    def head_kernel(self, name):
+        # Current value of one head's kernel, [input_dim, num_outputs].
+        start, end = self._columns[name]
+        return self.kernel[:, start : end]
+
+    def assign_head_kernel(self, name, value):
+        start, end = self._columns[name]
+        self.kernel[:, start : end].assign(value)
+
+    @property
+    def heads(self):
+        return {name : self.head_kernel(name) for name in self.head_names}
+
+    @classmethod
+    def from_layers(cls, layers, names = None, **kwargs):
+        # Packs built MyDenseLayer-like layers (a 'kernel' and 'num_outputs') into one layer.
+        names = names or ['head_{}'.format(i) for i in range(len(layers))]
+        grouped = cls(dict(zip(names, [layer.num_outputs for layer in layers])), **kwargs)
+        grouped.build([None, layers[0].kernel.shape[0]])
+        grouped.kernel.assign(tf.concat([layer.kernel for layer in layers], axis = 1))
+        return grouped
+
+def latency(fn, x, warmup = 5, repeats = 50):
+    for _ in range(warmup):
+        tf.nest.map_structure(lambda t: t.numpy(), fn(x))
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        tf.nest.map_structure(lambda t: t.numpy(), fn(x))
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+if __name__ == '__main__':
+    from tutorial24_customLayers import MyDenseLayer
+
+    INPUT_DIM = 256
+    HEAD_OUTPUTS = 64
+
+    # 동등성 확인 - 기존 층을 묶은 결과가 헤드별 matmul 과 같은 지, 헤드별 가중치 읽기 / 쓰기
+    x = tf.random.normal([32, INPUT_DIM])
+    layers = [MyDenseLayer(n) for n in [10, 20, 30]]
+    for layer in layers:
+        layer(x)
+    grouped = GroupedDense.from_layers(layers, names = ['a', 'b', 'c'])
+    outputs = grouped(x)
+    for name, layer in zip(['a', 'b', 'c'], layers):
+        np.testing.assert_allclose(outputs[name].numpy(), layer(x).numpy(), rtol = 1e-5,
+                atol = 1e-5)
+        np.testing.assert_array_equal(grouped.head_kernel(name).numpy(), layer.kernel.numpy())
+    grouped.assign_head_kernel('b', tf.zeros([INPUT_DIM, 20]))
+    assert not grouped(x)['b'].numpy().any() and grouped(x)['a'].numpy().any()
+    print('헤드별 MyDenseLayer 와 같은 결과')
+    print([v.name for v in grouped.trainable_variables])
+
+    # 헤드 'a' 만 고정 - 커널은 하나의 변수, 'a' 의 열만 그래디언트가 0 이라 훈련해도 그대로
+    frozen = GroupedDense.from_layers(layers, names = ['a', 'b', 'c'], frozen_heads = ['a'])
+    before = {name : kernel.numpy() for name, kernel in frozen.heads.items()}
+    with tf.GradientTape() as tape:
+        loss = sum(tf.reduce_sum(v) for v in frozen(x).values())
+    gradient, = tape.gradient(loss, frozen.trainable_variables)
+    assert not gradient.numpy()[:, :10].any() and gradient.numpy()[:, 10:].all()
+    tf.keras.optimizers.SGD(0.1).apply_gradients([(gradient, frozen.kernel)])
+    np.testing.assert_array_equal(frozen.head_kernel('a').numpy(), before['a'])
+    assert not np.array_equal(frozen.head_kernel('b').numpy(), before['b'])
+
+    # 헤드 수 N 과 배치 크기에 따른 비교 (둘 다 tf.function)
+    print('{:>3s} {:>6s} {:>12s} {:>12s} {:>8s}'.format('N', 'batch', 'separate', 'grouped',
+            'speedup'))
+    for n_heads in [2, 4, 8, 16]:
+        layers = [MyDenseLayer(HEAD_OUTPUTS) for _ in range(n_heads)]
+        for layer in layers:
+            layer(tf.zeros([1, INPUT_DIM]))
+        grouped = GroupedDense.from_layers(layers)
+        separate_fn = tf.function(lambda x: [layer(x) for layer in layers])
+        grouped_fn = tf.function(lambda x: grouped(x))
+        for batch_size in [1, 32, 256, 2048]:
+            x = tf.random.normal([batch_size, INPUT_DIM])
+            separate = latency(separate_fn, x)
+            packed = latency(grouped_fn, x)
+            print('{:>3d} {:>6d} {:>10.3f}ms {:>10.3f}ms {:>7.2f}x'.format(n_heads, batch_size,
+                    1000 * separate, 1000 * packed, separate / packed))
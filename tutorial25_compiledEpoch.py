@@ -0,0 +1,158 @@
+# https://www.tensorflow.org/tutorials/customization/custom_training_walkthrough
+# 개요 : 즉시 실행으로 grad() 후 정확도를 위해 model(x) 를 한 번 더 호출하는 훈련 루프 대신, 에포크
+# 전체를 하나의 tf.function 으로 컴파일. 정확도는 그래디언트 계산의 로짓을 재사용하고,
+# epoch_loss_avg / epoch_accuracy 는 그래프 안에서 갱신하여 에포크 요약만 파이썬으로 돌려줌
+
+import time
+
+import tensorflow as tf
+
+def make_epoch_fn(model, loss_object, optimizer):
+    # Returns epoch(dataset) -> (mean loss, accuracy) for one pass over dataset.
+    epoch_loss_avg = tf.keras.metrics.Mean()
+    epoch_accuracy = tf.keras.metrics.SparseCategoricalAccuracy()
+
+    def train_epoch(dataset):
+        epoch_loss_avg.reset_state()
+        epoch_accuracy.reset_state()
+        # 데이터셋을 직접 순회하면 autograph 가 dataset.reduce 로 바꾸는데, 호출마다 비용이 큼.
+        # Iterating an explicit iterator becomes a plain while loop over get_next_as_optional.
+        for x, y in iter(dataset):
+            with tf.GradientTape() as tape:
+                logits = model(x, training = True)
+                loss_value = loss_object(y_true = y, y_pred = logits)
+            grads = tape.gradient(loss_value, model.trainable_variables)
+            optimizer.apply_gradients(zip(grads, model.trainable_variables))
+
+            epoch_loss_avg.update_state(loss_value)
+            # 같은 로짓으로 정확도 갱신 (두 번째 순전파 없음)
+            epoch_accuracy.update_state(y, logits)
+        return epoch_loss_avg.result(), epoch_accuracy.result()
+
+    return tf.function(train_epoch), train_epoch
+
+def make_training_fn(model, loss_object, optimizer):
+    # Returns train(dataset, num_epochs) running every epoch inside one call;
+    # the per-epoch loss / accuracy come back as two [num_epochs] tensors.
+    _, train_epoch = make_epoch_fn(model, loss_object, optimizer)
+
+    @tf.function
+    def train(dataset, num_epochs):
+        losses = tf.TensorArray(tf.float32, size = num_epochs)
+        accuracies = tf.TensorArray(tf.float32, size = num_epochs)
+        for epoch in tf.range(num_epochs):
+            loss_value, accuracy = train_epoch(dataset)
+            losses = losses.write(epoch, loss_value)
+            accuracies = accuracies.write(epoch, accuracy)
+        return losses.stack(), accuracies.stack()
+
+    return train
+
+def eager_epoch(model, loss_object, optimizer, dataset):
+    # tutorial25 의 훈련 루프 한 에포크 (비교용)
+    epoch_loss_avg = tf.keras.metrics.Mean()
+    epoch_accuracy = tf.keras.metrics.SparseCategoricalAccuracy()
+    for x, y in dataset:
+        with tf.GradientTape() as tape:
+            loss_value = loss_object(y_true = y, y_pred = model(x, training = True))
+        grads = tape.gradient(loss_value, model.trainable_variables)
+        optimizer.apply_gradients(zip(grads, model.trainable_variables))
+        epoch_loss_avg(loss_value)
+        epoch_accuracy(y, model(x))
+    return epoch_loss_avg.result(), epoch_accuracy.result()
+
+if __name__ == '__main__':
+    import os
+
+    import numpy as np
+
+    # tutorial25 와 같은 데이터셋과 모델
+    train_dataset_url = "https://storage.googleapis.com/download.tensorflow.org/data/iris_training.csv"
+    train_dataset_fp = tf.keras.utils.get_file(fname = os.path.basename(train_dataset_url),
+            origin = train_dataset_url)
+
+    column_names = ['sepal_length', 'sepal_width', 'petal_length', 'petal_width', 'species']
+    label_name = column_names[-1]
+    batch_size = 32
+
+    def pack_features_vector(features, labels):
+        features = tf.stack(list(features.values()), axis = 1)
+        return features, labels
+
+    train_dataset = tf.data.experimental.make_csv_dataset(train_dataset_fp, batch_size,
+            column_names = column_names, label_name = label_name, num_epochs = 1)
+    train_dataset = train_dataset.map(pack_features_vector)
+
+    def make_model():
+        tf.keras.utils.set_random_seed(0)
+        return tf.keras.Sequential([
+            tf.keras.layers.Dense(10, activation = tf.nn.relu, input_shape = (4,)),
+            tf.keras.layers.Dense(10, activation = tf.nn.relu),
+            tf.keras.layers.Dense(3)
+        ])
+
+    loss_object = tf.keras.losses.SparseCategoricalCrossentropy(from_logits = True)
+    num_epochs = 201
+
+    # 동등성 확인 - 같은 초기값과 같은 배치 순서 (섞지 않음) 로 두 방식의 결과 비교
+    fixed_dataset = tf.data.experimental.make_csv_dataset(train_dataset_fp, batch_size,
+            column_names = column_names, label_name = label_name, num_epochs = 1,
+            shuffle = False).map(pack_features_vector).cache()
+    reference_model = make_model()
+    reference_optimizer = tf.keras.optimizers.Adam(learning_rate = 0.01)
+    compiled_model = make_model()
+    epoch_fn, _ = make_epoch_fn(compiled_model, loss_object,
+            tf.keras.optimizers.Adam(learning_rate = 0.01))
+    for epoch in range(3):
+        # 참조 쪽의 정확도는 갱신 후의 모델로 계산하므로 손실만 비교
+        reference_loss, _ = eager_epoch(reference_model, loss_object, reference_optimizer,
+                fixed_dataset)
+        compiled_loss, _ = epoch_fn(fixed_dataset)
+        np.testing.assert_allclose(compiled_loss.numpy(), reference_loss.numpy(), rtol = 1e-5)
+    for a, b in zip(reference_model.weights, compiled_model.weights):
+        np.testing.assert_allclose(a.numpy(), b.numpy(), rtol = 1e-4, atol = 1e-6)
+    print('즉시 실행 루프와 같은 손실과 가중치')
+
+    def time_epochs(dataset):
+        # (eager, compiled per epoch, single call) seconds per epoch
+        model = make_model()
+        optimizer = tf.keras.optimizers.Adam(learning_rate = 0.01)
+        eager_epoch(model, loss_object, optimizer, dataset)
+        start = time.perf_counter()
+        for epoch in range(num_epochs):
+            eager_epoch(model, loss_object, optimizer, dataset)
+        eager_time = (time.perf_counter() - start) / num_epochs
+
+        model = make_model()
+        epoch_fn, _ = make_epoch_fn(model, loss_object,
+                tf.keras.optimizers.Adam(learning_rate = 0.01))
+        epoch_fn(dataset) # 추적(tracing)
+        start = time.perf_counter()
+        for epoch in range(num_epochs):
+            loss_value, accuracy = epoch_fn(dataset)
+            if epoch % 50 == 0:
+                print("에포크 {:03d}: 손실 : {:.3f}, 정확도 : {:.3%}".format(epoch, loss_value,
+                        accuracy))
+        compiled_time = (time.perf_counter() - start) / num_epochs
+
+        model = make_model()
+        train = make_training_fn(model, loss_object,
+                tf.keras.optimizers.Adam(learning_rate = 0.01))
+        train(dataset, tf.constant(1))
+        start = time.perf_counter()
+        losses, accuracies = train(dataset, tf.constant(num_epochs))
+        single_call_time = (time.perf_counter() - start) / num_epochs
+        print("한 번의 호출 - 마지막 에포크 : 손실 : {:.3f}, 정확도 : {:.3%}".format(losses[-1],
+                accuracies[-1]))
+        return eager_time, compiled_time, single_call_time
+
+    # 에포크 시간 비교. tutorial25 의 입력 파이프라인은 에포크마다 CSV 를 다시 읽고 파싱하므로,
+    # 훈련 루프 자체의 차이를 보기 위해 메모리에 캐시한 (에포크마다 다시 섞는) 데이터셋으로도 측정
+    cached_dataset = fixed_dataset.unbatch().cache().shuffle(1000).batch(batch_size)
+    for name, dataset in [('make_csv_dataset', train_dataset), ('cached', cached_dataset)]:
+        eager_time, compiled_time, single_call_time = time_epochs(dataset)
+        print('[{}] 즉시 실행 루프      : {:.2f}ms/epoch'.format(name, 1000 * eager_time))
+        print('[{}] 컴파일된 에포크     : {:.2f}ms/epoch ({:.1f}x)'.format(name,
+                1000 * compiled_time, eager_time / compiled_time))
+        print('[{}] 한 번의 호출로 전체 : {:.2f}ms/epoch ({:.1f}x)'.format(name,
+                1000 * single_call_time, eager_time / single_call_time))
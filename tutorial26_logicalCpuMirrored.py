@@ -0,0 +1,118 @@
+# https://www.tensorflow.org/tutorials/distribute/keras
+# 개요 : GPU 가 없는 호스트에서 MirroredStrategy 가 복제본 하나만 쓰는 문제. 물리 CPU 를 N 개의 논리
+# 장치로 나누고 (tf.config.set_logical_device_configuration), tutorial26 과 같은 Conv2D / Dense MNIST
+# 모델을 그 위에서 MirroredStrategy 로 훈련하여, N = 1..코어 수 마다의 처리량과 확장 효율을 비교.
+# 논리 장치 구성은 프로세스마다 한 번만 가능하므로 N 마다 별도의 프로세스에서 측정
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+def configure_logical_cpus(n_devices, intra_op_threads = None):
+    # Must run before TensorFlow initializes its devices. TensorFlow has one intra-op pool per
+    # process, not one per device : all N replicas share it, so it keeps every core
+    # (intra_op_threads, default os.cpu_count()) and inter-op parallelism lets the replicas
+    # run concurrently.
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads or os.cpu_count())
+    tf.config.threading.set_inter_op_parallelism_threads(max(2, n_devices))
+    cpu = tf.config.list_physical_devices('CPU')[0]
+    tf.config.set_logical_device_configuration(cpu,
+            [tf.config.LogicalDeviceConfiguration() for _ in range(n_devices)])
+    return [device.name for device in tf.config.list_logical_devices('CPU')]
+
+def make_model():
+    # tutorial26 과 같은 모델
+    import tensorflow as tf
+    return tf.keras.Sequential([
+            tf.keras.layers.Conv2D(32, 3, activation = 'relu', input_shape = (28, 28, 1)),
+            tf.keras.layers.MaxPooling2D(),
+            tf.keras.layers.Flatten(),
+            tf.keras.layers.Dense(64, activation = 'relu'),
+            tf.keras.layers.Dense(10, activation = 'softmax')
+    ])
+
+def synthetic_mnist(n_examples, seed = 0):
+    # Throughput does not depend on pixel values; MNIST-shaped random data avoids a download.
+    import numpy as np
+    rng = np.random.RandomState(seed)
+    images = rng.rand(n_examples, 28, 28, 1).astype('float32')
+    labels = rng.randint(0, 10, n_examples).astype('int64')
+    return images, labels
+
+def measure(n_devices, batch_size_per_replica = 64, steps = 100, intra_op_threads = None):
+    # Examples per second of model.fit on n_devices logical CPUs (second epoch, after tracing).
+    devices = configure_logical_cpus(n_devices, intra_op_threads)
+    import tensorflow as tf
+
+    strategy = tf.distribute.MirroredStrategy(devices = devices,
+            cross_device_ops = tf.distribute.ReductionToOneDevice())
+    batch_size = batch_size_per_replica * strategy.num_replicas_in_sync
+    images, labels = synthetic_mnist(batch_size * steps)
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).batch(batch_size).cache()
+    dataset = dataset.repeat().prefetch(tf.data.AUTOTUNE)
+
+    with strategy.scope():
+        model = make_model()
+        model.compile(loss = 'sparse_categorical_crossentropy',
+                optimizer = tf.keras.optimizers.Adam(), metrics = ['accuracy'])
+
+    class EpochTimer(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs = None):
+            self.start = time.perf_counter()
+        def on_epoch_end(self, epoch, logs = None):
+            self.elapsed = time.perf_counter() - self.start
+
+    timer = EpochTimer()
+    model.fit(dataset, epochs = 2, steps_per_epoch = steps, callbacks = [timer], verbose = 0)
+    return {'n_devices' : strategy.num_replicas_in_sync, 'devices' : devices,
+            'intra_op_threads' : tf.config.threading.get_intra_op_parallelism_threads(),
+            'batch_size' : batch_size, 'steps' : steps,
+            'examples_per_s' : batch_size * steps / timer.elapsed}
+
+def scaling_sweep(device_counts, batch_size_per_replica = 64, steps = 100):
+    # One subprocess per device count. Efficiency is throughput relative to N times the
+    # single-device throughput.
+    results = []
+    for n in device_counts:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker',
+                '--devices', str(n), '--batch-size-per-replica', str(batch_size_per_replica),
+                '--steps', str(steps)], check = True, stdout = subprocess.PIPE,
+                universal_newlines = True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    base = results[0]['examples_per_s'] / results[0]['n_devices']
+    for r in results:
+        r['speedup'] = r['examples_per_s'] / results[0]['examples_per_s']
+        r['efficiency'] = r['examples_per_s'] / (base * r['n_devices'])
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', action = 'store_true')
+    parser.add_argument('--devices', type = int, default = 1)
+    parser.add_argument('--max-devices', type = int, default = os.cpu_count())
+    parser.add_argument('--batch-size-per-replica', type = int, default = 64)
+    parser.add_argument('--steps', type = int, default = 100)
+    args = parser.parse_args()
+
+    if args.worker:
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+        # 마지막 줄이 결과 (JSON)
+        print(json.dumps(measure(args.devices, args.batch_size_per_replica, args.steps)))
+        sys.exit(0)
+
+    counts = list(range(1, args.max_devices + 1))
+    results = scaling_sweep(counts, args.batch_size_per_replica, args.steps)
+    # threads : 모든 복제본이 함께 쓰는 intra-op 스레드 풀의 크기
+    print('{:>3s} {:>8s} {:>7s} {:>14s} {:>8s} {:>11s}'.format('N', 'threads', 'batch',
+            'examples/s', 'speedup', 'efficiency'))
+    for r in results:
+        print('{:>3d} {:>8d} {:>7d} {:>14.0f} {:>7.2f}x {:>10.0%}'.format(r['n_devices'],
+                r['intra_op_threads'], r['batch_size'], r['examples_per_s'], r['speedup'],
+                r['efficiency']))
+    best = max(results, key = lambda r: r['examples_per_s'])
+    print('가장 높은 처리량 : N = {} ({:.0f} examples/s)'.format(best['n_devices'],
+            best['examples_per_s']))
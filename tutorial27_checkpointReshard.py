@@ -0,0 +1,239 @@
+# https://www.tensorflow.org/tutorials/distribute/custom_training
+# 개요 : tutorial27 은 MirroredStrategy 에서 tf.train.Checkpoint(optimizer, model) 로 저장하고 전략 없이
+# new_model 로 복원하며, tutorial30 은 OneDeviceStrategy / MirroredStrategy 로 다시 불러옴. 모델을 만들지
+# 않고 체크포인트를 대상 배치 (데이터 파일 샤드 수, 변수의 0 번 축 분할 수) 로 다시 쓰는 오프라인
+# 도구. 텐서를 하나씩 (분할마다) 읽어 max_shard_bytes 이하의 데이터 파일로 나눠 쓰고 (메모리에는 파일
+# 하나 분량만) MergeV2Checkpoints 로 합친 뒤, 원본과 결과의 텐서별 체크섬을 비교
+
+import math
+import os
+import time
+import zlib
+
+import numpy as np
+import tensorflow as tf
+
+def _checksum(value):
+    if isinstance(value, bytes):
+        return zlib.crc32(value)
+    value = np.asarray(value)
+    if value.dtype == object:
+        return zlib.crc32(b''.join(value.ravel().tolist()))
+    return zlib.crc32(np.ascontiguousarray(value).tobytes())
+
+def _slice_spec(shape, start, length):
+    # Checkpoint slice string : full shape, then 'start,length' for axis 0 and '-' for the rest.
+    return '{} {}'.format(' '.join(str(d) for d in shape),
+            ':'.join(['{},{}'.format(start, length)] + ['-'] * (len(shape) - 1)))
+
+def plan_pieces(shapes, dtypes, partitions = None):
+    # [(key, slice spec, dtype, bytes)] : one piece per tensor, or partitions(key, shape)
+    # pieces split along axis 0 (partitions returns 1 to keep the tensor whole).
+    pieces = []
+    for key in sorted(shapes):
+        shape, dtype = shapes[key], dtypes[key]
+        size = (dtype.size if dtype != tf.string else 1) * int(np.prod(shape))
+        n = partitions(key, shape) if partitions and shape and dtype != tf.string else 1
+        n = max(1, min(n, shape[0])) if shape else 1
+        if n == 1:
+            pieces.append((key, '', dtype, size))
+            continue
+        # tf.fixed_size_partitioner 와 같이 앞쪽 조각이 하나씩 더 큼
+        bounds = np.cumsum([0] + [shape[0] // n + (i < shape[0] % n) for i in range(n)])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            pieces.append((key, _slice_spec(shape, int(start), int(end - start)), dtype,
+                    size * int(end - start) // shape[0]))
+    return pieces
+
+def assign_shards(pieces, num_shards):
+    # Largest piece first into the least-loaded shard.
+    shards = [[] for _ in range(num_shards)]
+    loads = [0] * num_shards
+    for piece in sorted(pieces, key = lambda p: -p[3]):
+        i = int(np.argmin(loads))
+        shards[i].append(piece)
+        loads[i] += piece[3]
+    return [shard for shard in shards if shard]
+
+def reshard_checkpoint(source_prefix, target_prefix, num_shards = None,
+        max_shard_bytes = 256 << 20, partitions = None, verify = True):
+    # Rewrites the checkpoint at source_prefix (e.g. tf.train.latest_checkpoint(checkpoint_dir))
+    # as target_prefix with num_shards balanced shards (default : enough for max_shard_bytes
+    # each), one per restoring worker / device for example. partitions(key, shape) -> n splits
+    # that tensor into n slices along axis 0 (for ShardedVariable layouts); 1 or None writes
+    # whole tensors, which every layout can restore.
+    # Every data file holds at most max_shard_bytes (or one larger piece), so a shard bigger
+    # than that is written as several consecutive files, and at most one file's pieces are in
+    # memory at a time (max_shard_bytes = None : one file per shard). Verification reads one
+    # tensor at a time. Returns a report dict.
+    reader = tf.train.load_checkpoint(source_prefix)
+    shapes = reader.get_variable_to_shape_map()
+    dtypes = reader.get_variable_to_dtype_map()
+    pieces = plan_pieces(shapes, dtypes, partitions)
+    total = sum(piece[3] for piece in pieces)
+    if num_shards is None:
+        num_shards = 1 if max_shard_bytes is None else int(math.ceil(total /
+                float(max_shard_bytes)))
+    shards = assign_shards(pieces, max(1, num_shards))
+
+    start = time.perf_counter()
+    temp_prefixes = []
+
+    def write_file(batch):
+        # 한 데이터 파일 분량만 읽어서 바로 씀
+        tensors = [tf.raw_ops.RestoreV2(prefix = source_prefix, tensor_names = [key],
+                shape_and_slices = [spec], dtypes = [dtype])[0] for key, spec, dtype, _ in batch]
+        temp_prefix = '{}_temp/part-{:05d}'.format(target_prefix, len(temp_prefixes))
+        tf.raw_ops.SaveV2(prefix = temp_prefix, tensor_names = [p[0] for p in batch],
+                shape_and_slices = [p[1] for p in batch], tensors = tensors)
+        temp_prefixes.append(temp_prefix)
+        return sum(p[3] for p in batch)
+
+    peak = 0
+    for shard in shards:
+        batch, batch_bytes = [], 0
+        for piece in shard:
+            if batch and max_shard_bytes is not None and \
+                    batch_bytes + piece[3] > max_shard_bytes:
+                peak = max(peak, write_file(batch))
+                batch, batch_bytes = [], 0
+            batch.append(piece)
+            batch_bytes += piece[3]
+        if batch:
+            peak = max(peak, write_file(batch))
+    # 데이터 파일을 target_prefix.data-0000i-of-0000N 으로 옮기고 인덱스를 합침
+    tf.raw_ops.MergeV2Checkpoints(checkpoint_prefixes = temp_prefixes,
+            destination_prefix = target_prefix, delete_old_dirs = True)
+    seconds = time.perf_counter() - start
+
+    report = {'tensors' : len(shapes), 'pieces' : len(pieces), 'shards' : len(shards),
+            'files' : len(temp_prefixes), 'bytes' : total, 'peak_buffer_bytes' : peak,
+            'seconds' : seconds,
+            'mb_per_s' : total / 2**20 / seconds}
+    if verify:
+        report['checksums'] = verify_checkpoints(source_prefix, target_prefix)
+    return report
+
+def verify_checkpoints(source_prefix, target_prefix):
+    # Compares the tensors of two checkpoints (whole tensors, whatever their slicing) by CRC32;
+    # raises ValueError on any difference. Returns the number of tensors compared.
+    source = tf.train.load_checkpoint(source_prefix)
+    target = tf.train.load_checkpoint(target_prefix)
+    source_shapes = source.get_variable_to_shape_map()
+    target_shapes = target.get_variable_to_shape_map()
+    if set(source_shapes) != set(target_shapes):
+        raise ValueError('Different tensors : {}'.format(
+                sorted(set(source_shapes) ^ set(target_shapes))))
+    for key in sorted(source_shapes):
+        if _checksum(source.get_tensor(key)) != _checksum(target.get_tensor(key)):
+            raise ValueError('Checksum mismatch : {}'.format(key))
+    return len(source_shapes)
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import subprocess
+    import sys
+    import tempfile
+
+    from tutorial27_onDeviceEpochLoop import create_model
+
+    def make_training():
+        model = create_model()
+        model(tf.zeros([1, 28, 28, 1]))
+        optimizer = tf.keras.optimizers.Adam()
+        optimizer.build(model.trainable_variables)
+        return model, optimizer, tf.train.Checkpoint(optimizer = optimizer, model = model)
+
+    def weight_checksums(model, optimizer):
+        return [_checksum(v.numpy()) for v in model.variables + optimizer.variables]
+
+    def run(devices, mode, prefix):
+        # mode 'train' : a few steps under MirroredStrategy, then save to prefix.
+        # mode 'restore' : read prefix under MirroredStrategy.
+        from tutorial26_logicalCpuMirrored import configure_logical_cpus, synthetic_mnist
+        strategy = tf.distribute.MirroredStrategy(devices = configure_logical_cpus(devices),
+                cross_device_ops = tf.distribute.ReductionToOneDevice())
+        with strategy.scope():
+            tf.keras.utils.set_random_seed(0)
+            model, optimizer, checkpoint = make_training()
+        if mode == 'train':
+            loss_object = tf.keras.losses.SparseCategoricalCrossentropy(
+                    reduction = tf.keras.losses.Reduction.NONE)
+            global_batch_size = 16 * strategy.num_replicas_in_sync
+
+            @tf.function
+            def train_step(inputs):
+                def step(inputs):
+                    images, labels = inputs
+                    with tf.GradientTape() as tape:
+                        loss = tf.nn.compute_average_loss(loss_object(labels,
+                                model(images, training = True)),
+                                global_batch_size = global_batch_size)
+                    optimizer.apply_gradients(zip(tape.gradient(loss,
+                            model.trainable_variables), model.trainable_variables))
+                strategy.run(step, args = (inputs,))
+
+            images, labels = synthetic_mnist(global_batch_size * 5)
+            dataset = tf.data.Dataset.from_tensor_slices((images, labels)).batch(
+                    global_batch_size)
+            for inputs in strategy.experimental_distribute_dataset(dataset):
+                train_step(inputs)
+            checkpoint.write(prefix)
+        else:
+            checkpoint.read(prefix).assert_consumed()
+        return {'devices' : strategy.num_replicas_in_sync,
+                'checksums' : weight_checksums(model, optimizer)}
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', default = None, choices = ['train', 'restore'])
+    parser.add_argument('--devices', type = int, default = 8)
+    parser.add_argument('--prefix', default = None)
+    args = parser.parse_args()
+
+    if args.worker:
+        os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+        print(json.dumps(run(args.devices, args.worker, args.prefix)))
+        sys.exit(0)
+
+    def worker(mode, devices, prefix):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', mode,
+                '--devices', str(devices), '--prefix', prefix], check = True,
+                stdout = subprocess.PIPE, universal_newlines = True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    directory = tempfile.mkdtemp()
+    source_prefix = os.path.join(directory, 'ckpt-8')
+    trained = worker('train', 8, source_prefix)
+    print('복제본 {} 개로 훈련 후 저장 : {}'.format(trained['devices'], sorted(
+            f for f in os.listdir(directory) if f.startswith('ckpt-8'))))
+
+    # 복제본 2 개로 옮기기 - 데이터 파일 2 개, 그리고 커널을 0 번 축으로 2 조각씩 나눈 경우
+    # 마지막은 샤드마다 256KB 이하의 파일로 나눠 씀 (메모리에도 256KB 또는 가장 큰 조각 하나만)
+    layouts = [('ckpt-2', {'num_shards' : 2}),
+            ('ckpt-2-sliced', {'num_shards' : 2,
+                    'partitions' : lambda key, shape: 2 if len(shape) >= 2 else 1}),
+            ('ckpt-2-capped', {'num_shards' : 2, 'max_shard_bytes' : 1 << 18,
+                    'partitions' : lambda key, shape: 4 if len(shape) >= 2 else 1})]
+    for name, kwargs in layouts:
+        target_prefix = os.path.join(directory, name)
+        report = reshard_checkpoint(source_prefix, target_prefix, **kwargs)
+        print('{} : 텐서 {} 개 -> 조각 {} 개, 샤드 {} 개 (파일 {} 개), {:.1f}MB, 최대 버퍼 {:.2f}MB, '
+                '{:.0f}MB/s, 체크섬 {} 개 일치'.format(name, report['tensors'], report['pieces'],
+                report['shards'], report['files'], report['bytes'] / 2**20,
+                report['peak_buffer_bytes'] / 2**20, report['mb_per_s'], report['checksums']))
+        largest = max(piece[3] for piece in plan_pieces(
+                tf.train.load_checkpoint(source_prefix).get_variable_to_shape_map(),
+                tf.train.load_checkpoint(source_prefix).get_variable_to_dtype_map(),
+                kwargs.get('partitions')))
+        assert report['peak_buffer_bytes'] <= max(kwargs.get('max_shard_bytes', 256 << 20),
+                largest)
+        assert report['files'] > report['shards'] or 'max_shard_bytes' not in kwargs
+        restored = worker('restore', 2, target_prefix)
+        assert restored['checksums'] == trained['checksums']
+
+        # tutorial27 처럼 전략 없이 복원
+        model, optimizer, checkpoint = make_training()
+        checkpoint.read(target_prefix).assert_consumed()
+        assert weight_checksums(model, optimizer) == trained['checksums']
+    print('복제본 2 개와 전략 없이 복원한 가중치 / 옵티마이저 상태가 원본과 같음')
@@ -0,0 +1,184 @@
+# https://www.tensorflow.org/tutorials/distribute/custom_training
+# 개요 : tutorial27 은 배치마다 파이썬에서 distributed_train_step 을 호출하고 손실을 파이썬으로 더하며,
+# 2 에포크마다 동기적으로 체크포인트를 저장. 한 번의 호출로 steps_per_execution 스텝을 실행하고 손실은
+# 장치의 변수에 누적하여 에포크 끝에 한 번만 읽으며, 복제본별 프리페치 버퍼 (InputOptions) 로 입력과
+# 계산을 겹치고, 체크포인트는 비동기로 저장. 여러 논리 CPU 에서 에포크 시간을 비교
+
+import time
+
+import tensorflow as tf
+
+def create_model():
+    # tutorial27 과 같은 모델
+    return tf.keras.Sequential([
+        tf.keras.layers.Conv2D(32, 3, activation = 'relu'),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Conv2D(64, 3, activation = 'relu'),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(64, activation = 'relu'),
+        tf.keras.layers.Dense(10, activation = 'softmax')
+    ])
+
+def distribute(strategy, dataset, per_replica_buffer_size = 2):
+    # Batches are copied to each replica's device ahead of use; the host pipeline also prefetches.
+    options = tf.distribute.InputOptions(experimental_fetch_to_device = True,
+            experimental_per_replica_buffer_size = per_replica_buffer_size)
+    return strategy.experimental_distribute_dataset(dataset.prefetch(tf.data.AUTOTUNE),
+            options = options)
+
+class EpochLoop(object):
+    # loop = EpochLoop(strategy, train_step, steps_per_execution = 20)
+    # train_loss = loop.run_epoch(train_dist_dataset)
+    # train_step is tutorial27's replica function (inputs -> per-replica loss). Every call of the
+    # compiled function runs up to steps_per_execution steps; the summed loss and the step
+    # count stay in variables until the end of the epoch.
+
+    def __init__(self, strategy, train_step, steps_per_execution = 20):
+        self.strategy = strategy
+        self.train_step = train_step
+        self.steps_per_execution = tf.constant(steps_per_execution)
+        # strategy.scope() 밖에서 만들어 복제되지 않는 일반 변수
+        self.total_loss = tf.Variable(0.0, trainable = False)
+        self.num_batches = tf.Variable(0, trainable = False)
+        self._run = tf.function(self._steps)
+
+    def _steps(self, iterator, k):
+        steps = tf.constant(0)
+        for _ in tf.range(k):
+            inputs = iterator.get_next_as_optional()
+            if not inputs.has_value():
+                break
+            per_replica_losses = self.strategy.run(self.train_step, args = (inputs.get_value(),))
+            self.total_loss.assign_add(self.strategy.reduce(tf.distribute.ReduceOp.SUM,
+                    per_replica_losses, axis = None))
+            self.num_batches.assign_add(1)
+            steps += 1
+        return steps
+
+    def run_epoch(self, dist_dataset):
+        # Mean training loss of one pass over dist_dataset.
+        self.total_loss.assign(0.0)
+        self.num_batches.assign(0)
+        iterator = iter(dist_dataset)
+        while int(self._run(iterator, self.steps_per_execution)) == self.steps_per_execution:
+            pass
+        return float(self.total_loss.numpy() / self.num_batches.numpy())
+
+class AsyncCheckpoint(object):
+    # checkpoint.save on a background thread : save() returns once the variables are copied,
+    # and the next save (or sync()) waits for the previous write to finish.
+
+    def __init__(self, checkpoint, prefix):
+        self.checkpoint = checkpoint
+        self.prefix = prefix
+        self.options = tf.train.CheckpointOptions(experimental_enable_async_checkpoint = True)
+
+    def save(self):
+        return self.checkpoint.save(self.prefix, options = self.options)
+
+    def sync(self):
+        self.checkpoint.sync()
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import tempfile
+
+    import numpy as np
+
+    from tutorial26_logicalCpuMirrored import configure_logical_cpus, synthetic_mnist
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type = int, default = 2)
+    parser.add_argument('--examples', type = int, default = 12800)
+    parser.add_argument('--epochs', type = int, default = 4)
+    parser.add_argument('--steps-per-execution', type = int, default = 20)
+    args = parser.parse_args()
+
+    devices = configure_logical_cpus(args.devices)
+    strategy = tf.distribute.MirroredStrategy(devices = devices,
+            cross_device_ops = tf.distribute.ReductionToOneDevice())
+    print('장치의 수 : {}'.format(strategy.num_replicas_in_sync))
+
+    BATCH_SIZE_PER_REPLICA = 64
+    GLOBAL_BATCH_SIZE = BATCH_SIZE_PER_REPLICA * strategy.num_replicas_in_sync
+    # 에포크 시간은 픽셀 값과 무관하므로 Fashion MNIST 모양의 무작위 데이터 사용
+    train_images, train_labels = synthetic_mnist(args.examples)
+    train_dataset = tf.data.Dataset.from_tensor_slices((train_images, train_labels)).batch(
+            GLOBAL_BATCH_SIZE)
+
+    def make_training(seed = 0):
+        # tutorial27 의 모델, 옵티마이저, 손실, train_step
+        with strategy.scope():
+            tf.keras.utils.set_random_seed(seed)
+            model = create_model()
+            optimizer = tf.keras.optimizers.Adam()
+            loss_object = tf.keras.losses.SparseCategoricalCrossentropy(
+                    reduction = tf.keras.losses.Reduction.NONE)
+            train_accuracy = tf.keras.metrics.SparseCategoricalAccuracy()
+
+        def train_step(inputs):
+            images, labels = inputs
+            with tf.GradientTape() as tape:
+                predictions = model(images, training = True)
+                loss = tf.nn.compute_average_loss(loss_object(labels, predictions),
+                        global_batch_size = GLOBAL_BATCH_SIZE)
+            gradients = tape.gradient(loss, model.trainable_variables)
+            optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            train_accuracy.update_state(labels, predictions)
+            return loss
+        return model, optimizer, train_step
+
+    def tutorial_epochs(epochs):
+        # tutorial27 의 루프 : 배치마다 호출, 파이썬 float 누적, 2 에포크마다 동기 저장
+        model, optimizer, train_step = make_training()
+        checkpoint = tf.train.Checkpoint(optimizer = optimizer, model = model)
+        prefix = os.path.join(tempfile.mkdtemp(), 'ckpt')
+        train_dist_dataset = strategy.experimental_distribute_dataset(train_dataset)
+
+        @tf.function
+        def distributed_train_step(dataset_inputs):
+            per_replica_losses = strategy.run(train_step, args = (dataset_inputs,))
+            return strategy.reduce(tf.distribute.ReduceOp.SUM, per_replica_losses, axis = None)
+
+        seconds, losses = [], []
+        for epoch in range(epochs):
+            start = time.perf_counter()
+            total_loss = 0.0
+            num_batches = 0
+            for x in train_dist_dataset:
+                total_loss += distributed_train_step(x)
+                num_batches += 1
+            losses.append(float(total_loss / num_batches))
+            if epoch % 2 == 0:
+                checkpoint.save(prefix)
+            seconds.append(time.perf_counter() - start)
+        return seconds, losses
+
+    def on_device_epochs(epochs, steps_per_execution):
+        model, optimizer, train_step = make_training()
+        checkpoint = AsyncCheckpoint(tf.train.Checkpoint(optimizer = optimizer, model = model),
+                os.path.join(tempfile.mkdtemp(), 'ckpt'))
+        loop = EpochLoop(strategy, train_step, steps_per_execution)
+        train_dist_dataset = distribute(strategy, train_dataset)
+
+        seconds, losses = [], []
+        for epoch in range(epochs):
+            start = time.perf_counter()
+            losses.append(loop.run_epoch(train_dist_dataset))
+            if epoch % 2 == 0:
+                checkpoint.save()
+            seconds.append(time.perf_counter() - start)
+        checkpoint.sync()
+        return seconds, losses
+
+    # 같은 초기값과 배치 순서이므로 에포크 손실이 같아야 함. 첫 에포크는 추적 포함이라 시간에서 제외
+    tutorial_seconds, tutorial_losses = tutorial_epochs(args.epochs)
+    print('tutorial27 루프 : {:.3f}s/epoch, 손실 {}'.format(np.median(tutorial_seconds[1:]),
+            np.round(tutorial_losses, 4)))
+    for k in sorted({1, args.steps_per_execution}):
+        seconds, losses = on_device_epochs(args.epochs, k)
+        np.testing.assert_allclose(losses, tutorial_losses, rtol = 1e-4)
+        print('steps_per_execution = {:>3d} : {:.3f}s/epoch ({:.2f}x)'.format(k,
+                np.median(seconds[1:]), np.median(tutorial_seconds[1:]) / np.median(seconds[1:])))
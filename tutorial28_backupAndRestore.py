@@ -0,0 +1,229 @@
+# https://www.tensorflow.org/tutorials/distribute/multi_worker_with_keras
+# 개요 : tutorial28 의 ModelCheckpoint 는 에포크 단위라서 워커 하나가 에포크 중간에 죽으면 모든 워커가
+# 에포크 시작부터 다시 훈련. 스텝 단위로 백업하는 콜백 - 치프는 임시 디렉터리에 쓴 뒤 이름 바꾸기로
+# 원자적으로 커밋하고, 다른 워커는 자기 임시 디렉터리에 쓰고 지움. 소비한 배치 수 (데이터 반복자 위치)
+# 를 함께 기록하여 정확히 그 스텝부터 재개. tutorial28_localCluster 로 워커를 죽여 잃은 작업량을 측정
+
+import json
+import os
+import shutil
+import time
+
+import tensorflow as tf
+
+class StepBackupAndRestore(tf.keras.callbacks.Callback):
+    # backup_dir must be reachable by every worker. Every save_freq steps all workers write the
+    # model and optimizer state; only the chief's copy is kept:
+    #   backup_dir/tmp-<step>  -> (rename) backup_dir/step-<step>  -> latest.json (os.replace)
+    # A crash before latest.json is replaced leaves the previous backup in effect.
+
+    def __init__(self, backup_dir, save_freq = 100, max_to_keep = 2):
+        super(StepBackupAndRestore, self).__init__()
+        self.backup_dir = backup_dir
+        self.save_freq = save_freq
+        self.max_to_keep = max_to_keep
+        self.global_step = 0
+        self.save_seconds = []
+        self._ckpt = None
+
+    def _task(self):
+        resolver = getattr(self.model.distribute_strategy, 'cluster_resolver', None)
+        if resolver is None or not resolver.task_type:
+            return 'chief', 0
+        return resolver.task_type, resolver.task_id
+
+    def _is_chief(self):
+        # 치프가 없는 클러스터에서는 worker 0 이 치프
+        task_type, task_id = self._task()
+        return task_type == 'chief' or (task_type == 'worker' and task_id == 0)
+
+    def _checkpoint(self):
+        if self._ckpt is None:
+            self._ckpt = tf.train.Checkpoint(model = self.model, optimizer = self.model.optimizer)
+        return self._ckpt
+
+    def latest(self):
+        # {'global_step', 'checkpoint'} of the last committed backup, or None.
+        path = os.path.join(self.backup_dir, 'latest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def restore(self, model):
+        # Loads the last committed backup into model (built and compiled under its strategy)
+        # and returns the number of steps already trained.
+        self.set_model(model)
+        state = self.latest()
+        self.global_step = state['global_step'] if state else 0
+        if state:
+            with model.distribute_strategy.scope():
+                # 슬롯 변수가 있어야 옵티마이저 상태도 바로 복원됨
+                model.optimizer.build(model.trainable_variables)
+            self._checkpoint().read(os.path.join(self.backup_dir, state['checkpoint'],
+                    'ckpt')).assert_consumed()
+        return self.global_step
+
+    def save(self):
+        start = time.perf_counter()
+        task_type, task_id = self._task()
+        if self._is_chief():
+            temp_dir = os.path.join(self.backup_dir, 'tmp-{}'.format(self.global_step))
+        else:
+            temp_dir = os.path.join(self.backup_dir,
+                    'workertemp_{}_{}'.format(task_type, task_id))
+        # 저장에 collective 연산이 들어갈 수 있으므로 모든 워커가 같은 스텝에서 write 를 호출
+        self._checkpoint().write(os.path.join(temp_dir, 'ckpt'))
+        if not self._is_chief():
+            shutil.rmtree(temp_dir, ignore_errors = True)
+            return
+
+        name = 'step-{}'.format(self.global_step)
+        shutil.rmtree(os.path.join(self.backup_dir, name), ignore_errors = True)
+        os.rename(temp_dir, os.path.join(self.backup_dir, name))
+        latest = os.path.join(self.backup_dir, 'latest.json')
+        with open(latest + '.tmp', 'w') as f:
+            json.dump({'global_step' : self.global_step, 'checkpoint' : name}, f)
+        os.replace(latest + '.tmp', latest)
+
+        # 오래된 백업과 커밋되지 않은 임시 디렉터리 정리
+        steps = sorted(int(entry[len('step-'):]) for entry in os.listdir(self.backup_dir)
+                if entry.startswith('step-'))
+        for step in steps[:-self.max_to_keep]:
+            shutil.rmtree(os.path.join(self.backup_dir, 'step-{}'.format(step)),
+                    ignore_errors = True)
+        for entry in os.listdir(self.backup_dir):
+            if entry.startswith('tmp-'):
+                shutil.rmtree(os.path.join(self.backup_dir, entry), ignore_errors = True)
+        self.save_seconds.append(time.perf_counter() - start)
+
+    def on_train_begin(self, logs = None):
+        os.makedirs(self.backup_dir, exist_ok = True)
+
+    def on_train_batch_end(self, batch, logs = None):
+        self.global_step += 1
+        if self.global_step % self.save_freq == 0:
+            self.save()
+
+def fit_with_backup(model, dataset, epochs, steps_per_epoch, backup, callbacks = (), **kwargs):
+    # model.fit that resumes from backup at the exact step. dataset is one epoch of batches in
+    # a deterministic order (a seeded shuffle is fine); it is repeated here and the batches
+    # already trained on are skipped, so the resumed run sees the same batches.
+    global_step = backup.restore(model)
+    epoch, step = divmod(global_step, steps_per_epoch)
+    callbacks = [backup] + list(callbacks)
+    if step:
+        # 중단된 에포크의 나머지 스텝
+        model.fit(dataset.repeat().skip(global_step), initial_epoch = epoch, epochs = epoch + 1,
+                steps_per_epoch = steps_per_epoch - step, callbacks = callbacks, **kwargs)
+        epoch += 1
+    if epoch < epochs:
+        model.fit(dataset.repeat().skip(epoch * steps_per_epoch), initial_epoch = epoch,
+                epochs = epochs, steps_per_epoch = steps_per_epoch, callbacks = callbacks,
+                **kwargs)
+    return global_step
+
+class ProgressFile(tf.keras.callbacks.Callback):
+    # Writes the number of finished steps to path after every step (to measure lost work).
+
+    def __init__(self, path, initial_step = 0):
+        super(ProgressFile, self).__init__()
+        self.path = path
+        self.step = initial_step
+
+    def on_train_batch_end(self, batch, logs = None):
+        self.step += 1
+        with open(self.path + '.tmp', 'w') as f:
+            f.write(str(self.step))
+        os.replace(self.path + '.tmp', self.path)
+
+def read_progress(path):
+    try:
+        with open(path) as f:
+            return int(f.read())
+    except (IOError, ValueError):
+        return 0
+
+def backup_benchmark(backup_dir, epochs = 3, steps_per_epoch = 40, save_freq = 10,
+        batch_size_per_worker = 64, step_delay = 0.0):
+    # LocalCluster target : build_and_compile_cnn_model() trained with step-granular backups.
+    # step_delay (seconds) slows every step so a test can kill a worker mid-epoch.
+    from tutorial28_localCluster import build_and_compile_cnn_model, summarize, \
+            synthetic_mnist, task_index
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    global_batch_size = batch_size_per_worker * strategy.num_replicas_in_sync
+    images, labels = synthetic_mnist(global_batch_size * steps_per_epoch, seed = 0)
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).shuffle(len(images),
+            seed = 0).batch(global_batch_size).with_options(options)
+
+    with strategy.scope():
+        tf.keras.utils.set_random_seed(0)
+        model = build_and_compile_cnn_model()
+    backup = StepBackupAndRestore(backup_dir, save_freq = save_freq)
+    progress = ProgressFile(os.path.join(backup_dir, 'progress_{}'.format(task_index())))
+    delay = tf.keras.callbacks.LambdaCallback(on_train_batch_end = lambda batch, logs:
+            time.sleep(step_delay))
+
+    # progress 는 복원된 스텝부터 셈
+    progress.step = (backup.latest() or {'global_step' : 0})['global_step']
+    restored_step = fit_with_backup(model, dataset, epochs, steps_per_epoch, backup,
+            callbacks = [progress, delay], verbose = 0)
+    return {'task_index' : task_index(), 'restored_step' : restored_step,
+            'global_step' : backup.global_step, 'save' : summarize([0.0] + backup.save_seconds),
+            'weights' : [float(tf.reduce_sum(v ** 2)) for v in model.trainable_variables]}
+
+if __name__ == '__main__':
+    import tempfile
+
+    import numpy as np
+
+    from tutorial28_localCluster import LocalCluster
+
+    NUM_WORKERS = 2
+    EPOCHS = 3
+    STEPS_PER_EPOCH = 40
+    SAVE_FREQ = 10
+    KILL_AFTER = 55 # 두 번째 에포크의 중간
+    target = 'tutorial28_backupAndRestore:backup_benchmark'
+    kwargs = {'epochs' : EPOCHS, 'steps_per_epoch' : STEPS_PER_EPOCH, 'save_freq' : SAVE_FREQ}
+
+    # 중단 없는 기준 실행
+    with LocalCluster(NUM_WORKERS) as cluster:
+        reference = cluster.run(target, dict(kwargs, backup_dir = tempfile.mkdtemp()))
+        cluster.cleanup()
+    print('중단 없음 : {} 스텝, 백업 {:.1f}ms'.format(reference[0]['global_step'],
+            reference[0]['save']['median_ms']))
+
+    # 훈련 도중 워커 1 을 죽인 뒤 같은 backup_dir 로 다시 시작
+    backup_dir = tempfile.mkdtemp(prefix = 'backup_')
+    faulty = dict(kwargs, backup_dir = backup_dir, step_delay = 0.05)
+    with LocalCluster(NUM_WORKERS) as cluster:
+        cluster.start(target, faulty)
+        progress_path = os.path.join(backup_dir, 'progress_0')
+        while read_progress(progress_path) < KILL_AFTER:
+            assert all(code is None for code in cluster.poll()), cluster.work_dir
+            time.sleep(0.01)
+        cluster.kill(1)
+        try:
+            cluster.wait(timeout = 60)
+        except RuntimeError as e:
+            print('워커 1 종료 :', e)
+        killed_at = read_progress(progress_path)
+        resumed = cluster.run(target, faulty)
+        cluster.cleanup()
+
+    restored_step = resumed[0]['restored_step']
+    assert restored_step % SAVE_FREQ == 0 and restored_step <= killed_at
+    assert resumed[0]['global_step'] == EPOCHS * STEPS_PER_EPOCH
+    # 같은 배치 순서로 재개했으므로 중단 없는 실행과 같은 가중치
+    for r in resumed:
+        np.testing.assert_allclose(r['weights'], reference[0]['weights'], rtol = 1e-4,
+                atol = 1e-7)
+    epoch_start = killed_at // STEPS_PER_EPOCH * STEPS_PER_EPOCH
+    print('중단 시점 {} 스텝, 복원 {} 스텝 -> 다시 한 스텝 {} (에포크 단위 백업이면 {})'.format(
+            killed_at, restored_step, killed_at - restored_step, killed_at - epoch_start))
+    print('중단 없는 실행과 같은 가중치')
+    shutil.rmtree(backup_dir, ignore_errors = True)
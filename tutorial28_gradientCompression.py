@@ -0,0 +1,249 @@
+# https://www.tensorflow.org/tutorials/distribute/multi_worker_with_keras
+# 개요 : 사용자 정의 훈련 루프에서 쓰는 그래디언트 통신 계층. 변수마다 따로 all-reduce 하는 대신 작은
+# 텐서들을 버킷(하나의 평탄화된 버퍼)으로 묶고, 선택적으로 fp16 변환 또는 오차 피드백(error feedback)
+# 이 있는 top-k 희소화로 압축. fp16 은 LossScaleOptimizer 처럼 동적 스케일을 곱해 보내서 작은
+# 그래디언트가 0 으로 사라지지 않게 함. 스텝 시간과 텐서 크기로 추정한 전송 바이트 수를 기록하며,
+# tutorial28_localCluster 로 루프백에서 실행
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+class PerVariableAllReduce(object):
+    # Baseline : one all-reduce per gradient tensor.
+    # bytes_per_step of every communicator is estimated from the tensor sizes (payload per
+    # replica), not measured on the wire.
+
+    def build(self, variables):
+        self.sizes = [int(np.prod(v.shape)) for v in variables]
+        self.bytes_per_step = sum(4 * n for n in self.sizes)
+
+    def __call__(self, grads):
+        context = tf.distribute.get_replica_context()
+        return [context.all_reduce(tf.distribute.ReduceOp.SUM, g) for g in grads]
+
+class BucketedAllReduce(object):
+    # Consecutive gradients are flattened into buckets of up to bucket_bytes (fp32) and every
+    # bucket is all-reduced at once. compression = 'fp16' sends the buckets as float16, scaled
+    # by a dynamic loss scale like LossScaleOptimizer : gradients are multiplied by the scale
+    # before the cast (so small values do not flush to zero) and divided after the all-reduce.
+    # A step with inf / NaN halves the scale and returns zero gradients (the step is skipped
+    # for plain SGD); growth_steps finite steps in a row double it. build() must then run under
+    # strategy.scope().
+
+    def __init__(self, bucket_bytes = 4 << 20, compression = None, initial_loss_scale = 2. ** 15,
+            growth_steps = 2000):
+        if compression not in (None, 'fp16'):
+            raise ValueError('Unknown compression : {}'.format(compression))
+        self.bucket_bytes = bucket_bytes
+        self.compression = compression
+        self.initial_loss_scale = initial_loss_scale
+        self.growth_steps = growth_steps
+
+    def build(self, variables):
+        self.shapes = [v.shape for v in variables]
+        self.sizes = [int(np.prod(v.shape)) for v in variables]
+        self.buckets = []
+        current, current_bytes = [], 0
+        for i, size in enumerate(self.sizes):
+            if current and current_bytes + 4 * size > self.bucket_bytes:
+                self.buckets.append(current)
+                current, current_bytes = [], 0
+            current.append(i)
+            current_bytes += 4 * size
+        if current:
+            self.buckets.append(current)
+        element_bytes = 2 if self.compression == 'fp16' else 4
+        self.bytes_per_step = element_bytes * sum(self.sizes)
+        if self.compression == 'fp16':
+            # 모든 복제본이 같은 all-reduce 결과를 보므로 스케일 갱신도 같음
+            self.loss_scale = tf.Variable(self.initial_loss_scale, trainable = False,
+                    dtype = tf.float32,
+                    aggregation = tf.VariableAggregation.ONLY_FIRST_REPLICA)
+            self.good_steps = tf.Variable(0, trainable = False, dtype = tf.int64,
+                    aggregation = tf.VariableAggregation.ONLY_FIRST_REPLICA)
+
+    def _pack(self, grads, bucket):
+        return tf.concat([tf.reshape(grads[i], [-1]) for i in bucket], axis = 0)
+
+    def _unpack(self, flat, bucket, result):
+        parts = tf.split(flat, [self.sizes[i] for i in bucket])
+        for i, part in zip(bucket, parts):
+            result[i] = tf.reshape(part, self.shapes[i])
+
+    def _reduce_bucket(self, flat, b):
+        context = tf.distribute.get_replica_context()
+        if self.compression == 'fp16':
+            scale = tf.identity(self.loss_scale)
+            reduced = context.all_reduce(tf.distribute.ReduceOp.SUM,
+                    tf.cast(flat * scale, tf.float16))
+            return tf.cast(reduced, tf.float32) / scale
+        return context.all_reduce(tf.distribute.ReduceOp.SUM, flat)
+
+    def _update_loss_scale(self, grads):
+        finite = tf.reduce_all([tf.reduce_all(tf.math.is_finite(g)) for g in grads])
+        good_steps = tf.where(finite, self.good_steps + 1, tf.constant(0, tf.int64))
+        grow = good_steps >= self.growth_steps
+        scale = tf.where(finite, tf.where(grow, 2 * self.loss_scale, self.loss_scale),
+                tf.maximum(self.loss_scale / 2, 1.))
+        self.loss_scale.assign(scale)
+        self.good_steps.assign(tf.where(grow, tf.constant(0, tf.int64), good_steps))
+        return [tf.where(finite, g, tf.zeros_like(g)) for g in grads]
+
+    def __call__(self, grads):
+        result = [None] * len(grads)
+        for b, bucket in enumerate(self.buckets):
+            self._unpack(self._reduce_bucket(self._pack(grads, bucket), b), bucket, result)
+        if self.compression == 'fp16':
+            result = self._update_loss_scale(result)
+        return result
+
+class TopKAllReduce(BucketedAllReduce):
+    # Top-k sparsification with error feedback : per bucket, only the k = ratio * size largest
+    # entries of (gradient + residual) are exchanged as (value, index) pairs with all_gather;
+    # what was not sent stays in a per-replica residual and is added back next step.
+    # build() must run under strategy.scope() so each replica gets its own residuals.
+
+    def __init__(self, ratio = 0.01, bucket_bytes = 4 << 20):
+        super(TopKAllReduce, self).__init__(bucket_bytes)
+        self.ratio = ratio
+
+    def build(self, variables):
+        super(TopKAllReduce, self).build(variables)
+        self.bucket_sizes = [sum(self.sizes[i] for i in bucket) for bucket in self.buckets]
+        self.ks = [max(1, int(self.ratio * size)) for size in self.bucket_sizes]
+        self.residuals = [tf.Variable(tf.zeros([size]), trainable = False,
+                synchronization = tf.VariableSynchronization.ON_READ,
+                aggregation = tf.VariableAggregation.SUM) for size in self.bucket_sizes]
+        # 값(float32) + 인덱스(int32)
+        self.bytes_per_step = sum(8 * k for k in self.ks)
+
+    def _reduce_bucket(self, flat, b):
+        context = tf.distribute.get_replica_context()
+        residual = self.residuals[b]
+        accumulated = flat + residual
+        _, indices = tf.math.top_k(tf.abs(accumulated), k = self.ks[b], sorted = False)
+        values = tf.gather(accumulated, indices)
+        sent = tf.scatter_nd(indices[:, None], values, [self.bucket_sizes[b]])
+        residual.assign(accumulated - sent)
+
+        all_values = context.all_gather(values, axis = 0)
+        all_indices = context.all_gather(indices, axis = 0)
+        return tf.scatter_nd(all_indices[:, None], all_values, [self.bucket_sizes[b]])
+
+def make_communicator(method, **kwargs):
+    if method == 'per_variable':
+        return PerVariableAllReduce()
+    if method == 'bucketed':
+        return BucketedAllReduce(**kwargs)
+    if method == 'fp16':
+        return BucketedAllReduce(compression = 'fp16', **kwargs)
+    if method == 'topk':
+        return TopKAllReduce(**kwargs)
+    raise ValueError('Unknown method : {}'.format(method))
+
+def make_train_step(strategy, model, optimizer, communicator, global_batch_size):
+    loss_object = tf.keras.losses.SparseCategoricalCrossentropy(
+            reduction = tf.keras.losses.Reduction.NONE)
+
+    def replica_step(images, labels):
+        with tf.GradientTape() as tape:
+            predictions = model(images, training = True)
+            loss = tf.nn.compute_average_loss(loss_object(labels, predictions),
+                    global_batch_size = global_batch_size)
+        grads = tape.gradient(loss, model.trainable_variables)
+        # 평균 손실의 그래디언트이므로 합이 곧 전역 평균
+        grads = communicator(grads)
+        optimizer.apply_gradients(zip(grads, model.trainable_variables),
+                skip_gradients_aggregation = True)
+        return loss
+
+    @tf.function
+    def train_step(iterator):
+        images, labels = next(iterator)
+        losses = strategy.run(replica_step, args = (images, labels))
+        return strategy.reduce(tf.distribute.ReduceOp.SUM, losses, axis = None)
+
+    return train_step
+
+def compression_benchmark(method = 'bucketed', steps = 50, batch_size_per_worker = 64,
+        learning_rate = 0.05, seed = 0, **kwargs):
+    # LocalCluster target : custom-loop training of the tutorial28 CNN with one communicator.
+    from tutorial28_localCluster import build_and_compile_cnn_model, summarize, \
+            synthetic_mnist, task_index
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    global_batch_size = batch_size_per_worker * strategy.num_replicas_in_sync
+    images, labels = synthetic_mnist(global_batch_size * steps, seed = seed)
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).batch(global_batch_size)
+    iterator = iter(strategy.experimental_distribute_dataset(dataset.with_options(options)))
+
+    with strategy.scope():
+        tf.keras.utils.set_random_seed(seed)
+        model = build_and_compile_cnn_model()
+        optimizer = tf.keras.optimizers.SGD(learning_rate = learning_rate)
+        communicator = make_communicator(method, **kwargs)
+        communicator.build(model.trainable_variables)
+    train_step = make_train_step(strategy, model, optimizer, communicator, global_batch_size)
+
+    seconds, losses = [], []
+    for _ in range(steps):
+        start = time.perf_counter()
+        losses.append(float(train_step(iterator)))
+        seconds.append(time.perf_counter() - start)
+
+    dense_bytes = 4 * sum(int(np.prod(v.shape)) for v in model.trainable_variables)
+    # 전송 바이트 수는 텐서 크기로 추정한 값 (실제 네트워크 트래픽을 잰 것이 아님)
+    return {'task_index' : task_index(), 'method' : method,
+            'num_workers' : strategy.num_replicas_in_sync, 'step' : summarize(seconds),
+            'est_bytes_per_step' : communicator.bytes_per_step,
+            'est_bytes_sent' : communicator.bytes_per_step * steps,
+            'compression_ratio' : dense_bytes / communicator.bytes_per_step,
+            'first_loss' : losses[0], 'last_loss' : float(np.mean(losses[-5:])),
+            'weights' : [float(np.sum(v.numpy() ** 2)) for v in model.trainable_variables]}
+
+if __name__ == '__main__':
+    import argparse
+
+    from tutorial28_localCluster import LocalCluster
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type = int, default = 2)
+    parser.add_argument('--steps', type = int, default = 50)
+    args = parser.parse_args()
+
+    # fp16 손실 스케일 확인 - fp16 의 최소값 (약 6e-8) 보다 작은 그래디언트도 살아남고, inf 는 스케일을
+    # 줄이고 0 그래디언트가 됨
+    communicator = BucketedAllReduce(compression = 'fp16')
+    communicator.build([tf.zeros([4]), tf.zeros([2, 3])])
+    tiny = [tf.fill([4], 1e-8), tf.fill([2, 3], -3e-8)]
+    for g, reduced in zip(tiny, communicator(tiny)):
+        np.testing.assert_allclose(reduced.numpy(), g.numpy(), rtol = 1e-2)
+    assert not tf.cast(tf.cast(tiny[0], tf.float16), tf.float32).numpy().any()
+    overflow = communicator([tf.fill([4], 1e5), tf.zeros([2, 3])])
+    assert not overflow[0].numpy().any() and float(communicator.loss_scale) == 2. ** 14
+
+    target = 'tutorial28_gradientCompression:compression_benchmark'
+    results = {}
+    with LocalCluster(args.workers) as cluster:
+        for method in ['per_variable', 'bucketed', 'fp16', 'topk']:
+            results[method] = cluster.run(target, {'method' : method, 'steps' : args.steps})
+        cluster.cleanup()
+
+    # 버킷으로 묶어도 결과는 같고, 워커들의 가중치는 서로 같아야 함
+    for method, workers in results.items():
+        for r in workers[1:]:
+            np.testing.assert_allclose(r['weights'], workers[0]['weights'], rtol = 1e-5)
+    np.testing.assert_allclose(results['bucketed'][0]['weights'],
+            results['per_variable'][0]['weights'], rtol = 1e-4)
+
+    print('{:<13s} {:>10s} {:>10s} {:>16s} {:>7s} {:>16s}'.format('method', 'step', 'p90',
+            'est. bytes/step', 'ratio', 'loss first/last'))
+    for method, workers in results.items():
+        r = workers[0]
+        print('{:<13s} {:>8.1f}ms {:>8.1f}ms {:>16d} {:>6.1f}x {:>8.3f}/{:.3f}'.format(method,
+                r['step']['median_ms'], r['step']['p90_ms'], r['est_bytes_per_step'],
+                r['compression_ratio'], r['first_loss'], r['last_loss']))
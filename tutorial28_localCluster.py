@@ -0,0 +1,330 @@
+# https://www.tensorflow.org/tutorials/distribute/multi_worker_with_keras
+# 개요 : 한 머신에서 MultiWorkerMirroredStrategy 를 실행하는 로컬 다중 프로세스 클러스터. 빈 포트로
+# 워커마다 TF_CONFIG 를 만들어 N 개의 워커 프로세스를 띄우고, 'module:function' 대상 함수를 각 워커에서
+# 실행하여 결과 (스텝 시간, all-reduce 지연 등) 를 모은 뒤 모든 프로세스를 정리.
+# tutorial28 / 29 의 build_and_compile_cnn_model() / model_fn 벤치마크 대상 포함
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+def free_ports(n):
+    # Ports the OS reports free right now (sockets stay open until all are chosen, so they
+    # are distinct).
+    sockets = []
+    try:
+        for _ in range(n):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind(('localhost', 0))
+            sockets.append(s)
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+def make_tf_config(ports, index, task_type = 'worker'):
+    return json.dumps({
+        'cluster' : {'worker' : ['localhost:{}'.format(port) for port in ports]},
+        'task' : {'type' : task_type, 'index' : index}
+    })
+
+class LocalCluster(object):
+    # with LocalCluster(2) as cluster:
+    #     results = cluster.run('tutorial28_localCluster:keras_benchmark', {'steps' : 50})
+    # Every worker runs target(**kwargs) with its own TF_CONFIG; the JSON-serializable return
+    # values come back in worker index order. Worker output goes to log files in work_dir.
+
+    def __init__(self, num_workers, work_dir = None, env = None):
+        self.num_workers = num_workers
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix = 'local_cluster_')
+        self.env = env or {}
+        self.processes = []
+        self.ports = None
+
+    def _result_path(self, index):
+        return os.path.join(self.work_dir, 'result_{}.json'.format(index))
+
+    def log_path(self, index):
+        return os.path.join(self.work_dir, 'worker_{}.log'.format(index))
+
+    def start(self, target, kwargs = None):
+        self.shutdown()
+        self.ports = free_ports(self.num_workers)
+        for index in range(self.num_workers):
+            if os.path.exists(self._result_path(index)):
+                os.remove(self._result_path(index))
+            # self.env 가 기본값 (os.environ, 로그 수준) 을 덮어쓰고, TF_CONFIG 는 항상 이 클러스터
+            env = dict(os.environ)
+            env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+            env.update(self.env)
+            env['TF_CONFIG'] = make_tf_config(self.ports, index)
+            # 워커가 대상 모듈을 찾을 수 있도록 이 파일의 디렉터리를 경로에 추가
+            env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(
+                    os.path.abspath(__file__)), env.get('PYTHONPATH')]))
+            command = [sys.executable, os.path.abspath(__file__), '--worker',
+                    '--target', target, '--kwargs', json.dumps(kwargs or {}),
+                    '--result', self._result_path(index)]
+            log = open(self.log_path(index), 'w')
+            # 새 프로세스 그룹으로 실행해서 정리할 때 자식 프로세스까지 함께 종료
+            self.processes.append(subprocess.Popen(command, env = env, stdout = log,
+                    stderr = subprocess.STDOUT, start_new_session = True))
+            log.close()
+        return self
+
+    def poll(self):
+        return [p.poll() for p in self.processes]
+
+    def kill(self, index, sig = signal.SIGKILL):
+        # Simulates a worker failure.
+        process = self.processes[index]
+        if process.poll() is None:
+            os.killpg(process.pid, sig)
+            process.wait()
+
+    def wait(self, timeout = 600):
+        # Waits for every worker; on a failure or timeout the remaining workers are stopped
+        # (they would otherwise block forever in collectives) and RuntimeError is raised.
+        deadline = time.monotonic() + timeout
+        while True:
+            codes = self.poll()
+            if all(code == 0 for code in codes):
+                return self.results()
+            failed = [i for i, code in enumerate(codes) if code not in (None, 0)]
+            if failed or time.monotonic() > deadline:
+                self.shutdown()
+                reason = 'workers {} failed'.format(failed) if failed else 'timeout'
+                raise RuntimeError('{} (logs : {})'.format(reason, self.work_dir))
+            time.sleep(0.1)
+
+    def results(self):
+        results = []
+        for index in range(self.num_workers):
+            with open(self._result_path(index)) as f:
+                results.append(json.load(f))
+        return results
+
+    def run(self, target, kwargs = None, timeout = 600):
+        return self.start(target, kwargs).wait(timeout)
+
+    def shutdown(self, grace = 5.0):
+        for process in self.processes:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + grace
+        for process in self.processes:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+        self.processes = []
+
+    def cleanup(self):
+        self.shutdown()
+        shutil.rmtree(self.work_dir, ignore_errors = True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+def worker_main(target, kwargs, result_path):
+    module_name, function_name = target.split(':')
+    result = getattr(importlib.import_module(module_name), function_name)(**kwargs)
+    # 원자적으로 결과 기록
+    with open(result_path + '.tmp', 'w') as f:
+        json.dump(result, f)
+    os.replace(result_path + '.tmp', result_path)
+
+# 벤치마크 대상 - tutorial28 / 29 를 가져오면 모듈 수준의 훈련이 실행되므로 모델 정의를 복사해 둠
+
+def build_and_compile_cnn_model():
+    import tensorflow as tf
+    model = tf.keras.Sequential([
+        tf.keras.layers.Conv2D(32, 3, activation = 'relu', input_shape = (28, 28, 1)),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(64, activation = 'relu'),
+        tf.keras.layers.Dense(10, activation = 'softmax')
+    ])
+    model.compile(loss = tf.keras.losses.sparse_categorical_crossentropy,
+            optimizer = tf.keras.optimizers.SGD(learning_rate = 0.001),
+            metrics = ['accuracy'])
+    return model
+
+LEARNING_RATE = 1e-4
+BATCH_SIZE = 64
+
+def model_fn(features, labels, mode):
+    import tensorflow as tf
+    model = tf.keras.Sequential([
+        tf.keras.layers.Conv2D(32, 3, activation = 'relu', input_shape = (28, 28, 1)),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(64, activation = 'relu'),
+        tf.keras.layers.Dense(10),
+    ])
+    logits = model(features, training = False)
+
+    if mode == tf.estimator.ModeKeys.PREDICT:
+        predictions = {'logits': logits}
+        return tf.estimator.EstimatorSpec(mode, predictions = predictions)
+
+    optimizer = tf.compat.v1.train.GradientDescentOptimizer(learning_rate = LEARNING_RATE)
+    loss = tf.keras.losses.SparseCategoricalCrossentropy(from_logits = True,
+            reduction = tf.keras.losses.Reduction.NONE)(labels, logits)
+    loss = tf.reduce_sum(loss) * (1. / BATCH_SIZE)
+    if mode == tf.estimator.ModeKeys.EVAL :
+        return tf.estimator.EstimatorSpec(mode, loss = loss)
+    return tf.estimator.EstimatorSpec(mode = mode, loss = loss,
+            train_op = optimizer.minimize(loss, tf.compat.v1.train.get_or_create_global_step()))
+
+def synthetic_mnist(n_examples, seed):
+    # Step and all-reduce times do not depend on pixel values; avoids a download per worker.
+    import numpy as np
+    rng = np.random.RandomState(seed)
+    return (rng.rand(n_examples, 28, 28, 1).astype('float32'),
+            rng.randint(0, 10, n_examples).astype('int64'))
+
+def task_index():
+    return json.loads(os.environ['TF_CONFIG'])['task']['index']
+
+def summarize(seconds):
+    import numpy as np
+    seconds = np.asarray(seconds[1:] if len(seconds) > 1 else seconds) # 첫 스텝 (추적) 제외
+    return {'median_ms' : float(1000 * np.median(seconds)),
+            'p90_ms' : float(1000 * np.percentile(seconds, 90)),
+            'mean_ms' : float(1000 * seconds.mean()), 'count' : int(len(seconds))}
+
+def allreduce_latency(strategy, variables, repeats = 20):
+    # All-reduce of gradient-sized tensors, one call per model update, in a tf.function.
+    import tensorflow as tf
+    tensors = [tf.ones(v.shape, v.dtype) for v in variables]
+
+    @tf.function
+    def reduce():
+        return strategy.run(lambda: tf.distribute.get_replica_context().all_reduce(
+                tf.distribute.ReduceOp.SUM, tensors))
+
+    seconds = []
+    for _ in range(repeats + 1):
+        start = time.perf_counter()
+        result = reduce()
+        strategy.experimental_local_results(result[0])[0].numpy()
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+def keras_benchmark(steps = 50, batch_size_per_worker = 64):
+    # build_and_compile_cnn_model() fit under MultiWorkerMirroredStrategy.
+    import tensorflow as tf
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    global_batch_size = batch_size_per_worker * strategy.num_replicas_in_sync
+    images, labels = synthetic_mnist(global_batch_size * steps, seed = 0)
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).batch(global_batch_size)
+    dataset = dataset.with_options(options)
+
+    with strategy.scope():
+        model = build_and_compile_cnn_model()
+
+    class StepTimer(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super(StepTimer, self).__init__()
+            self.seconds = []
+        def on_train_batch_begin(self, batch, logs = None):
+            self.start = time.perf_counter()
+        def on_train_batch_end(self, batch, logs = None):
+            self.seconds.append(time.perf_counter() - self.start)
+
+    timer = StepTimer()
+    start = time.perf_counter()
+    model.fit(dataset, epochs = 1, steps_per_epoch = steps, callbacks = [timer], verbose = 0)
+    elapsed = time.perf_counter() - start
+    return {'task_index' : task_index(), 'num_workers' : strategy.num_replicas_in_sync,
+            'global_batch_size' : global_batch_size, 'step' : summarize(timer.seconds),
+            'examples_per_s' : global_batch_size * steps / elapsed,
+            'allreduce' : allreduce_latency(strategy, model.trainable_variables)}
+
+def estimator_benchmark(steps = 50, model_dir = None):
+    # tutorial29 의 model_fn 을 Estimator + MultiWorkerMirroredStrategy 로 훈련
+    import tensorflow as tf
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+
+    def input_fn(mode, input_context = None):
+        images, labels = synthetic_mnist(BATCH_SIZE * steps, seed = 0)
+        dataset = tf.data.Dataset.from_tensor_slices((images, labels))
+        if input_context:
+            dataset = dataset.shard(input_context.num_input_pipelines,
+                    input_context.input_pipeline_id)
+        return dataset.batch(BATCH_SIZE).repeat()
+
+    class StepTimerHook(tf.estimator.SessionRunHook):
+        def __init__(self):
+            self.seconds = []
+        def before_run(self, run_context):
+            self.start = time.perf_counter()
+        def after_run(self, run_context, run_values):
+            self.seconds.append(time.perf_counter() - self.start)
+
+    hook = StepTimerHook()
+    config = tf.estimator.RunConfig(train_distribute = strategy)
+    classifier = tf.estimator.Estimator(model_fn = model_fn, config = config,
+            model_dir = model_dir or tempfile.mkdtemp(prefix = 'multiworker_'))
+    # 다중 워커 Estimator 는 train_and_evaluate 로만 실행 가능 (estimator.train 은 지원 안 됨)
+    tf.estimator.train_and_evaluate(classifier,
+            train_spec = tf.estimator.TrainSpec(input_fn = input_fn, max_steps = steps,
+                    hooks = [hook]),
+            eval_spec = tf.estimator.EvalSpec(input_fn = input_fn, steps = 1))
+    return {'task_index' : task_index(), 'num_workers' : strategy.num_replicas_in_sync,
+            'step' : summarize(hook.seconds)}
+
+def scaling(target, worker_counts, kwargs = None, timeout = 900):
+    rows = []
+    for n in worker_counts:
+        with LocalCluster(n) as cluster:
+            rows.append((n, cluster.run(target, kwargs, timeout)))
+            shutil.rmtree(cluster.work_dir, ignore_errors = True)
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', action = 'store_true')
+    parser.add_argument('--target', default = 'tutorial28_localCluster:keras_benchmark')
+    parser.add_argument('--kwargs', default = '{}')
+    parser.add_argument('--result', default = None)
+    parser.add_argument('--max-workers', type = int, default = 2)
+    parser.add_argument('--steps', type = int, default = 50)
+    args = parser.parse_args()
+
+    if args.worker:
+        # SIGTERM 을 받으면 바로 종료 (collective 대기 중이어도)
+        signal.signal(signal.SIGTERM, lambda *_: os._exit(1))
+        worker_main(args.target, json.loads(args.kwargs), args.result)
+        sys.exit(0)
+
+    counts = list(range(1, args.max_workers + 1))
+    print('Keras (build_and_compile_cnn_model)')
+    for n, results in scaling('tutorial28_localCluster:keras_benchmark', counts,
+            {'steps' : args.steps}):
+        for r in results:
+            print('  workers {} / task {} : step {:.1f}ms (p90 {:.1f}ms), all-reduce {:.2f}ms, '
+                    '{:.0f} examples/s'.format(n, r['task_index'], r['step']['median_ms'],
+                    r['step']['p90_ms'], r['allreduce']['median_ms'], r['examples_per_s']))
+
+    print('Estimator (model_fn)')
+    for n, results in scaling('tutorial28_localCluster:estimator_benchmark', counts,
+            {'steps' : args.steps}):
+        for r in results:
+            print('  workers {} / task {} : step {:.1f}ms (p90 {:.1f}ms)'.format(n,
+                    r['task_index'], r['step']['median_ms'], r['step']['p90_ms']))
@@ -0,0 +1,160 @@
+# https://www.tensorflow.org/tutorials/distribute/save_and_load
+# 개요 : tutorial30 은 tf.saved_model.save 로 저장한 serving_default 를 들어오는 배치 크기 그대로
+# 호출하므로 배치 크기가 바뀔 때마다 새 모양의 커널 준비 (추적 / oneDNN primitive 생성) 가 생겨 지연
+# 시간이 들쭉날쭉함. 고정된 배치 크기 버킷 (1, 8, 32, 128) 마다 시그니처를 내보내고, 불러올 때 모든
+# 버킷을 한 번씩 실행 (warm-up) 한 뒤, 요청을 가장 가까운 버킷 크기로 채워 (padding) 실행하고
+# 채운 부분을 잘라서 돌려줌
+
+import re
+import time
+
+import numpy as np
+import tensorflow as tf
+
+BATCH_SIZES = (1, 8, 32, 128)
+SIGNATURE_PREFIX = 'serving_batch_'
+
+def export_bucketed(model, export_dir, batch_sizes = BATCH_SIZES, input_shape = None,
+        dtype = tf.float32):
+    # Writes one signature per batch size ('serving_batch_<n>', inputs [n] + input_shape) next to
+    # a dynamic-batch 'serving_default' (inputs [None] + input_shape), so clients that do not
+    # know about buckets keep working. input_shape defaults to model.input_shape[1:].
+    input_shape = list(input_shape or model.input_shape[1:])
+    module = tf.Module()
+    module.model = model
+    serve = tf.function(lambda inputs: {'outputs' : module.model(inputs, training = False)})
+    signatures = {'serving_default' : serve.get_concrete_function(
+            tf.TensorSpec([None] + input_shape, dtype, name = 'inputs'))}
+    for batch_size in sorted(batch_sizes):
+        spec = tf.TensorSpec([batch_size] + input_shape, dtype, name = 'inputs')
+        signatures[SIGNATURE_PREFIX + str(batch_size)] = serve.get_concrete_function(spec)
+    tf.saved_model.save(module, export_dir, signatures = signatures)
+
+class BucketedPredictor(object):
+    # predictor = BucketedPredictor(export_dir)    # loads and warms up every bucket
+    # outputs = predictor(batch)                   # any batch size; returns a dict of arrays
+    # Requests larger than the biggest bucket run as several full buckets plus one padded one.
+
+    def __init__(self, export_dir, warm_up = True):
+        self.loaded = tf.saved_model.load(export_dir)
+        self.signatures = {}
+        for name, fn in self.loaded.signatures.items():
+            match = re.match(SIGNATURE_PREFIX + r'(\d+)$', name)
+            if match:
+                self.signatures[int(match.group(1))] = fn
+        if not self.signatures:
+            raise ValueError('{} has no {}<n> signatures'.format(export_dir, SIGNATURE_PREFIX))
+        self.batch_sizes = sorted(self.signatures)
+        spec = self.signatures[self.batch_sizes[0]].structured_input_signature[1]['inputs']
+        self.input_shape = spec.shape[1:].as_list()
+        self.dtype = spec.dtype.as_numpy_dtype
+        self.warm_up_seconds = self.warm_up() if warm_up else None
+
+    def warm_up(self):
+        # Runs every bucket once; returns the seconds per bucket.
+        seconds = {}
+        for batch_size in self.batch_sizes:
+            start = time.perf_counter()
+            self._run(np.zeros([batch_size] + self.input_shape, self.dtype))
+            seconds[batch_size] = time.perf_counter() - start
+        return seconds
+
+    def bucket(self, n):
+        # Smallest batch size >= n (n <= the largest bucket).
+        for batch_size in self.batch_sizes:
+            if batch_size >= n:
+                return batch_size
+        raise ValueError('{} is larger than the largest bucket'.format(n))
+
+    def _run(self, batch):
+        outputs = self.signatures[len(batch)](inputs = tf.constant(batch))
+        return {name : value.numpy() for name, value in outputs.items()}
+
+    def _run_padded(self, batch):
+        n = len(batch)
+        batch_size = self.bucket(n)
+        if batch_size > n:
+            padding = np.zeros([batch_size - n] + self.input_shape, self.dtype)
+            batch = np.concatenate([batch, padding])
+        return {name : value[:n] for name, value in self._run(batch).items()}
+
+    def _empty_outputs(self):
+        # Zero-row outputs with the signature's per-example shapes and dtypes.
+        outputs = self.signatures[self.batch_sizes[0]].structured_outputs
+        return {name : np.empty([0] + spec.shape[1:].as_list(), spec.dtype.as_numpy_dtype)
+                for name, spec in outputs.items()}
+
+    def __call__(self, batch):
+        batch = np.asarray(batch, self.dtype)
+        if len(batch) == 0:
+            return self._empty_outputs()
+        largest = self.batch_sizes[-1]
+        parts = [self._run_padded(batch[start : start + largest])
+                for start in range(0, len(batch), largest)]
+        if len(parts) == 1:
+            return parts[0]
+        return {name : np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    # tutorial30 의 get_model() 과 같은 모델 (전략 없이)
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Conv2D(32, 3, activation = 'relu', input_shape = (28, 28, 1)),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(64, activation = 'relu'),
+        tf.keras.layers.Dense(10)
+    ])
+
+    directory = tempfile.mkdtemp()
+    saved_model_path = os.path.join(directory, 'tf_save')
+    bucketed_path = os.path.join(directory, 'tf_save_bucketed')
+    tf.saved_model.save(model, saved_model_path)
+    export_bucketed(model, bucketed_path)
+
+    start = time.perf_counter()
+    predictor = BucketedPredictor(bucketed_path)
+    print('불러오기 + warm-up : {:.2f}s ({})'.format(time.perf_counter() - start,
+            ', '.join('{} : {:.0f}ms'.format(n, 1000 * s)
+                    for n, s in predictor.warm_up_seconds.items())))
+
+    # 동등성 확인 - 채우고 잘라낸 결과가 원래 모델과 같아야 함
+    rng = np.random.RandomState(0)
+    for n in [1, 2, 8, 9, 31, 100, 128, 129, 300]:
+        batch = rng.rand(n, 28, 28, 1).astype('float32')
+        outputs = predictor(batch)['outputs']
+        assert outputs.shape == (n, 10)
+        np.testing.assert_allclose(outputs, model(batch).numpy(), rtol = 1e-4, atol = 1e-5)
+    assert predictor(np.zeros([0, 28, 28, 1]))['outputs'].shape == (0, 10)
+    # serving_default 는 배치 크기가 정해지지 않은 시그니처로 남음
+    default_fn = tf.saved_model.load(bucketed_path).signatures['serving_default']
+    for n in [3, 200]:
+        batch = rng.rand(n, 28, 28, 1).astype('float32')
+        np.testing.assert_allclose(default_fn(inputs = tf.constant(batch))['outputs'].numpy(),
+                model(batch).numpy(), rtol = 1e-4, atol = 1e-5)
+    print('원래 모델과 같은 결과')
+
+    # 클라이언트마다 다른 배치 크기 (1 ~ 150) 의 요청 지연 시간 : tutorial30 방식과 비교
+    # (각 방식은 새 프로세스가 아니므로 이미 본 모양은 빠름 - 처음 보는 모양의 비용이 차이)
+    inference_func = tf.saved_model.load(saved_model_path).signatures['serving_default']
+    input_name = list(inference_func.structured_input_signature[1])[0]
+    requests = [rng.rand(n, 28, 28, 1).astype('float32') for n in rng.randint(1, 151, 300)]
+
+    def latencies(fn):
+        seconds = []
+        for batch in requests:
+            start = time.perf_counter()
+            fn(batch)
+            seconds.append(time.perf_counter() - start)
+        return 1000 * np.array(seconds)
+
+    default = latencies(lambda batch: {name : value.numpy() for name, value in
+            inference_func(**{input_name : tf.constant(batch)}).items()})
+    bucketed = latencies(predictor)
+    print('{:<16s} {:>8s} {:>8s} {:>8s} {:>8s}'.format('', 'p50', 'p90', 'p99', 'max'))
+    for name, ms in [('serving_default', default), ('bucketed', bucketed)]:
+        print('{:<16s} {:>6.2f}ms {:>6.2f}ms {:>6.2f}ms {:>6.2f}ms'.format(name,
+                *np.percentile(ms, [50, 90, 99, 100])))
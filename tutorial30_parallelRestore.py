@@ -0,0 +1,171 @@
+# https://www.tensorflow.org/tutorials/distribute/save_and_load
+# 개요 : tutorial30 은 another_strategy.scope() 안에서 tf.saved_model.load 로 불러오는데, 변수를 메인
+# 스레드에서 하나씩 읽은 뒤 복제본으로 미러링하므로 큰 모델은 시작이 느림. 전략 범위에서 모델을 만든
+# 뒤 SavedModel 의 variables 체크포인트에서 텐서를 스레드 풀로 병렬로 읽어 복제본 장치마다 바로
+# 할당하는 복원 경로. 복원 대역폭을 보고하고, 수백 MB 의 합성 모델로 시작 시간을 비교
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+if __name__ == '__main__' and '--worker' in sys.argv:
+    # 워커의 TensorFlow 로그는 tensorflow 를 불러오기 전에 줄여야 함
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import tensorflow as tf
+from tensorflow.core.protobuf import trackable_object_graph_pb2
+
+def variable_keys(root, prefix):
+    # [(variable, checkpoint key)] for the variables of root (e.g. the model), matched by their
+    # path in the object graph stored in the checkpoint ('layer_with_weights-0/kernel'), the
+    # same way tf.train.Checkpoint(root).read() matches them. Global variable names are not
+    # used : Keras makes them unique per process ('dense_2/kernel'), so they differ from the
+    # names at save time.
+    reader = tf.train.load_checkpoint(prefix)
+    graph = trackable_object_graph_pb2.TrackableObjectGraph.FromString(
+            reader.get_tensor('_CHECKPOINTABLE_OBJECT_GRAPH'))
+    matched = {}
+    visited = set()
+    pending = [(0, root)]
+    while pending:
+        node_id, obj = pending.pop()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        node = graph.nodes[node_id]
+        for attribute in node.attributes:
+            if attribute.name == 'VARIABLE_VALUE':
+                matched[id(obj)] = (obj, attribute.checkpoint_key)
+        children = tf.train.TrackableView(obj).children(obj)
+        for child in node.children:
+            if child.local_name in children:
+                pending.append((child.node_id, children[child.local_name]))
+    return list(matched.values())
+
+def parallel_restore(root, export_dir, num_threads = None, strategy = None):
+    # Restores the variables of root (a model created by the same code, e.g. under
+    # strategy.scope()) from the SavedModel in export_dir. Variables are matched through the
+    # checkpoint's object graph; each thread reads its tensors with a RestoreV2 op placed on
+    # the first replica's device (no copy through numpy) and assigns them to every replica's
+    # copy. Returns {'bytes', 'seconds', 'mb_per_s'}.
+    strategy = strategy or tf.distribute.get_strategy()
+    num_threads = num_threads or min(8, os.cpu_count())
+    prefix = os.path.join(export_dir, 'variables', 'variables')
+    pairs = variable_keys(root, prefix)
+    restored = set(id(variable) for variable, _ in pairs)
+    missing = [v.name for v in getattr(root, 'variables', ()) if id(v) not in restored]
+    if missing:
+        raise KeyError('{} are not in {}'.format(missing, export_dir))
+    shapes = tf.train.load_checkpoint(prefix).get_variable_to_shape_map()
+
+    def restore(pair):
+        variable, key = pair
+        if tuple(shapes[key]) != tuple(variable.shape):
+            raise ValueError('{} : shape {} in the checkpoint, {} in the model'.format(key,
+                    tuple(shapes[key]), tuple(variable.shape)))
+        components = strategy.experimental_local_results(variable)
+        with tf.device(components[0].device):
+            value, = tf.raw_ops.RestoreV2(prefix = prefix, tensor_names = [key],
+                    shape_and_slices = [''], dtypes = [variable.dtype])
+        for component in components:
+            with tf.device(component.device):
+                component.assign(value)
+        return variable.shape.num_elements() * variable.dtype.size
+
+    # 큰 변수부터 시작해서 마지막에 한 스레드만 일하는 시간을 줄임
+    pairs = sorted(pairs, key = lambda pair: -pair[0].shape.num_elements())
+    start = time.perf_counter()
+    with ThreadPoolExecutor(num_threads) as pool:
+        nbytes = sum(pool.map(restore, pairs))
+    seconds = time.perf_counter() - start
+    return {'bytes' : nbytes, 'seconds' : seconds, 'mb_per_s' : nbytes / 2**20 / seconds}
+
+# 시작 시간 벤치마크
+
+def make_model(width = 4096, depth = 5, input_dim = 2048, initializer = 'glorot_uniform'):
+    # About 4 * (input_dim * width + (depth - 1) * width**2) bytes (288MB by default).
+    layers = [tf.keras.layers.Dense(width, activation = 'relu', input_shape = (input_dim,),
+            kernel_initializer = initializer)]
+    layers += [tf.keras.layers.Dense(width, activation = 'relu', kernel_initializer = initializer)
+            for _ in range(depth - 1)]
+    return tf.keras.Sequential(layers + [tf.keras.layers.Dense(10)])
+
+def startup(export_dir, mode, devices = 2):
+    # Seconds until a model under MirroredStrategy on `devices` logical CPUs is usable.
+    # mode : 'saved_model_load' (tutorial30) or 'parallel_<threads>'.
+    from tutorial26_logicalCpuMirrored import configure_logical_cpus
+    strategy = tf.distribute.MirroredStrategy(devices = configure_logical_cpus(devices),
+            cross_device_ops = tf.distribute.ReductionToOneDevice())
+    x = tf.ones([1, 2048])
+    start = time.perf_counter()
+    result = {'mode' : mode}
+    if mode == 'saved_model_load':
+        with strategy.scope():
+            loaded = tf.saved_model.load(export_dir)
+        output = loaded.signatures['serving_default'](tf.ones([1, 2048]))
+        output = list(output.values())[0]
+    else:
+        with strategy.scope():
+            # 복원할 값으로 덮어쓰므로 무작위 초기화는 생략
+            model = make_model(initializer = 'zeros')
+        result['build_seconds'] = time.perf_counter() - start
+        result.update(parallel_restore(model, export_dir,
+                num_threads = int(mode.split('_')[1]), strategy = strategy))
+        output = model(x)
+    result['startup_seconds'] = time.perf_counter() - start
+    result['checksum'] = float(tf.reduce_sum(output))
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', action = 'store_true')
+    # 기본값은 임시 디렉터리 (끝나면 지움)
+    parser.add_argument('--export-dir', default = None)
+    parser.add_argument('--mode', default = 'parallel_8')
+    args = parser.parse_args()
+
+    if args.worker:
+        # 마지막 줄이 결과 (JSON)
+        print(json.dumps(startup(args.export_dir, args.mode)))
+        sys.exit(0)
+
+    temporary = args.export_dir is None
+    export_dir = tempfile.mkdtemp(prefix = 'tf_save_large_') if temporary else args.export_dir
+
+    tf.keras.utils.set_random_seed(0)
+    model = make_model()
+    tf.saved_model.save(model, export_dir)
+    expected = float(tf.reduce_sum(model(tf.ones([1, 2048]))))
+    size = sum(v.numpy().nbytes for v in model.variables)
+    print('모델 크기 : {:.0f}MB'.format(size / 2**20))
+
+    # 같은 프로세스에서 다시 만든 모델은 변수 이름이 달라도 (dense_6/kernel ...) 경로로 찾음
+    again = make_model(initializer = 'zeros')
+    parallel_restore(again, export_dir)
+    assert float(tf.reduce_sum(again(tf.ones([1, 2048])))) == expected
+    del model, again
+
+    # 모드마다 새 프로세스 (파일은 방금 써서 페이지 캐시에 있음)
+    print('{:<18s} {:>9s} {:>9s} {:>9s} {:>11s}'.format('mode', 'startup', 'build', 'restore',
+            'bandwidth'))
+    try:
+        for mode in ['saved_model_load', 'parallel_1', 'parallel_2', 'parallel_4', 'parallel_8']:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker',
+                    '--export-dir', export_dir, '--mode', mode], check = True,
+                    stdout = subprocess.PIPE, universal_newlines = True).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            assert abs(r['checksum'] - expected) <= 1e-4 * max(1.0, abs(expected)), r
+            if mode == 'saved_model_load':
+                print('{:<18s} {:>8.2f}s'.format(mode, r['startup_seconds']))
+            else:
+                print('{:<18s} {:>8.2f}s {:>8.2f}s {:>8.2f}s {:>6.0f}MB/s'.format(mode,
+                        r['startup_seconds'], r['build_seconds'], r['seconds'], r['mb_per_s']))
+    finally:
+        if temporary:
+            shutil.rmtree(export_dir, ignore_errors = True)
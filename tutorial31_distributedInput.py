@@ -125,7 +125,7 @@ d = tf.data.Dataset.list_files(pattern, shuffle = False)
 d = d.shard(num_workers, worker_index)
 d = d.repeat(num_epochs)
 d = d.shuffle(shuffle_buffer_size)
-d = d.interleave(tf.dta.TFRecordDataset, cycle_length = num_readers, block_length = 1)
+d = d.interleave(tf.data.TFRecordDataset, cycle_length = num_readers, block_length = 1)
 d = d.map(parser_fn, num_parallel_calls = num_map_threads)
 '''
 
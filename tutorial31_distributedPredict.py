@@ -0,0 +1,146 @@
+# https://www.tensorflow.org/tutorials/distribute/input
+# 개요 : tutorial31 은 enumerate() 로 인덱스를 붙이고 복제본마다 experimental_local_results 의
+# .numpy() 를 리스트에 이어 붙인 뒤 dict 로 결과를 다시 맞춤. 복제본 출력을 장치에서
+# strategy.gather 로 이어 붙여 스텝마다 한 번만 호스트로 옮기고, 미리 할당한 배열에 데이터셋 순서대로
+# 채우는 distributed_predict. 마지막 부분 배치 (복제본마다 크기가 다르거나 비어 있음) 도 처리
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+def _grow(array, size):
+    grown = np.empty((size,) + array.shape[1:], array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def distributed_predict(strategy, fn, dataset, num_examples = None):
+    # fn : per-replica inputs -> outputs (a tensor or a nest of tensors, batch-major).
+    # dataset yields global batches; the result holds fn's outputs for every example, in
+    # dataset order, as numpy arrays with the same structure. With num_examples the arrays are
+    # allocated once; otherwise they grow by doubling.
+    # experimental_distribute_dataset splits each global batch into consecutive per-replica
+    # slices, so concatenating the replica outputs in replica order restores the batch order.
+    @tf.function(reduce_retracing = True)
+    def predict_step(inputs):
+        outputs = strategy.run(fn, args = (inputs,))
+        # 출력 구조의 텐서마다 따로 모음 (중첩 구조를 한 번에 gather 하면 첫 복제본 것만 남음)
+        return tf.nest.map_structure(lambda value: strategy.gather(value, axis = 0), outputs)
+
+    results = None
+    structure = None
+    offset = 0
+    for inputs in strategy.experimental_distribute_dataset(dataset):
+        gathered = predict_step(inputs)
+        outputs = [t.numpy() for t in tf.nest.flatten(gathered)]
+        n = len(outputs[0])
+        if num_examples is not None and offset + n > num_examples:
+            raise ValueError('dataset has more than num_examples = {} examples'.format(
+                    num_examples))
+        if results is None:
+            # 출력 구조는 첫 스텝의 결과에서 (데이터셋을 다시 읽지 않음)
+            structure = gathered
+            capacity = num_examples if num_examples is not None else max(n, 1) * 16
+            results = [np.empty((capacity,) + o.shape[1:], o.dtype) for o in outputs]
+        elif offset + n > len(results[0]):
+            results = [_grow(r, max(2 * len(r), offset + n)) for r in results]
+        for r, o in zip(results, outputs):
+            r[offset : offset + n] = o
+        offset += n
+
+    if results is None:
+        raise ValueError('dataset is empty')
+    return tf.nest.pack_sequence_as(structure, [r[:offset] for r in results])
+
+def dict_predict(strategy, fn, dataset):
+    # tutorial31 의 방식 (비교용) : {index : output}
+    dist_dataset = strategy.experimental_distribute_dataset(dataset.unbatch().enumerate().batch(
+            _batch_size(dataset)))
+
+    def predict(index, inputs):
+        return index, fn(inputs)
+
+    result = {}
+    for index, inputs in dist_dataset:
+        output_index, outputs = strategy.run(predict, args = (index, inputs))
+        rindices = []
+        for a in strategy.experimental_local_results(output_index):
+            rindices.extend(a.numpy())
+        routputs = []
+        for a in strategy.experimental_local_results(outputs):
+            routputs.extend(a.numpy())
+        for i, value in zip(rindices, routputs):
+            result[i] = value
+    return result
+
+def _batch_size(dataset):
+    return int(tf.nest.flatten(next(iter(dataset.take(1))))[0].shape[0])
+
+if __name__ == '__main__':
+    import argparse
+
+    from tutorial26_logicalCpuMirrored import configure_logical_cpus
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type = int, default = 2)
+    parser.add_argument('--examples', type = int, default = 20000)
+    args = parser.parse_args()
+
+    devices = configure_logical_cpus(args.devices)
+    mirrored_strategy = tf.distribute.MirroredStrategy(devices = devices,
+            cross_device_ops = tf.distribute.ReductionToOneDevice())
+
+    # tutorial31 의 예제 (데이터셋 크기 24, 배치 6) 와 부분 배치가 생기는 크기 25 / 7
+    def double(inputs):
+        return 2 * inputs
+
+    for dataset_size, batch_size in [(24, 6), (25, 6), (7, 6), (1, 6)]:
+        dataset = tf.data.Dataset.range(dataset_size).batch(batch_size)
+        outputs = distributed_predict(mirrored_strategy, double, dataset)
+        np.testing.assert_array_equal(outputs, 2 * np.arange(dataset_size))
+        result = dict_predict(mirrored_strategy, double, dataset)
+        np.testing.assert_array_equal([result[i] for i in range(dataset_size)], outputs)
+    print(distributed_predict(mirrored_strategy, double, tf.data.Dataset.range(24).batch(6)))
+
+    # 중첩된 출력과 num_examples
+    def nested(inputs):
+        return {'logits' : tf.stack([inputs, -inputs], axis = 1), 'id' : inputs}
+    outputs = distributed_predict(mirrored_strategy, nested, tf.data.Dataset.range(25).batch(6),
+            num_examples = 25)
+    np.testing.assert_array_equal(outputs['id'], np.arange(25))
+    np.testing.assert_array_equal(outputs['logits'][:, 1], -np.arange(25))
+    for num_examples in [3, 24]:
+        try:
+            distributed_predict(mirrored_strategy, nested, tf.data.Dataset.range(25).batch(6),
+                    num_examples = num_examples)
+            raise AssertionError(num_examples)
+        except ValueError:
+            pass
+
+    # 작은 모델의 예측 시간 비교
+    with mirrored_strategy.scope():
+        model = tf.keras.Sequential([
+            tf.keras.layers.Dense(64, activation = 'relu', input_shape = (32,)),
+            tf.keras.layers.Dense(10)
+        ])
+    features = np.random.RandomState(0).rand(args.examples, 32).astype('float32')
+    expected = model.predict(features, batch_size = 1024, verbose = 0)
+
+    def predict_fn(inputs):
+        return model(inputs, training = False)
+
+    print('{:>6s} {:>12s} {:>12s} {:>8s}'.format('batch', 'dict', 'gather', 'speedup'))
+    for global_batch_size in [64, 256, 1024]:
+        dataset = tf.data.Dataset.from_tensor_slices(features).batch(global_batch_size)
+        start = time.perf_counter()
+        result = dict_predict(mirrored_strategy, predict_fn, dataset)
+        dict_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        outputs = distributed_predict(mirrored_strategy, predict_fn, dataset,
+                num_examples = args.examples)
+        gather_seconds = time.perf_counter() - start
+        np.testing.assert_allclose(outputs, expected, rtol = 1e-4, atol = 1e-5)
+        np.testing.assert_allclose(np.stack([result[i] for i in range(args.examples)]), expected,
+                rtol = 1e-4, atol = 1e-5)
+        print('{:>6d} {:>10.2f}s {:>10.2f}s {:>7.1f}x'.format(global_batch_size, dict_seconds,
+                gather_seconds, dict_seconds / gather_seconds))
@@ -0,0 +1,214 @@
+# https://www.tensorflow.org/tutorials/distribute/input
+# 개요 : tutorial31 에서 주석으로만 남긴 파일 입력 파이프라인
+# (list_files -> shard -> repeat -> shuffle -> interleave(TFRecordDataset) -> map(parser_fn)) 을
+# 만드는 빌더. 짧은 보정(calibration) 실행으로 단계별 처리량을 재서 num_readers / num_map_threads /
+# 셔플 버퍼 크기를 정하고, 파일 수와 워커 수를 비교하여 FILE / DATA 샤딩을 고른 뒤 단계별 처리량
+# 보고서를 출력
+
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+def choose_shard_policy(num_files, num_workers):
+    # FILE : each worker reads its own files. With fewer files than workers some workers would
+    # get nothing, so every worker reads all files and keeps every num_workers-th record (DATA).
+    if num_workers <= 1:
+        return tf.data.experimental.AutoShardPolicy.OFF
+    if num_files >= num_workers:
+        return tf.data.experimental.AutoShardPolicy.FILE
+    return tf.data.experimental.AutoShardPolicy.DATA
+
+def _elements_per_second(dataset, num_elements):
+    # Throughput over num_elements after a short warm-up (the first elements include the
+    # start-up of the iterator and its threads).
+    iterator = iter(dataset)
+    for _ in range(min(10, num_elements)):
+        if next(iterator, None) is None:
+            break
+    count = 0
+    start = time.perf_counter()
+    for _ in range(num_elements):
+        try:
+            next(iterator)
+        except StopIteration:
+            break
+        count += 1
+    return count / max(time.perf_counter() - start, 1e-9)
+
+def _parallelism_candidates(max_parallelism = None):
+    max_parallelism = max_parallelism or max(2, os.cpu_count())
+    candidates = [1]
+    while candidates[-1] * 2 <= max_parallelism:
+        candidates.append(candidates[-1] * 2)
+    return candidates
+
+def _pick(throughputs, tolerance = 0.9):
+    # Smallest parallelism reaching tolerance x the best throughput (more threads past that
+    # point only take CPU from the training step).
+    best = max(throughputs.values())
+    return min(n for n, rate in throughputs.items() if rate >= tolerance * best)
+
+def calibrate(files, parser_fn, reader = tf.data.TFRecordDataset, num_elements = 2000,
+        max_parallelism = None, memory_budget = 256 << 20):
+    # Measures each stage separately and returns (settings, report):
+    #   read  : records / s of interleave(reader) for each cycle_length (parallel reads)
+    #   parse : records / s of map(parser_fn) for each num_parallel_calls, on records already in
+    #           memory so that reading does not limit it
+    # The shuffle buffer is as many records as fit in memory_budget (measured record size).
+    # Raises ValueError if the files hold no records (repeat() would never yield).
+    candidates = _parallelism_candidates(max_parallelism)
+    # 한 번만 읽어서 (repeat 없이) 레코드가 있는 지 확인하고 크기를 잼
+    records = list(tf.data.Dataset.from_tensor_slices(files).interleave(reader,
+            cycle_length = len(files)).take(num_elements).as_numpy_iterator())
+    if not records:
+        raise ValueError('No records in {} files ({}, ...)'.format(len(files), files[0]))
+    record_bytes = float(np.mean([len(r) for r in records]))
+    files_dataset = tf.data.Dataset.from_tensor_slices(files).repeat()
+
+    read = {}
+    for n in candidates:
+        dataset = files_dataset.interleave(reader, cycle_length = n, block_length = 1,
+                num_parallel_calls = n, deterministic = False)
+        read[n] = _elements_per_second(dataset, num_elements)
+    num_readers = _pick(read)
+
+    in_memory = tf.data.Dataset.from_tensor_slices(records).cache().repeat()
+    parse = {}
+    for n in candidates:
+        parse[n] = _elements_per_second(in_memory.map(parser_fn, num_parallel_calls = n,
+                deterministic = False), num_elements)
+    num_map_threads = _pick(parse)
+
+    settings = {'num_readers' : num_readers, 'num_map_threads' : num_map_threads,
+            'shuffle_buffer_size' : int(max(1, min(100000, memory_budget // record_bytes)))}
+    report = {'read' : read, 'parse' : parse, 'record_bytes' : record_bytes}
+    return settings, report
+
+def build_pipeline(file_pattern, parser_fn, batch_size, num_workers = 1, worker_index = 0,
+        num_epochs = None, reader = tf.data.TFRecordDataset, calibrate_elements = 2000,
+        seed = None, **overrides):
+    # tutorial31 의 권장 순서로 파이프라인을 만들어 (dataset, report) 를 돌려줌.
+    # num_workers / worker_index : this input pipeline's share (e.g. from an InputContext).
+    # overrides (num_readers, num_map_threads, shuffle_buffer_size) skip the calibration of that
+    # setting; calibrate_elements = 0 skips calibration (every setting then needs an override
+    # or falls back to AUTOTUNE / 10000).
+    files = sorted(tf.io.gfile.glob(file_pattern))
+    if not files:
+        raise ValueError('No files match {}'.format(file_pattern))
+    policy = choose_shard_policy(len(files), num_workers)
+
+    report = {'files' : len(files), 'num_workers' : num_workers, 'shard_policy' : policy.name}
+    settings = {'num_readers' : tf.data.AUTOTUNE, 'num_map_threads' : tf.data.AUTOTUNE,
+            'shuffle_buffer_size' : 10000}
+    if calibrate_elements and not all(key in overrides for key in settings):
+        calibrated, measured = calibrate(files, parser_fn, reader, calibrate_elements)
+        settings.update(calibrated)
+        report.update(measured)
+    settings.update(overrides)
+    report.update(settings)
+
+    d = tf.data.Dataset.list_files(file_pattern, shuffle = False)
+    if policy == tf.data.experimental.AutoShardPolicy.FILE:
+        d = d.shard(num_workers, worker_index)
+    d = d.repeat(num_epochs)
+    # DATA 샤딩은 모든 워커가 같은 순서로 레코드를 읽어야 하므로 파일 셔플은 seed 가 있을 때만
+    data_sharded = policy == tf.data.experimental.AutoShardPolicy.DATA
+    if seed is not None or not data_sharded:
+        d = d.shuffle(max(len(files), 1), seed = seed)
+    d = d.interleave(reader, cycle_length = settings['num_readers'], block_length = 1,
+            num_parallel_calls = settings['num_readers'],
+            deterministic = seed is not None or data_sharded)
+    if data_sharded:
+        # 파싱하기 전에 다른 워커의 레코드를 버림
+        d = d.shard(num_workers, worker_index)
+    d = d.shuffle(settings['shuffle_buffer_size'], seed = seed)
+    d = d.map(parser_fn, num_parallel_calls = settings['num_map_threads'],
+            deterministic = seed is not None)
+    d = d.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    # 직접 샤딩했으므로 분산 전략의 자동 샤딩은 끔
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+    return d.with_options(options), report
+
+def print_report(report):
+    print('파일 {} 개, 워커 {} 개 -> {} 샤딩'.format(report['files'], report['num_workers'],
+            report['shard_policy']))
+    for stage in ['read', 'parse']:
+        if stage in report:
+            print('  {:<5s} '.format(stage) + ', '.join('{} : {:.0f}/s'.format(n, rate)
+                    for n, rate in report[stage].items()))
+    if 'record_bytes' in report:
+        print('  레코드 크기 {:.0f} bytes'.format(report['record_bytes']))
+    print('  num_readers = {}, num_map_threads = {}, shuffle_buffer_size = {}'.format(
+            report['num_readers'], report['num_map_threads'], report['shuffle_buffer_size']))
+
+if __name__ == '__main__':
+    import tempfile
+
+    # MNIST 모양의 tf.train.Example 을 담은 TFRecord 파일
+    NUM_FILES = 8
+    RECORDS_PER_FILE = 2000
+    directory = tempfile.mkdtemp(prefix = 'records_')
+    rng = np.random.RandomState(0)
+    for i in range(NUM_FILES):
+        with tf.io.TFRecordWriter(os.path.join(directory, 'train-{:05d}.tfrecord'.format(i))) as w:
+            for j in range(RECORDS_PER_FILE):
+                example = tf.train.Example(features = tf.train.Features(feature = {
+                    'image' : tf.train.Feature(bytes_list = tf.train.BytesList(
+                            value = [rng.randint(0, 256, 784).astype('uint8').tobytes()])),
+                    'label' : tf.train.Feature(int64_list = tf.train.Int64List(
+                            value = [i * RECORDS_PER_FILE + j]))
+                }))
+                w.write(example.SerializeToString())
+    pattern = os.path.join(directory, 'train-*.tfrecord')
+
+    feature_description = {'image' : tf.io.FixedLenFeature([], tf.string),
+            'label' : tf.io.FixedLenFeature([], tf.int64)}
+
+    def parser_fn(record):
+        parsed = tf.io.parse_single_example(record, feature_description)
+        image = tf.reshape(tf.io.decode_raw(parsed['image'], tf.uint8), [28, 28, 1])
+        return tf.cast(image, tf.float32) / 255, parsed['label']
+
+    # 샤딩 확인 - 한 에포크에서 워커들이 겹치지 않고 모든 레코드를 나눠 읽어야 함
+    total = NUM_FILES * RECORDS_PER_FILE
+    for num_workers, files in [(2, pattern), (4, pattern),
+            (3, os.path.join(directory, 'train-0000[01].tfrecord'))]:
+        labels = []
+        for worker_index in range(num_workers):
+            dataset, report = build_pipeline(files, parser_fn, 256, num_workers, worker_index,
+                    num_epochs = 1, calibrate_elements = 0)
+            labels.extend(np.concatenate([y for _, y in dataset.as_numpy_iterator()]))
+        expected = len(tf.io.gfile.glob(files)) * RECORDS_PER_FILE
+        assert len(labels) == expected and len(set(labels)) == expected
+        print('워커 {} 개 : {} 샤딩, 레코드 {} 개'.format(num_workers, report['shard_policy'],
+                len(labels)))
+
+    # 빈 파일만 있으면 보정이 멈추지 않고 오류
+    empty_pattern = os.path.join(directory, 'empty-*.tfrecord')
+    with tf.io.TFRecordWriter(os.path.join(directory, 'empty-00000.tfrecord')):
+        pass
+    try:
+        build_pipeline(empty_pattern, parser_fn, 256)
+        raise AssertionError('calibration on empty files')
+    except ValueError as e:
+        print(e)
+
+    dataset, report = build_pipeline(pattern, parser_fn, 256, seed = 0)
+    print_report(report)
+
+    # 손으로 정한 값 (1 / 1), AUTOTUNE, 보정한 값의 배치 처리량 비교
+    variants = [
+        ('hand-tuned 1/1', {'num_readers' : 1, 'num_map_threads' : 1}),
+        ('AUTOTUNE', {'num_readers' : tf.data.AUTOTUNE, 'num_map_threads' : tf.data.AUTOTUNE}),
+        ('calibrated', {'num_readers' : report['num_readers'],
+                'num_map_threads' : report['num_map_threads']}),
+    ]
+    for name, settings in variants:
+        dataset, _ = build_pipeline(pattern, parser_fn, 256, calibrate_elements = 0,
+                shuffle_buffer_size = report['shuffle_buffer_size'], **settings)
+        rate = _elements_per_second(dataset, 100) * 256
+        print('{:<15s} {:>10.0f} examples/s'.format(name, rate))